@@ -5,14 +5,14 @@ import os
 import glob
 import time
 import argparse
+from functools import partial
 
-from rwe import dataloader
-from rwe.utils import load_dict
-from rwe.utils import build_candidate_set
-from rwe.labelers import TaggerPipelineServer
+from rwe import stream_documents, PartitionedWriter
+from rwe.utils import load_dict, load_dict_index
+from rwe.labelers import TaggerPipelineServer, RunCheckpoint, TaggingCache
 from rwe.labelers.taggers import (
     ResetTags, DocTimeTagger, PrecomputedEntityTagger,
-    DictionaryTagger, HypotheticalTagger, HistoricalTagger,
+    DictionaryTagger, TermIndex, HypotheticalTagger, HistoricalTagger,
     SectionHeaderTagger, ParentSectionTagger,
     Timex3Tagger, Timex3NormalizerTagger, TimeDeltaTagger,
     FamilyTagger, PolarityTagger, TextFieldDocTimeTagger
@@ -33,16 +33,31 @@ def timeit(f):
 
     return timed
 
-def dump_concepts(documents, target_concepts, outfpath='concepts.tsv'):
-    """Dump CSV of concepts"""
-    header = ['DOC_ID', 'DOC_TS', 'TYPE', 'TEXT', 'ABS_CHAR_START', 'ABS_CHAR_END']
-    header += ['POLARITY', 'HYPOTHETICAL', 'HISTORICAL', 'SECTION', 'SUBJECT', 'TDELTA']
+CONCEPT_HEADER = [
+    'DOC_ID', 'DOC_TS', 'TYPE', 'TEXT', 'ABS_CHAR_START', 'ABS_CHAR_END',
+    'POLARITY', 'HYPOTHETICAL', 'HISTORICAL', 'SECTION', 'SUBJECT', 'TDELTA'
+]
+
+# document and span props read by `concept_rows`
+CONCEPT_PROPS = [
+    'doc.doctime', 'props.polarity', 'props.hypothetical', 'props.historical',
+    'props.section', 'props.subject', 'props.tdelta'
+]
+
+# Parquet column types (all other columns are strings)
+CONCEPT_DTYPES = {'ABS_CHAR_START': int, 'ABS_CHAR_END': int}
+
+def concept_rows(doc, target_concepts):
+    """Rows for all target concepts in a tagged document, in one pass"""
+    doctime = doc.props['doctime'] if 'doctime' in doc.props else 'None'
     data = []
-    for entity_type in target_concepts:
-        for doc in documents:
-            spans = build_candidate_set([doc], entity_type)
-            for x in spans:
-                row = [doc.name, doc.props['doctime'] if 'doctime' in doc.props else 'None', entity_type]
+    for i in doc.annotations:
+        layers = doc.annotations[i]
+        for entity_type in target_concepts:
+            if entity_type not in layers:
+                continue
+            for x in layers[entity_type]:
+                row = [doc.name, doctime, entity_type]
                 row += [x.text, x.abs_char_start, x.abs_char_end]
 
                 polarity = x.props['polarity'] if 'polarity' in x.props else 'NULL'
@@ -53,11 +68,51 @@ def dump_concepts(documents, target_concepts, outfpath='concepts.tsv'):
                 tdelta = x.props['tdelta'] if 'tdelta' in x.props else 'NULL'
 
                 row += [polarity, hypothetical, historical, section, subject, tdelta]
-                data.append('\t'.join(map(str, row)))
+                data.append(row)
+    return data
 
-    with open(outfpath, 'w') as fp:
-        fp.write('\t'.join(header) + '\n')
-        fp.write('\n'.join(data))
+def concept_writer(outfpath, format=None, partition_by=None, **kwargs):
+    """
+    Streaming concept writer. `partition_by` is None, 'type' (one partition
+    per entity type) or 'shard' (documents hashed into shards).
+    """
+    partition_by = {'type': 'TYPE', 'shard': 'shard'}.get(partition_by)
+    return PartitionedWriter(outfpath, CONCEPT_HEADER, format=format,
+                             partition_by=partition_by, shard_by='DOC_ID',
+                             dtypes=CONCEPT_DTYPES,
+                             null_values=('NULL', 'None'), **kwargs)
+
+def dump_concepts(documents, target_concepts, outfpath='concepts.tsv',
+                  **kwargs):
+    """Write concepts of tagged documents, one document at a time"""
+    rows = (concept_rows(doc, target_concepts) for doc in documents)
+    return stream_concepts(rows, concept_writer(outfpath, **kwargs))
+
+def stream_concepts(rows, writer):
+    """Write per-document concept rows as they are generated"""
+    n = 0
+    with writer:
+        for doc_rows in rows:
+            writer.write(doc_rows)
+            n += 1
+    return n
+
+def load_dictionaries(dict_fpaths, index_fpath=None):
+    """
+    Load dictionaries from term files. If `index_fpath` is given, open that
+    compiled index instead, (re)compiling it on the first run or when it was
+    compiled from other dictionaries.
+    """
+    if index_fpath:
+        return load_dict_index(dict_fpaths, index_fpath)
+
+    dictionaries = {}
+    for name, fpaths in dict_fpaths.items():
+        fpaths = [fpaths] if type(fpaths) is str else fpaths
+        dictionaries[name] = set()
+        for fpath in fpaths:
+            dictionaries[name].update(load_dict(fpath))
+    return dictionaries
 
 def get_header_dict():
     return [
@@ -126,12 +181,19 @@ def main(args):
     # Load Parsed Documents
     # =========================================================================
     if os.path.isdir(args.input):
-        filelist = glob.glob(f'{args.input}/*.json')
+        filelist = sorted(fpath for ext in ['json', 'json.gz', 'npz']
+                          for fpath in glob.glob(f'{args.input}/*.{ext}'))
     else:
         filelist = [args.input]
     print(f'Loading {len(filelist)} files')
-    corpus = [dataloader(filelist)]
-    print(f'Documents: {len(corpus[0])}')
+    corpus = stream_documents(filelist, num_workers=args.n_loaders)
+
+    # fail on unavailable output formats before loading dictionaries
+    # (files are only created once rows are written)
+    writer = concept_writer(args.output, format=args.output_format,
+                            partition_by=args.partition_by,
+                            num_shards=args.num_shards,
+                            rows_per_file=args.rows_per_file)
 
     # =========================================================================
     # Define Concept Pipeline
@@ -139,40 +201,32 @@ def main(args):
 
     # SNOMED dictionaries with
     if args.concepts == "umls":
-        dict_disorder = load_dict(
-            f'{args.dict_root}viruses/SNOMEDCT_US.disorder.tsv')
-        dict_symptom = load_dict(
-            f'{args.dict_root}viruses/SNOMEDCT_US.symptom.tsv')
-        dict_finding = load_dict(
-            f'{args.dict_root}viruses/SNOMEDCT_US.finding.tsv')
-        dict_icd10 = load_dict(f'{args.dict_root}viruses/ICD10CM.codes.tsv')
-        dict_geo = load_dict(
-            f'{args.dict_root}viruses/umls.geographic_area.tsv')
-
+        dict_fpaths = {
+            'disorder': f'{args.dict_root}viruses/SNOMEDCT_US.disorder.tsv',
+            'symptom': f'{args.dict_root}viruses/SNOMEDCT_US.symptom.tsv',
+            'finding': f'{args.dict_root}viruses/SNOMEDCT_US.finding.tsv',
+            'GPE': f'{args.dict_root}viruses/umls.geographic_area.tsv',
+            'ICD10': f'{args.dict_root}viruses/ICD10CM.codes.tsv'
+        }
         taggers = {
-            "concepts": DictionaryTagger({
-                'disorder': dict_disorder,
-                'symptom': dict_symptom,
-                'finding': dict_finding,
-                'GPE': dict_geo,
-                'ICD10': dict_icd10})
+            "concepts": DictionaryTagger(
+                load_dictionaries(dict_fpaths, args.dict_index))
         }
         target_entities = ['disorder', 'symptom', 'finding', 'ICD10']
 
     # Merge all dictonaries into a single entity type
     elif args.concepts == 'umls_merged':
-        dict_terms = {}
-        dict_terms.update(
-            load_dict(f'{args.dict_root}viruses/SNOMEDCT_US.disorder.tsv'))
-        dict_terms.update(
-            load_dict(f'{args.dict_root}viruses/SNOMEDCT_US.symptom.tsv'))
-        dict_terms.update(
-            load_dict(f'{args.dict_root}viruses/SNOMEDCT_US.finding.tsv'))
-
-        taggers = {"concepts": DictionaryTagger(
-            {'disorder_symptom_finding': dict_terms})}
+        dict_fpaths = {'disorder_symptom_finding': [
+            f'{args.dict_root}viruses/SNOMEDCT_US.disorder.tsv',
+            f'{args.dict_root}viruses/SNOMEDCT_US.symptom.tsv',
+            f'{args.dict_root}viruses/SNOMEDCT_US.finding.tsv'
+        ]}
+        dict_terms = load_dictionaries(dict_fpaths, args.dict_index)
+
+        taggers = {"concepts": DictionaryTagger(dict_terms)}
         target_entities = ['disorder_symptom_finding']
-        print(f'[{args.concepts}] Loaded {len(dict_terms)} concept terms')
+        print(f'[{args.concepts}] Loaded '
+              f'{len(taggers["concepts"].index)} concept terms')
 
     # Precomputed entities (we use weakly supervised entities here)
     elif args.concepts == 'inkfish':
@@ -229,14 +283,31 @@ def main(args):
     # =========================================================================
     # Run Tagging Pipeline & Dump Concepts
     # =========================================================================
-    tagger = TaggerPipelineServer(num_workers=args.n_procs)
-    documents = tagger.apply(pipeline, corpus)
-    print('Tagging complete')
-
-    dump_concepts(documents[0],
-                  target_concepts=['disorder', 'drug', 'ICD10', 'GPE'],
-                  outfpath=args.output)
-
+    target_concepts = ['disorder', 'drug', 'ICD10', 'GPE']
+    cache = TaggingCache(args.cache, version=args.cache_version) \
+        if args.cache else None
+    tagger = TaggerPipelineServer(num_workers=args.n_procs,
+                                  profile=args.profile is not None,
+                                  profile_fpath=args.profile,
+                                  profile_format=args.profile_format,
+                                  cache=cache)
+    checkpoint = None
+    if args.run_dir:
+        # arguments that change the tagged blocks or their output
+        config = {k: v for k, v in vars(args).items() if k not in
+                  {'output', 'output_format', 'partition_by', 'num_shards',
+                   'rows_per_file', 'n_procs', 'n_loaders', 'profile',
+                   'profile_format', 'cache', 'cache_version', 'run_dir'}}
+        checkpoint = RunCheckpoint(args.run_dir, config=config)
+    rows = tagger.apply_stream(
+        pipeline, corpus,
+        block_size=args.block_size,
+        transform=partial(concept_rows, target_concepts=target_concepts),
+        outputs=target_concepts + CONCEPT_PROPS,
+        checkpoint=checkpoint
+    )
+    n_docs = stream_concepts(rows, writer)
+    print(f'Tagging complete, documents: {n_docs}')
     print(f'Concepts written to {args.output}')
 
 
@@ -245,9 +316,39 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--input", type=str, default=None, required=True)
     parser.add_argument("--output", type=str, default=None, required=True)
+    parser.add_argument("--output_format", type=str, default=None,
+                        choices=['tsv', 'tsv.gz', 'parquet'],
+                        help="default inferred from the --output extension")
+    parser.add_argument("--partition_by", type=str, default=None,
+                        choices=['type', 'shard'],
+                        help="write a directory of partitions by entity "
+                             "type or document shard")
+    parser.add_argument("--num_shards", type=int, default=16)
+    parser.add_argument("--rows_per_file", type=int, default=None,
+                        help="start a new partition file every N rows "
+                             "(requires --partition_by)")
     parser.add_argument("--dict_root", type=str, default='data/supervision/dicts/')
     parser.add_argument("--entity_tags", type=str, default=None)
+    parser.add_argument("--dict_index", type=str, default=None,
+                        help="compiled dictionary index (created if missing)")
     parser.add_argument("--n_procs", type=int, default=16)
+    parser.add_argument("--n_loaders", type=int, default=1,
+                        help="processes used to decode input files")
+    parser.add_argument("--profile", type=str, default=None,
+                        help="export per-tagger timings and counts to file")
+    parser.add_argument("--profile_format", type=str, default='json',
+                        choices=['json', 'prometheus'])
+    parser.add_argument("--cache", type=str, default=None,
+                        help="SQLite cache of tagged annotations, re-runs "
+                             "only tag documents and stages that changed")
+    parser.add_argument("--cache_version", type=str, default=None,
+                        help="change to invalidate the cache, e.g., after "
+                             "editing helper modules of taggers")
+    parser.add_argument("--run_dir", type=str, default=None,
+                        help="checkpoint each completed block here, "
+                             "restarting resumes the run")
+    parser.add_argument("--block_size", type=int, default=100,
+                        help="documents per tagging task")
     parser.add_argument("--concepts", type=str, default="umls_merged")
     args = parser.parse_args()
 
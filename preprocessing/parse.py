@@ -1,12 +1,15 @@
 import re
 import sys
 import glob
+import gzip
 import json
 import time
 import logging
 import argparse
+import numpy as np
 import pandas as pd
 from pathlib import Path
+from collections import defaultdict
 from joblib import Parallel, delayed
 from functools import partial
 from spacy.util import minibatch
@@ -31,13 +34,117 @@ def timeit(f):
 
     return timed
 
+class BlockGzipWriter(object):
+    """
+    Write text as a sequence of independent gzip members of about
+    `block_size` uncompressed bytes. The output is a standard (multi-member)
+    gzip file, but readers can seek to any member and decompress just that
+    block (see `rwe.dataloaders.DocumentIndex`).
+    """
+    def __init__(self, fpath, block_size=1 << 16):
+        self.fp = open(fpath, 'wb')
+        self.block_size = block_size
+        self.buffer, self.size = [], 0
+
+    def write(self, text: str):
+        data = text.encode('utf8')
+        self.buffer.append(data)
+        self.size += len(data)
+        if self.size >= self.block_size and data.endswith(b'\n'):
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.fp.write(gzip.compress(b''.join(self.buffer)))
+            self.buffer, self.size = [], 0
+
+    def close(self):
+        self.flush()
+        self.fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def write_npz_shard(records, out_path):
+    """
+    Write parsed documents as a columnar npz shard. Each record
+    is a dict of document `name`, `metadata`, `text` and `sentences` (as
+    generated by `parse_doc`). Words are stored as int32 character offsets
+    and lengths into the document text, other token columns (pos_tags,
+    lemmas, etc.) as int32 codes with a vocabulary per column. Members are
+    stored uncompressed, so `load_columnar` can memory map them.
+
+    :param records:
+    :param out_path:
+    :return:
+    """
+    names, metadata, texts = [], [], []
+    text_ptr, doc_sent_ptr, sent_tok_ptr = [0], [0], [0]
+    sent_i, tok_start, tok_len = [], [], []
+    columns = defaultdict(list)
+
+    for rec in records:
+        text = rec['text']
+        names.append(str(rec['name']))
+        metadata.append(json.dumps(rec['metadata']))
+        texts.append(text.encode('utf8'))
+        text_ptr.append(text_ptr[-1] + len(texts[-1]))
+
+        for sent in rec['sentences']:
+            words, offsets = sent['words'], sent['abs_char_offsets']
+            for w, i in zip(words, offsets):
+                if text[i:i + len(w)] != w:
+                    raise ValueError(f"Token '{w}' does not match text at "
+                                     f"offset {i} of {rec['name']}")
+            sent_i.append(sent['i'])
+            tok_start.extend(offsets)
+            tok_len.extend(len(w) for w in words)
+            for key, values in sent.items():
+                if key not in {'words', 'abs_char_offsets', 'i'}:
+                    columns[key].extend(values)
+            sent_tok_ptr.append(len(tok_start))
+        doc_sent_ptr.append(len(sent_i))
+
+    arrays = {}
+    for key, values in columns.items():
+        if len(values) != len(tok_start):
+            raise ValueError(f"Column '{key}' is not defined for all tokens")
+        if values and isinstance(values[0], str):
+            vocab, codes = np.unique(np.array(values, dtype=str),
+                                     return_inverse=True)
+            arrays[f'vocab_{key}'] = vocab
+            arrays[f'col_{key}'] = codes.astype(np.int32)
+        else:
+            arrays[f'col_{key}'] = np.array(values, dtype=np.int32)
+
+    np.savez(
+        out_path,
+        names=np.array(names, dtype=str),
+        metadata=np.array(metadata, dtype=str),
+        text=np.frombuffer(b''.join(texts), dtype=np.uint8),
+        text_ptr=np.array(text_ptr, dtype=np.int64),
+        doc_sent_ptr=np.array(doc_sent_ptr, dtype=np.int64),
+        sent_i=np.array(sent_i, dtype=np.int32),
+        sent_tok_ptr=np.array(sent_tok_ptr, dtype=np.int64),
+        tok_start=np.array(tok_start, dtype=np.int32),
+        tok_len=np.array(tok_len, dtype=np.int32),
+        **arrays
+    )
+
+
 def transform_texts(nlp,
                     batch_id,
                     corpus,
                     output_dir: str,
                     disable: Set[str] = None,
                     prefix: str = '',
-                    keep_whitespace: bool = False):
+                    keep_whitespace: bool = False,
+                    block_gzip: bool = False,
+                    fmt: str = 'json'):
     """
 
     :param nlp:
@@ -46,13 +153,36 @@ def transform_texts(nlp,
     :param output_dir:
     :param disable:
     :param prefix:
+    :param block_gzip: write block gzip compressed JSON (*.json.gz)
+    :param fmt: output format, json lines or columnar npz shards (json|npz)
     :return:
     """
     out_path = Path(output_dir) / (
         f"{prefix + '.' if prefix else ''}{batch_id}.json")
     print("Processing batch", batch_id)
 
-    with out_path.open("w", encoding="utf8") as f:
+    if fmt == 'npz':
+        doc_names, texts, metadata = zip(*corpus)
+        records = (
+            {'name': str(doc_names[i]),
+             'metadata': metadata[i],
+             'text': doc.text,
+             'sentences': parse_doc(doc,
+                                    disable=disable,
+                                    keep_whitespace=keep_whitespace)}
+            for i, doc in enumerate(nlp.pipe(texts))
+        )
+        write_npz_shard(records, out_path.with_suffix('.npz'))
+        print("Saved {} texts to NPZ {}".format(len(texts), batch_id))
+        return
+
+    if block_gzip:
+        out_path = out_path.with_suffix('.json.gz')
+        fopen = BlockGzipWriter(out_path)
+    else:
+        fopen = out_path.open("w", encoding="utf8")
+
+    with fopen as f:
         doc_names, texts, metadata = zip(*corpus)
         for i, doc in enumerate(nlp.pipe(texts)):
             sents = list(parse_doc(doc,
@@ -121,7 +251,8 @@ def main(args):
                         prefer="processes")
     do = delayed(partial(transform_texts, nlp))
     tasks = (do(i, batch, args.outputdir, args.disable,
-                args.prefix, args.keep_whitespace) \
+                args.prefix, args.keep_whitespace, args.block_gzip,
+                args.output_fmt) \
              for i, batch in enumerate(partitions))
     executor(tasks)
 
@@ -145,6 +276,10 @@ if __name__ == '__main__':
                            help="disable spaCy components")
     argparser.add_argument("--keep_whitespace", action='store_true',
                            help='retain whitespace tokens')
+    argparser.add_argument("--block_gzip", action='store_true',
+                           help='write seekable block gzip JSON (*.json.gz)')
+    argparser.add_argument("--output_fmt", type=str, default="json",
+                           help="output format (json|npz)")
 
     argparser.add_argument("-m", "--max_sent_len", type=int, default=150,
                            help='Max sentence length (in words)')
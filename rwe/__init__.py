@@ -1,2 +1,4 @@
 from .contexts import Document, Sentence, Span, Relation
-from .dataloaders import dataloader
\ No newline at end of file
+from .dataloaders import (dataloader, stream_documents, LazyDocument,
+                          DocumentIndex, build_document_index, load_documents)
+from .writers import PartitionedWriter
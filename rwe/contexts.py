@@ -1,4 +1,5 @@
-from typing import Tuple, List, Dict
+from bisect import bisect_left, bisect_right
+from typing import Tuple, List, Dict, Iterable
 
 
 class Document(object):
@@ -22,25 +23,76 @@ class Document(object):
             t += s.text
         return t
 
+    def span_index(self, layers: Iterable[str] = None) -> 'SpanIndex':
+        """
+        Interval index of all spans currently in annotation `layers`
+        (default all), built in O(n log n). The index is a snapshot: it
+        isn't updated when taggers later write layers, so build it once
+        per `tag` call, after the layers it should cover (or `add` spans).
+        """
+        return SpanIndex(
+            item for i in self.annotations
+            for name, items in self.annotations[i].items()
+            if layers is None or name in layers
+            for item in items if isinstance(item, Span)
+        )
+
     def __repr__(self) -> str:
         return "Document({})".format(self.name)
 
 
 class Sentence(object):
+    """
+    Tokenized sentence. `words`, `abs_char_offsets` and `i` (the sentence
+    position) are always defined; other token attributes (e.g., `pos_tags`,
+    `lemmas`) are set from keyword arguments. `text` and `char_offsets`
+    are computed once and cached until `words` or `abs_char_offsets` are
+    reassigned.
+    """
+    __slots__ = ('document', 'i', '_words', '_abs_char_offsets', '_text',
+                 '_char_offsets', '__dict__')
 
     def __init__(self, **kwargs) -> None:
         self.document = None
-        self.__dict__.update(kwargs)
+        self._words = None
+        self._abs_char_offsets = None
+        self._text = None
+        self._char_offsets = None
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+    @property
+    def words(self) -> List[str]:
+        return self._words
+
+    @words.setter
+    def words(self, words: List[str]):
+        self._words = words
+        self._text = None
+
+    @property
+    def abs_char_offsets(self) -> List[int]:
+        return self._abs_char_offsets
+
+    @abs_char_offsets.setter
+    def abs_char_offsets(self, offsets: List[int]):
+        self._abs_char_offsets = offsets
+        self._text = None
+        self._char_offsets = None
 
     @property
     def text(self) -> str:
-        txt = ""
-        offset = self.abs_char_offsets[0]
-        for i, w in enumerate(self.words):
-            if len(txt) != self.abs_char_offsets[i] - offset:
-                txt += ' ' * (self.abs_char_offsets[i] - offset - len(txt))
-            txt += w
-        return txt
+        if self._text is None:
+            words, offsets = self.words, self.abs_char_offsets
+            pieces, n = [], offsets[0]
+            for w, i in zip(words, offsets):
+                if i > n:
+                    pieces.append(' ' * (i - n))
+                    n = i
+                pieces.append(w)
+                n += len(w)
+            self._text = ''.join(pieces)
+        return self._text
 
     @property
     def position(self) -> int:
@@ -48,8 +100,24 @@ class Sentence(object):
 
     @property
     def char_offsets(self) -> List[int]:
-        offset = self.abs_char_offsets[0]
-        return [i - offset for i in self.abs_char_offsets]
+        if self._char_offsets is None:
+            offset = self.abs_char_offsets[0]
+            self._char_offsets = [i - offset for i in self.abs_char_offsets]
+        return self._char_offsets
+
+    def __getstate__(self) -> Dict:
+        state = dict(self.__dict__)
+        state['document'] = self.document
+        state['i'] = getattr(self, 'i', None)
+        state['words'] = self.words
+        state['abs_char_offsets'] = self.abs_char_offsets
+        return state
+
+    def __setstate__(self, state) -> None:
+        # (dict, slots) state of copies made without __getstate__
+        if isinstance(state, tuple):
+            state = {**(state[0] or {}), **state[1]}
+        self.__init__(**state)
 
     def __repr__(self) -> str:
         max_len = 25
@@ -59,6 +127,13 @@ class Sentence(object):
 
 
 class Span(object):
+    """
+    Character span of a sentence (`char_end` is inclusive). `props` is
+    allocated on first access and the hash is computed once, so unmatched
+    candidate spans stay cheap.
+    """
+    __slots__ = ('sentence', 'char_start', 'char_end', 'attrib', 'normalized',
+                 '_props', '_hash', '_word_start', '_word_end')
 
     def __init__(self,
                  char_start: int,
@@ -69,14 +144,46 @@ class Span(object):
         self.char_start = char_start
         self.char_end   = char_end
         self.attrib     = attrib
-        self.props      = {}
         self.normalized = None
+        self._props      = None
+        self._hash       = None
+        self._word_start = None
+        self._word_end   = None
+
+    @property
+    def props(self) -> Dict:
+        if self._props is None:
+            self._props = {}
+        return self._props
+
+    @props.setter
+    def props(self, props: Dict):
+        self._props = props
+
+    def __getstate__(self) -> Dict:
+        # str hashes differ across interpreters, so the hash isn't pickled
+        return {'sentence': self.sentence,
+                'char_start': self.char_start,
+                'char_end': self.char_end,
+                'attrib': self.attrib,
+                'normalized': self.normalized,
+                'props': self._props}
+
+    def __setstate__(self, state) -> None:
+        # (dict, slots) state of copies made without __getstate__
+        if isinstance(state, tuple):
+            state = {**(state[0] or {}), **state[1]}
+        self.__init__(state['char_start'], state['char_end'],
+                      state['sentence'], state.get('attrib', 'words'))
+        self.normalized = state.get('normalized')
+        self._props = state.get('props', state.get('_props'))
 
     def __hash__(self):
-        v = (self.sentence.document.name,
-             self.abs_char_start,
-             self.abs_char_end)
-        return hash(v)
+        if self._hash is None:
+            self._hash = hash((self.sentence.document.name,
+                               self.abs_char_start,
+                               self.abs_char_end))
+        return self._hash
 
     def __eq__(self, other):
         return False if self.__hash__() != other.__hash__() else True
@@ -94,30 +201,32 @@ class Span(object):
         return self.sentence.text[self.char_start:self.char_end + 1]
 
     def get_word_start(self):
-        return self.char_to_word_index(self.char_start)
+        if self._word_start is None:
+            self._word_start = self.char_to_word_index(self.char_start)
+        return self._word_start
 
     def get_word_end(self):
-        return self.char_to_word_index(self.char_end)
+        if self._word_end is None:
+            self._word_end = self.char_to_word_index(self.char_end)
+        return self._word_end
 
     def get_n(self):
         return self.get_word_end() - self.get_word_start() + 1
 
     def char_to_word_index(self, ci):
         """Given a character-level index (offset), return the index of the **word this char is in**"""
-        i = None
-        for i, co in enumerate(self.sentence.char_offsets):
-            if ci == co:
-                return i
-            elif ci < co:
-                return i-1
-        return i
+        offsets = self.sentence.char_offsets
+        if not offsets:
+            return None
+        i = bisect_left(offsets, ci)
+        return i if i < len(offsets) and offsets[i] == ci else i - 1
 
     def word_to_char_index(self, wi):
         """Given a word-level index, return the character-level index (offset) of the word's start"""
         return self.sentence.char_offsets[wi]
 
     def get_attrib_tokens(self, a):
-        return self.sentence.__getattribute__(a)[self.get_word_start():self.get_word_end() + 1]
+        return getattr(self.sentence, a)[self.get_word_start():self.get_word_end() + 1]
     
     def __repr__(self):
         return "Span({})".format(self.text.replace("\n"," "))
@@ -173,6 +282,143 @@ class Relation(object):
 
 
 
+class SpanIndex(object):
+    """
+    Spans sorted by absolute char offsets, supporting overlap, containment
+    and nearest neighbor queries. Query offsets are absolute and inclusive,
+    like `Span.abs_char_start` / `abs_char_end`.
+
+    A segment tree over the sorted spans stores the max and min end offset
+    of each node, so queries only descend into nodes that can hold a match
+    and take O((k + 1) log n) for k results, however long the indexed
+    spans are (e.g., sections). `add` inserts a span in O(n) and the trees
+    are rebuilt, in O(n), by the next query.
+    """
+    def __init__(self, spans: Iterable[Span] = ()) -> None:
+        items = sorted(((s.abs_char_start, s.abs_char_end, k, s)
+                        for k, s in enumerate(spans)), key=lambda x: x[:3])
+        self._starts = [x[0] for x in items]
+        self._ends = [x[1] for x in items]
+        self._spans = [x[3] for x in items]
+        self._max_end = None
+        self._min_end = None
+
+    def __len__(self) -> int:
+        return len(self._spans)
+
+    def __iter__(self):
+        return iter(self._spans)
+
+    def add(self, span: Span) -> None:
+        start, end = span.abs_char_start, span.abs_char_end
+        k = bisect_right(self._starts, start)
+        while k > 0 and self._starts[k - 1] == start and \
+                self._ends[k - 1] > end:
+            k -= 1
+        self._starts.insert(k, start)
+        self._ends.insert(k, end)
+        self._spans.insert(k, span)
+        self._max_end = None
+        self._min_end = None
+
+    def _build(self) -> None:
+        size = 1
+        while size < len(self._ends):
+            size *= 2
+        self._size = size
+        self._max_end = [float('-inf')] * (2 * size)
+        self._min_end = [float('inf')] * (2 * size)
+        self._max_end[size:size + len(self._ends)] = self._ends
+        self._min_end[size:size + len(self._ends)] = self._ends
+        for v in range(size - 1, 0, -1):
+            self._max_end[v] = max(self._max_end[2 * v],
+                                   self._max_end[2 * v + 1])
+            self._min_end[v] = min(self._min_end[2 * v],
+                                   self._min_end[2 * v + 1])
+
+    def _search(self, lo: int, hi: int,
+                min_end: float = float('-inf'),
+                max_end: float = float('inf'),
+                first: bool = False) -> List[int]:
+        """Positions k in [lo, hi), in order, with min_end <= end <= max_end"""
+        if self._max_end is None:
+            self._build()
+        found = []
+        stack = [(1, 0, self._size)]
+        while stack:
+            v, a, b = stack.pop()
+            if b <= lo or a >= hi or self._max_end[v] < min_end or \
+                    self._min_end[v] > max_end:
+                continue
+            if b - a == 1:
+                found.append(a)
+                if first:
+                    break
+                continue
+            m = (a + b) // 2
+            stack.append((2 * v + 1, m, b))
+            stack.append((2 * v, a, m))
+        return found
+
+    def _last_end(self, hi: int) -> float:
+        """Max end of the spans at positions [0, hi)"""
+        if self._max_end is None:
+            self._build()
+        last = float('-inf')
+        a, b = self._size, self._size + hi
+        while a < b:
+            if a & 1:
+                last = max(last, self._max_end[a])
+                a += 1
+            if b & 1:
+                b -= 1
+                last = max(last, self._max_end[b])
+            a //= 2
+            b //= 2
+        return last
+
+    def overlapping(self, start: int, end: int) -> List[Span]:
+        """Spans sharing at least one char with [start, end]"""
+        hi = bisect_right(self._starts, end)
+        return [self._spans[k] for k in self._search(0, hi, min_end=start)]
+
+    def contained_in(self, start: int, end: int) -> List[Span]:
+        """Spans within [start, end]"""
+        lo = bisect_left(self._starts, start)
+        hi = bisect_right(self._starts, end)
+        return [self._spans[k] for k in self._search(lo, hi, max_end=end)]
+
+    def containing(self, start: int, end: int) -> List[Span]:
+        """Spans that cover all of [start, end]"""
+        hi = bisect_right(self._starts, start)
+        return [self._spans[k] for k in self._search(0, hi, min_end=end)]
+
+    def nearest(self, start: int, end: int) -> Span:
+        """
+        Span with the fewest chars between it and [start, end], 0 if they
+        overlap. Ties go to the span that starts first. None if empty.
+        """
+        hi = bisect_right(self._starts, end)
+        overlaps = self._search(0, hi, min_end=start, first=True)
+        if overlaps:
+            return self._spans[overlaps[0]]
+
+        # first span starting right of the query
+        best, best_dist = None, None
+        if hi < len(self._starts):
+            best, best_dist = hi, self._starts[hi] - end
+
+        # spans starting left of the query end before it, so the nearest
+        # of them is the first one with the largest end
+        lo = bisect_left(self._starts, start)
+        if lo > 0:
+            last = self._last_end(lo)
+            k = self._search(0, lo, min_end=last, first=True)[0]
+            if best_dist is None or start - last <= best_dist:
+                best = k
+        return None if best is None else self._spans[best]
+
+
 class Annotation(object):
 
     def __init__(self, doc_name: str,
@@ -1,8 +1,37 @@
+import os
 import glob
 import gzip
 import json
+import mmap
+import zlib
+import heapq
+import random
+import struct
+import hashlib
+import zipfile
+import multiprocessing
+import numpy as np
+from collections import deque
+from itertools import islice
 from .contexts import Document, Sentence
-from typing import Tuple, List, Dict
+from typing import Tuple, List, Dict, Iterator, Iterable, Union
+
+try:
+    import orjson
+    _fast_loads = orjson.loads
+except ImportError:
+    _fast_loads = None
+
+
+def json_loads(line):
+    """Decode one JSON line, using orjson when installed"""
+    if _fast_loads is not None:
+        try:
+            return _fast_loads(line)
+        except ValueError:
+            # e.g., NaN/Infinity literals, which only stdlib json accepts
+            pass
+    return json.loads(line)
 
 def parse_doc(d) -> Document:
     """Convert JSON into container objects. Most time is spent loading JSON.
@@ -24,22 +53,851 @@ def parse_doc(d) -> Document:
             doc.props[key] = value
     return doc
 
-def dataloader(filelist: List[str]) -> List[Document]:
+_decoder = json.JSONDecoder()
+
+def _skip_ws(text: str, idx: int) -> int:
+    while text[idx] in ' \t\n\r':
+        idx += 1
+    return idx
+
+def scan_metadata(line: bytes) -> Tuple[str, Dict]:
+    """Decode the document name and metadata of a JSON line, without
+    decoding sentences when they follow both fields (as written by
+    `preprocessing/parse.py`).
+
+    Parameters
+    ----------
+    line
+        JSON encoded document
+
+    Returns
+    -------
+    (name, metadata) tuple
+    """
+    text = line.decode('utf-8') if isinstance(line, bytes) else line
+    fields = {}
+    try:
+        idx = _skip_ws(text, 0)
+        if text[idx] != '{':
+            raise ValueError()
+        idx += 1
+        while len(fields) < 2:
+            idx = _skip_ws(text, idx)
+            key, idx = _decoder.raw_decode(text, idx)
+            idx = _skip_ws(text, idx)
+            if text[idx] != ':' or key not in ('name', 'metadata'):
+                raise ValueError()
+            idx += 1
+            idx = _skip_ws(text, idx)
+            fields[key], idx = _decoder.raw_decode(text, idx)
+            idx = _skip_ws(text, idx)
+            if text[idx] != ',':
+                break
+            idx += 1
+    except (ValueError, IndexError):
+        fields = None
+
+    if fields is None or 'name' not in fields:
+        d = json_loads(line)
+        fields = {'name': d['name'], 'metadata': d.get('metadata', {})}
+    return fields['name'], fields.get('metadata', {})
+
+
+class LazyDocument(Document):
+    """Document that keeps its raw JSON line and only builds sentences on
+    first access of `sentences` or `annotations`. `name` and `props` are
+    available without decoding sentences, which makes unmaterialized
+    documents a cheap metadata view for filtering and sampling.
+    """
+    def __init__(self, raw: bytes) -> None:
+        self._raw = raw
+        self._sentences = None
+        self._annotations = None
+        self.name, metadata = scan_metadata(raw)
+        self.props = {}
+        for key, value in (metadata or {}).items():
+            self.props[key] = value
+
+    @property
+    def is_materialized(self) -> bool:
+        return self._sentences is not None
+
+    def _materialize(self):
+        d = json_loads(self._raw)
+        self._sentences = [Sentence(**s) for s in d['sentences']]
+        for s in self._sentences:
+            s.document = self
+        if self._annotations is None:
+            self._annotations = {i: {} for i in range(len(self._sentences))}
+        self._raw = None
+
+    @property
+    def sentences(self) -> List[Sentence]:
+        if self._sentences is None:
+            self._materialize()
+        return self._sentences
+
+    @sentences.setter
+    def sentences(self, sentences: List[Sentence]):
+        self._sentences = sentences
+        self._raw = None
+
+    @property
+    def annotations(self) -> Dict:
+        if self._annotations is None:
+            self._materialize()
+        return self._annotations
+
+    @annotations.setter
+    def annotations(self, annotations: Dict):
+        self._annotations = annotations
+
+
+def parse_docs(lines: List[bytes], lazy: bool = False) -> List[Document]:
+    """Decode a batch of JSON lines into Document objects
+
+    Parameters
+    ----------
+    lines
+        JSON encoded documents, one per line
+    lazy
+        return `LazyDocument` objects that decode sentences on access
+
+    Returns
+    -------
+
+    """
+    if lazy:
+        return [LazyDocument(line) for line in lines]
+    return [parse_doc(json_loads(line)) for line in lines]
+
+def _open(fpath: str):
+    fopen = gzip.open if fpath.split(".")[-1] == 'gz' else open
+    return fopen(fpath, 'rb')
+
+def _iter_batches(fpath: str, batch_size: int) -> Iterator[List[bytes]]:
+    with _open(fpath) as fp:
+        while True:
+            lines = list(islice(fp, batch_size))
+            if not lines:
+                break
+            yield lines
+
+def load_file(fpath: str,
+              batch_size: int = 1000,
+              lazy: bool = False) -> List[Document]:
+    """Load all documents in a (compressed) JSON file or columnar npz shard
+
+    Parameters
+    ----------
+    fpath
+    batch_size
+        number of lines decoded per batch
+    lazy
+        return `LazyDocument` objects that decode sentences on access
+
+    Returns
+    -------
+
+    """
+    if fpath.split(".")[-1] == 'npz':
+        return load_columnar(fpath)
+    docs = []
+    for lines in _iter_batches(fpath, batch_size):
+        docs.extend(parse_docs(lines, lazy))
+    return docs
+
+def stream_documents(filelist: List[str],
+                     num_workers: int = 1,
+                     batch_size: int = 1000,
+                     lazy: bool = False) -> Iterator[Document]:
+    """Lazily load compressed JSON files, one document at a time. With
+    `num_workers` > 1, the parent reads batches of `batch_size` lines and
+    worker processes decode them, so even a single large file is decoded in
+    parallel. Documents are yielded in file and line order, and at most
+    2 * `num_workers` batches are pending at a time. Columnar npz shards
+    (*.npz) are loaded with `load_columnar`. `lazy` documents only scan
+    metadata, so they are always decoded in the parent process.
+
+    Parameters
+    ----------
+    filelist
+    num_workers
+        number of worker processes used to decode line batches
+    batch_size
+        number of lines decoded per batch
+    lazy
+        yield `LazyDocument` objects that decode sentences on access
+
+    Returns
+    -------
+
+    """
+    if num_workers <= 1 or lazy:
+        for fpath in filelist:
+            if fpath.split(".")[-1] == 'npz':
+                yield from load_columnar(fpath)
+                continue
+            for lines in _iter_batches(fpath, batch_size):
+                yield from parse_docs(lines, lazy)
+        return
+
+    with multiprocessing.Pool(num_workers) as pool:
+        pending = deque()
+        for fpath in filelist:
+            if fpath.split(".")[-1] == 'npz':
+                while pending:
+                    yield from pending.popleft().get()
+                yield from load_columnar(fpath)
+                continue
+            for lines in _iter_batches(fpath, batch_size):
+                pending.append(pool.apply_async(parse_docs, (lines,)))
+                if len(pending) >= 2 * num_workers:
+                    yield from pending.popleft().get()
+        while pending:
+            yield from pending.popleft().get()
+
+def dataloader(filelist: List[str],
+               num_workers: int = 1,
+               batch_size: int = 1000,
+               lazy: bool = False) -> List[Document]:
     """Load compressed JSON files
 
     Parameters
     ----------
     filelist
+    num_workers
+        number of worker processes used to decode line batches
+    batch_size
+        number of lines decoded per batch
+    lazy
+        return `LazyDocument` objects that decode sentences on access
+
+    Returns
+    -------
+
+    """
+    return list(stream_documents(filelist, num_workers, batch_size, lazy))
+
+def mmap_npz(fpath: str) -> Dict[str, np.ndarray]:
+    """Arrays of an npz file. Uncompressed members (`np.savez`) are
+    read-only views of a memory map of the file, other members are read
+    into memory.
+
+    Parameters
+    ----------
+    fpath
+
+    Returns
+    -------
+
+    """
+    arrays = {}
+    with zipfile.ZipFile(fpath) as zf, open(fpath, 'rb') as fp:
+        mm = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        for info in zf.infolist():
+            key = info.filename[:-4] if info.filename.endswith('.npy') \
+                else info.filename
+            if info.compress_type == zipfile.ZIP_STORED:
+                # data follows the local file header, name and extra field
+                pos = info.header_offset
+                name_len, extra_len = struct.unpack('<HH',
+                                                    mm[pos + 26:pos + 30])
+                fp.seek(pos + 30 + name_len + extra_len)
+                version = np.lib.format.read_magic(fp)
+                if version in {(1, 0), (2, 0)}:
+                    read_header = np.lib.format.read_array_header_1_0 \
+                        if version == (1, 0) else \
+                        np.lib.format.read_array_header_2_0
+                    shape, fortran, dtype = read_header(fp)
+                    if not dtype.hasobject:
+                        count = int(np.prod(shape))
+                        values = np.frombuffer(mm, dtype=dtype, count=count,
+                                               offset=fp.tell())
+                        arrays[key] = values.reshape(
+                            shape, order='F' if fortran else 'C')
+                        continue
+            with zf.open(info) as member:
+                arrays[key] = np.lib.format.read_array(member)
+    return arrays
+
+
+class ColumnarShard(object):
+    """Arrays of a columnar npz corpus shard (see `write_npz_shard` in
+    `preprocessing/parse.py`), memory mapped if the shard is uncompressed.
+    Document text is decoded once per document, on first access.
+    """
+    def __init__(self, fpath: str) -> None:
+        arrays = mmap_npz(fpath)
+        self.names = arrays.pop('names').tolist()
+        self.metadata = arrays.pop('metadata').tolist()
+        self.text = arrays.pop('text')
+        self.text_ptr = arrays.pop('text_ptr')
+        self.doc_sent_ptr = arrays.pop('doc_sent_ptr').tolist()
+        self.sent_i = arrays.pop('sent_i').tolist()
+        self.sent_tok_ptr = arrays.pop('sent_tok_ptr').tolist()
+        self.tok_start = arrays.pop('tok_start')
+        self.tok_len = arrays.pop('tok_len')
+        self.columns = {key[4:]: arrays[key] for key in arrays
+                        if key.startswith('col_')}
+        self.vocabs = {key[6:]: arrays[key].tolist() for key in arrays
+                       if key.startswith('vocab_')}
+        self._texts = {}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def doc_text(self, d: int) -> str:
+        if d not in self._texts:
+            a, b = self.text_ptr[d], self.text_ptr[d + 1]
+            self._texts[d] = self.text[a:b].tobytes().decode('utf-8')
+        return self._texts[d]
+
+    def document(self, d: int) -> Document:
+        sents = [ColumnarSentence(self, d, k) for k in
+                 range(self.doc_sent_ptr[d], self.doc_sent_ptr[d + 1])]
+        doc = Document(self.names[d], sents)
+        for key, value in json_loads(self.metadata[d]).items():
+            doc.props[key] = value
+        return doc
+
+
+class ColumnarSentence(Sentence):
+    """Sentence backed by the token arrays of a `ColumnarShard`.
+    `abs_char_offsets` and integer token columns are views of the shard
+    arrays; words and dictionary encoded columns are decoded on first
+    access. Pickled (or copied) sentences become plain `Sentence` objects
+    holding only their own tokens.
+    """
+    def __init__(self, shard: ColumnarShard, d: int, k: int) -> None:
+        super().__init__(i=shard.sent_i[k])
+        self._shard = shard
+        self._d = d
+        self._k = k
+        a, b = self._range()
+        self._abs_char_offsets = shard.tok_start[a:b]
+
+    def _range(self) -> Tuple[int, int]:
+        return self._shard.sent_tok_ptr[self._k], \
+               self._shard.sent_tok_ptr[self._k + 1]
+
+    @property
+    def abs_char_offsets(self) -> np.ndarray:
+        return self._abs_char_offsets
+
+    @abs_char_offsets.setter
+    def abs_char_offsets(self, offsets):
+        Sentence.abs_char_offsets.fset(self, offsets)
+
+    @property
+    def words(self) -> List[str]:
+        if self._words is None:
+            a, b = self._range()
+            text = self._shard.doc_text(self._d)
+            self._words = [text[i:i + n] for i, n in
+                           zip(self._shard.tok_start[a:b].tolist(),
+                               self._shard.tok_len[a:b].tolist())]
+        return self._words
+
+    @words.setter
+    def words(self, words: List[str]):
+        Sentence.words.fset(self, words)
+
+    @property
+    def char_offsets(self) -> List[int]:
+        if self._char_offsets is None:
+            offsets = self._abs_char_offsets
+            self._char_offsets = (offsets - offsets[0]).tolist()
+        return self._char_offsets
+
+    def __getattr__(self, name):
+        shard = self.__dict__.get('_shard')
+        if shard is None or name not in shard.columns:
+            raise AttributeError(name)
+        a, b = self._range()
+        values = shard.columns[name][a:b]
+        if name in shard.vocabs:
+            vocab = shard.vocabs[name]
+            values = [vocab[c] for c in values.tolist()]
+        self.__dict__[name] = values
+        return values
+
+    def __reduce__(self):
+        state = {'document': self.document,
+                 'i': self.i,
+                 'words': self.words,
+                 'abs_char_offsets': self.abs_char_offsets.tolist()}
+        for name in self._shard.columns:
+            values = getattr(self, name)
+            state[name] = values.tolist() if isinstance(values, np.ndarray) \
+                else values
+        return (Sentence, (), state)
+
+
+def load_columnar(fpath: str) -> List[Document]:
+    """Load all documents of a columnar npz corpus shard
+
+    Parameters
+    ----------
+    fpath
 
     Returns
     -------
 
     """
-    documents = []
-    for fpath in filelist:
-        fopen = gzip.open if fpath.split(".")[-1] == 'gz' else open
-        with fopen(fpath,'rb') as fp:
-            for line in fp:
-                doc = parse_doc(json.loads(line))
-                documents.append(doc)
-    return documents
+    shard = ColumnarShard(fpath)
+    return [shard.document(d) for d in range(len(shard))]
+
+def _plain_lines(fp) -> Iterator[Tuple[int, int, bytes]]:
+    offset = 0
+    for line in fp:
+        yield (-1, offset, line)
+        offset += len(line)
+
+def _gzip_lines(fp, chunk_size: int = 1 << 20) -> Iterator[Tuple[int, int, bytes]]:
+    """Iterate over the lines of a (multi-member) gzip file, yielding the
+    compressed offset of the member where each line starts, the line's
+    offset within that member's decompressed data, and the line
+
+    Parameters
+    ----------
+    fp
+        binary file object of the compressed file
+    chunk_size
+        number of compressed bytes read at a time
+
+    Returns
+    -------
+
+    """
+    d = zlib.decompressobj(wbits=31)
+    member, pos = 0, 0      # current member start, compressed bytes read
+    offset = 0              # decompressed bytes of the current member
+    line, line_start = [], None
+    data = fp.read(chunk_size)
+    while data:
+        buf = d.decompress(data)
+        start = 0
+        while start < len(buf):
+            if line_start is None:
+                line_start = (member, offset + start)
+            end = buf.find(b'\n', start)
+            if end == -1:
+                line.append(buf[start:])
+                break
+            line.append(buf[start:end + 1])
+            yield line_start + (b''.join(line),)
+            line, line_start = [], None
+            start = end + 1
+        offset += len(buf)
+
+        if d.eof:
+            unused = d.unused_data
+            pos += len(data) - len(unused)
+            member, offset = pos, 0
+            d = zlib.decompressobj(wbits=31)
+            data = unused if unused.strip(b'\x00') else fp.read(chunk_size)
+        else:
+            pos += len(data)
+            data = fp.read(chunk_size)
+    if line:
+        yield line_start + (b''.join(line),)
+
+def _read_gzip_range(fp, block: int, offset: int, length: int,
+                     chunk_size: int = 1 << 16) -> bytes:
+    """Read `length` decompressed bytes starting `offset` bytes into the
+    gzip member at compressed offset `block`, continuing into following
+    members if needed
+
+    Parameters
+    ----------
+    fp
+    block
+    offset
+    length
+    chunk_size
+
+    Returns
+    -------
+
+    """
+    fp.seek(block)
+    d = zlib.decompressobj(wbits=31)
+    out, n, skip, pending = [], 0, offset, b''
+    while n < length:
+        if d.eof:
+            pending = d.unused_data
+            d = zlib.decompressobj(wbits=31)
+        data = pending or fp.read(chunk_size)
+        pending = b''
+        if not data:
+            raise EOFError(f'Unexpected end of {fp.name} at block {block}')
+        buf = d.decompress(data)
+        if skip:
+            drop = min(skip, len(buf))
+            buf, skip = buf[drop:], skip - drop
+        buf = buf[:length - n]
+        out.append(buf)
+        n += len(buf)
+    return b''.join(out)
+
+def _name_hash(name: str) -> int:
+    return int.from_bytes(
+        hashlib.blake2b(name.encode('utf-8'), digest_size=8).digest(),
+        'little')
+
+
+class DocumentIndex(object):
+    """Sidecar index of the shard, byte offset and length of each document
+    in a collection of JSON (*.json) or gzip compressed JSON (*.json.gz)
+    files, for loading documents by name without reading whole shards.
+
+    Records of gzip shards store the compressed offset of the gzip member
+    where the document starts, and its offset within the decompressed
+    member. Block gzip shards (many small members, see
+    `preprocessing/parse.py --block_gzip`) are read by decompressing just
+    the needed members; single member gzip files are valid, but reading a
+    document decompresses the shard up to that document.
+    """
+    def __init__(self, shards, hashes, shard, block, offset, length):
+        self.shards = list(shards)
+        self.hashes = hashes
+        self.shard = shard
+        self.block = block
+        self.offset = offset
+        self.length = length
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    @classmethod
+    def build(cls, filelist: List[str]) -> 'DocumentIndex':
+        """Scan JSON files and record the location of each document
+
+        Parameters
+        ----------
+        filelist
+
+        Returns
+        -------
+
+        """
+        hashes, shard, block, offset, length = [], [], [], [], []
+        for i, fpath in enumerate(filelist):
+            with open(fpath, 'rb') as fp:
+                if fpath.split(".")[-1] == 'gz':
+                    lines = _gzip_lines(fp)
+                else:
+                    lines = _plain_lines(fp)
+                for member, start, line in lines:
+                    if not line.strip():
+                        continue
+                    name, _ = scan_metadata(line)
+                    hashes.append(_name_hash(name))
+                    shard.append(i)
+                    block.append(member)
+                    offset.append(start)
+                    length.append(len(line))
+
+        hashes = np.array(hashes, dtype=np.uint64)
+        order = np.argsort(hashes, kind='stable')
+        return cls(filelist,
+                   hashes[order],
+                   np.array(shard, dtype=np.uint32)[order],
+                   np.array(block, dtype=np.int64)[order],
+                   np.array(offset, dtype=np.int64)[order],
+                   np.array(length, dtype=np.int64)[order])
+
+    def save(self, fpath: str):
+        """Save as an uncompressed .npz file. Shard paths are stored
+        relative to the index file.
+
+        Parameters
+        ----------
+        fpath
+
+        Returns
+        -------
+
+        """
+        root = os.path.dirname(os.path.abspath(fpath))
+        shards = [os.path.relpath(os.path.abspath(s), root)
+                  for s in self.shards]
+        with open(fpath + '.tmp', 'wb') as fp:
+            np.savez(fp,
+                     shards=np.array(shards, dtype=str),
+                     hashes=self.hashes,
+                     shard=self.shard,
+                     block=self.block,
+                     offset=self.offset,
+                     length=self.length)
+        os.replace(fpath + '.tmp', fpath)
+
+    @classmethod
+    def load(cls, fpath: str) -> 'DocumentIndex':
+        root = os.path.dirname(os.path.abspath(fpath))
+        with np.load(fpath) as data:
+            shards = [os.path.join(root, s) for s in data['shards'].tolist()]
+            return cls(shards, data['hashes'], data['shard'], data['block'],
+                       data['offset'], data['length'])
+
+    def lookup(self, name: str) -> List[Tuple[int, int, int, int]]:
+        """All (shard, block, offset, length) records whose name hash
+        matches `name`
+
+        Parameters
+        ----------
+        name
+
+        Returns
+        -------
+
+        """
+        h = np.uint64(_name_hash(name))
+        i = np.searchsorted(self.hashes, h, side='left')
+        j = np.searchsorted(self.hashes, h, side='right')
+        return [(int(self.shard[k]), int(self.block[k]),
+                 int(self.offset[k]), int(self.length[k]))
+                for k in range(i, j)]
+
+    def read(self, fp, block: int, offset: int, length: int) -> bytes:
+        if block < 0:
+            fp.seek(offset)
+            return fp.read(length)
+        return _read_gzip_range(fp, block, offset, length)
+
+    def load_documents(self,
+                       names: Iterable[str],
+                       lazy: bool = False) -> List[Document]:
+        """Load documents by name, reading only their records. Documents are
+        returned in the order of `names`; names that are not indexed are
+        skipped.
+
+        Parameters
+        ----------
+        names
+        lazy
+            return `LazyDocument` objects that decode sentences on access
+
+        Returns
+        -------
+
+        """
+        names = list(names)
+        requests = []
+        for i, name in enumerate(names):
+            for rec in self.lookup(name):
+                requests.append((rec, i))
+
+        # read each shard once, in file order
+        raw = {}
+        requests.sort()
+        handles = {}
+        try:
+            for (shard, block, offset, length), i in requests:
+                if i in raw:
+                    continue
+                if shard not in handles:
+                    handles[shard] = open(self.shards[shard], 'rb')
+                line = self.read(handles[shard], block, offset, length)
+                # skip name hash collisions
+                if scan_metadata(line)[0] == names[i]:
+                    raw[i] = line
+        finally:
+            for fp in handles.values():
+                fp.close()
+
+        missing = len(names) - len(raw)
+        if missing:
+            print(f'Skipped {missing} documents not found in index')
+        return parse_docs([raw[i] for i in range(len(names)) if i in raw],
+                          lazy)
+
+
+def build_document_index(filelist: List[str],
+                         outfpath: str = None) -> DocumentIndex:
+    """Build (and optionally save) a `DocumentIndex` over JSON files
+
+    Parameters
+    ----------
+    filelist
+    outfpath
+        save the index to this path
+
+    Returns
+    -------
+
+    """
+    index = DocumentIndex.build(filelist)
+    if outfpath:
+        index.save(outfpath)
+    return index
+
+def load_documents(names: Iterable[str],
+                   index: Union[str, DocumentIndex],
+                   lazy: bool = False) -> List[Document]:
+    """Load documents by name using a `DocumentIndex` or index file path
+
+    Parameters
+    ----------
+    names
+    index
+    lazy
+        return `LazyDocument` objects that decode sentences on access
+
+    Returns
+    -------
+
+    """
+    if isinstance(index, str):
+        index = DocumentIndex.load(index)
+    return index.load_documents(names, lazy)
+
+def _shard_lines(fp, fpath: str) -> Iterator[Tuple[int, int, bytes]]:
+    if fpath.split(".")[-1] == 'gz':
+        return _gzip_lines(fp)
+    return _plain_lines(fp)
+
+def _sample_shard(shard: int,
+                  fpath: str,
+                  n: int,
+                  seed: int) -> Tuple[int, List[Tuple]]:
+    """Assign each record of a shard a uniform random key and keep the `n`
+    records with the smallest keys, as (key, shard, line, block, offset,
+    length) tuples. Only record locations are kept, not their contents.
+
+    Parameters
+    ----------
+    shard
+        shard number, which seeds the shard's random keys
+    fpath
+    n
+    seed
+
+    Returns
+    -------
+    (number of records, sampled records)
+    """
+    rng = random.Random(f'{seed}:{shard}')
+    heap, count = [], 0
+    with open(fpath, 'rb') as fp:
+        for i, (block, offset, line) in enumerate(_shard_lines(fp, fpath)):
+            if not line.strip():
+                continue
+            count += 1
+            key = rng.random()
+            if len(heap) < n:
+                heapq.heappush(heap, (-key, i, block, offset, len(line)))
+            elif key < -heap[0][0]:
+                heapq.heapreplace(heap, (-key, i, block, offset, len(line)))
+    return count, [(-key, shard, i, block, offset, length)
+                   for key, i, block, offset, length in heap]
+
+def _sample_shard_task(args):
+    return _sample_shard(*args)
+
+def _read_records(fpath: str, records: List[Tuple]) -> List[bytes]:
+    """Read sampled records of a shard, in the order given. Plain and block
+    gzip shards are read by offset; for single member gzip shards, all
+    records are collected in one sequential pass.
+
+    Parameters
+    ----------
+    fpath
+    records
+        (key, shard, line, block, offset, length) tuples
+
+    Returns
+    -------
+
+    """
+    with open(fpath, 'rb') as fp:
+        is_gzip = fpath.split(".")[-1] == 'gz'
+        if not is_gzip or any(r[3] > 0 for r in records):
+            lines = {}
+            for _, _, i, block, offset, length in sorted(records,
+                                                         key=lambda x: x[2]):
+                if block < 0:
+                    fp.seek(offset)
+                    lines[i] = fp.read(length)
+                else:
+                    lines[i] = _read_gzip_range(fp, block, offset, length)
+            return [lines[r[2]] for r in records]
+
+        wanted = {r[2] for r in records}
+        last = max(wanted) if wanted else -1
+        lines = {}
+        for i, (_, _, line) in enumerate(_gzip_lines(fp)):
+            if i in wanted:
+                lines[i] = line
+            if i >= last:
+                break
+        return [lines[r[2]] for r in records]
+
+def sample_documents(filelist: List[str],
+                     n: int,
+                     seed: int = 1234,
+                     num_workers: int = 1,
+                     lazy: bool = False) -> List[Document]:
+    """Uniformly sample `n` documents from JSON files without building
+    Document objects for unsampled records. Every record is given a random
+    key (seeded by `seed` and its shard); each shard keeps its `n` smallest
+    keys and the merged sample is the `n` smallest keys overall, which
+    weights shards by their number of records. Shards are scanned in
+    parallel when `num_workers` > 1. The result is deterministic for a
+    given seed and set of files, and a sample of size k is a prefix of any
+    larger sample.
+
+    Parameters
+    ----------
+    filelist
+    n
+    seed
+    num_workers
+        number of worker processes used to scan shards
+    lazy
+        return `LazyDocument` objects that decode sentences on access
+
+    Returns
+    -------
+    documents, ordered by sampling key
+    """
+    filelist = sorted(filelist)
+    tasks = [(shard, fpath, n, seed) for shard, fpath in enumerate(filelist)]
+
+    heap = []
+    def merge(result):
+        _, records = result
+        for rec in records:
+            item = (-rec[0],) + rec[1:]
+            if len(heap) < n:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+
+    if num_workers > 1 and len(filelist) > 1:
+        with multiprocessing.Pool(num_workers) as pool:
+            for result in pool.imap_unordered(_sample_shard_task, tasks):
+                merge(result)
+    else:
+        for task in tasks:
+            merge(_sample_shard(*task))
+
+    sample = sorted((-item[0],) + item[1:] for item in heap)
+    by_shard = {}
+    for rec in sample:
+        by_shard.setdefault(rec[1], []).append(rec)
+
+    tasks = [(filelist[shard], records) for shard, records in
+             sorted(by_shard.items())]
+    if num_workers > 1 and len(tasks) > 1:
+        with multiprocessing.Pool(num_workers) as pool:
+            lines = pool.starmap(_read_records, tasks)
+    else:
+        lines = [_read_records(*task) for task in tasks]
+
+    raw = {}
+    for (_, records), shard_lines in zip(tasks, lines):
+        for rec, line in zip(records, shard_lines):
+            raw[rec] = line
+    return parse_docs([raw[rec] for rec in sample], lazy)
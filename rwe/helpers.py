@@ -30,7 +30,7 @@ def overlaps(a, b):
 def get_left_span(span, sentence=None, window=None):
     """Get window words to the left of span"""
     sentence = sentence if sentence else span.sentence
-    j = span.char_to_word_index(span.char_start)
+    j = span.get_word_start()
     i = max(j - window, 0) if window else 0
     if i == j == 0:
         return Span(char_start=0, char_end=-1, sentence=sentence)
@@ -49,6 +49,28 @@ def get_right_span(span, sentence=None, window=None):
     return Span(char_start=start, char_end=end, sentence=sentence)
 
 
+def left_window(span, sentence=None, window=None):
+    """Char offsets [start, end) of `get_left_span`, without building a Span"""
+    sentence = sentence if sentence else span.sentence
+    j = span.get_word_start()
+    i = max(j - window, 0) if window else 0
+    if i == j == 0:
+        return 0, 0
+    offsets, words = sentence.char_offsets, sentence.words
+    return offsets[i], offsets[j-1] + len(words[j-1])
+
+
+def right_window(span, sentence=None, window=None):
+    """Char offsets [start, end) of `get_right_span`, without building a Span"""
+    sentence = sentence if sentence else span.sentence
+    i = span.get_word_end() + 1
+    j = min(i + window, len(sentence.words)) if window else len(sentence.words)
+    if i == j:
+        return len(sentence.text), len(sentence.text)
+    offsets, words = sentence.char_offsets, sentence.words
+    return offsets[i], offsets[j-1] + len(words[j-1])
+
+
 def get_between_span(a, b):
     a, b = sorted([a, b], key=lambda x: x.char_start, reverse=0)
     i, j = a.get_word_end() + 1, b.get_word_start()
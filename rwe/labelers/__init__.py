@@ -1 +1,3 @@
-from .core import LabelingServer, TaggerPipelineServer
\ No newline at end of file
+from .core import LabelingServer, TaggerPipelineServer
+from .cache import TaggingCache
+from .checkpoint import RunCheckpoint
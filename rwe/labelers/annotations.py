@@ -0,0 +1,136 @@
+import numpy as np
+from collections import namedtuple
+from ..contexts import Document, Span, Relation
+
+###############################################################################
+#
+# Compact Annotation Deltas
+#
+###############################################################################
+
+# span props that point to another span (e.g., `section`, `timex_span`)
+SpanRef = namedtuple('SpanRef', 'idx')
+
+# `items` codes for entries that are not spans
+NONE_ITEM = -1
+EMPTY_LAYER = -2
+RELATION_OFFSET = -3
+
+
+def encode_annotations(document: Document) -> dict:
+    """
+    Encode all annotations of a tagged document as columnar arrays, so
+    workers can return them without pickling sentences, words and offsets.
+
+    Every distinct Span object becomes one row of the span table
+    (sentence index, char_start, char_end, normalized, props). Layer entries
+    are rows of (sentence index, layer id, item) where item is a span row,
+    NONE_ITEM, EMPTY_LAYER, or an encoded row of the relation table. Span
+    objects shared across layers or referenced from props stay shared after
+    decoding.
+    """
+    sent_idx = {id(s): i for i, s in enumerate(document.sentences)}
+    span_ids, spans = {}, []
+    relations = []
+    layers = {}
+    anno_sent, anno_layer, anno_item = [], [], []
+
+    def span_id(span):
+        if id(span) not in span_ids:
+            span_ids[id(span)] = len(spans)
+            spans.append(span)
+        return span_ids[id(span)]
+
+    for i in document.annotations:
+        for name, items in document.annotations[i].items():
+            layer = layers.setdefault(name, len(layers))
+            if not items:
+                anno_sent.append(i)
+                anno_layer.append(layer)
+                anno_item.append(EMPTY_LAYER)
+            for item in items:
+                if item is None:
+                    code = NONE_ITEM
+                elif isinstance(item, Relation):
+                    code = RELATION_OFFSET - len(relations)
+                    relations.append(
+                        (item.type_name,
+                         [(arg, span_id(s)) for arg, s in item.args.items()])
+                    )
+                else:
+                    code = span_id(item)
+                anno_sent.append(i)
+                anno_layer.append(layer)
+                anno_item.append(code)
+
+    # span props may reference spans outside of any layer
+    props = []
+    k = 0
+    while k < len(spans):
+        p = spans[k].props
+        props.append({key: SpanRef(span_id(v)) if isinstance(v, Span) else v
+                      for key, v in p.items()} if p else None)
+        k += 1
+
+    return {
+        'name': document.name,
+        'props': document.props,
+        'layers': list(layers),
+        'anno_sent': np.array(anno_sent, dtype=np.int32),
+        'anno_layer': np.array(anno_layer, dtype=np.int32),
+        'anno_item': np.array(anno_item, dtype=np.int32),
+        'span_sent': np.array([sent_idx[id(s.sentence)] for s in spans],
+                              dtype=np.int32),
+        'span_start': np.array([s.char_start for s in spans], dtype=np.int32),
+        'span_end': np.array([s.char_end for s in spans], dtype=np.int32),
+        'span_normalized': [s.normalized for s in spans],
+        'span_props': props,
+        'relations': relations
+    }
+
+
+def apply_annotations(document: Document, delta: dict) -> Document:
+    """
+    Replace the annotations and props of `document` with an encoded delta
+    produced by `encode_annotations` on a copy of the same document.
+    """
+    if delta['name'] != document.name:
+        raise ValueError(f"Annotations for {delta['name']} cannot be "
+                         f"applied to {document.name}")
+
+    sents = document.sentences
+    spans = []
+    for i, start, end, norm in zip(delta['span_sent'].tolist(),
+                                   delta['span_start'].tolist(),
+                                   delta['span_end'].tolist(),
+                                   delta['span_normalized']):
+        span = Span(start, end, sents[i])
+        span.normalized = norm
+        spans.append(span)
+
+    for span, props in zip(spans, delta['span_props']):
+        if props:
+            span.props = {key: spans[v.idx] if isinstance(v, SpanRef) else v
+                          for key, v in props.items()}
+
+    relations = [
+        Relation(type_name, {arg: spans[j] for arg, j in args})
+        for type_name, args in delta['relations']
+    ]
+
+    annotations = {i: {} for i in range(len(sents))}
+    layers = delta['layers']
+    for i, layer, code in zip(delta['anno_sent'].tolist(),
+                              delta['anno_layer'].tolist(),
+                              delta['anno_item'].tolist()):
+        items = annotations[i].setdefault(layers[layer], [])
+        if code >= 0:
+            items.append(spans[code])
+        elif code == NONE_ITEM:
+            items.append(None)
+        elif code <= RELATION_OFFSET:
+            items.append(relations[RELATION_OFFSET - code])
+
+    document.annotations = annotations
+    document.props = delta['props']
+    return document
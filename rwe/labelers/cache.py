@@ -0,0 +1,347 @@
+import os
+import re
+import sys
+import zlib
+import types
+import pickle
+import sqlite3
+import hashlib
+import inspect
+import functools
+import numpy as np
+from typing import Dict, List, Tuple
+from ..contexts import Document, Sentence
+from .annotations import encode_annotations, apply_annotations
+from .pipeline import _is_layer
+
+###############################################################################
+#
+# Content Fingerprints
+#
+###############################################################################
+
+# sha1 of module source files, so code changes invalidate cached output
+_SOURCE_HASHES = {}
+
+
+def _source_hash(module_name):
+    if module_name not in _SOURCE_HASHES:
+        digest = b''
+        module = sys.modules.get(module_name)
+        try:
+            fpath = inspect.getsourcefile(module) if module else None
+        except TypeError:
+            fpath = None
+        if fpath and os.path.exists(fpath):
+            with open(fpath, 'rb') as fp:
+                digest = hashlib.sha1(fp.read()).digest()
+        _SOURCE_HASHES[module_name] = digest
+    return _SOURCE_HASHES[module_name]
+
+
+class _Fingerprint(object):
+    """
+    Canonical content hash of Python objects. Containers hash to the digest
+    of their items' digests; sets and dicts sort them, so unlike pickles the
+    hash doesn't depend on iteration order (and so on PYTHONHASHSEED).
+    References back to an enclosing object hash to their distance from it.
+    Objects may define `fingerprint()` to replace the default encoding of
+    their state.
+    """
+    def __init__(self):
+        self.stack = {}
+        self.low = []
+        # digests of finished objects (kept alive so ids aren't reused)
+        self.done = {}
+
+    def feed(self, h, obj):
+        if obj is None or isinstance(obj, (bool, int, float, complex)):
+            h.update(f'{type(obj).__name__}:{obj!r};'.encode('utf-8'))
+        elif isinstance(obj, str):
+            data = obj.encode('utf-8', 'surrogatepass')
+            h.update(b's%d:' % len(data))
+            h.update(data)
+        elif isinstance(obj, (bytes, bytearray, memoryview)):
+            data = bytes(obj)
+            h.update(b'b%d:' % len(data))
+            h.update(data)
+        else:
+            h.update(self.digest(obj))
+
+    def digest(self, obj) -> bytes:
+        if obj is None or isinstance(obj, (bool, int, float, complex, str,
+                                           bytes, bytearray, memoryview)):
+            h = hashlib.sha1()
+            self.feed(h, obj)
+            return h.digest()
+        if id(obj) in self.done:
+            return self.done[id(obj)][1]
+        if id(obj) in self.stack:
+            depth = self.stack[id(obj)]
+            self.low[-1] = min(self.low[-1], depth)
+            return b'@%d;' % (len(self.stack) - depth)
+
+        h = hashlib.sha1()
+        depth = len(self.stack)
+        self.stack[id(obj)] = depth
+        self.low.append(depth)
+        try:
+            self.encode(h, obj)
+        finally:
+            del self.stack[id(obj)]
+            low = self.low.pop()
+        if low < depth:
+            # refers to an enclosing object, so its digest depends on context
+            self.low[-1] = min(self.low[-1], low)
+        else:
+            self.done[id(obj)] = (obj, h.digest())
+        return h.digest()
+
+    def encode(self, h, obj):
+        if isinstance(obj, np.ndarray):
+            h.update(f'nd:{obj.dtype.str}:{obj.shape};'.encode('utf-8'))
+            h.update(np.ascontiguousarray(obj).tobytes())
+        elif isinstance(obj, re.Pattern):
+            h.update(b're:')
+            self.feed(h, obj.pattern)
+            h.update(b'%d;' % obj.flags)
+        elif isinstance(obj, (list, tuple)):
+            h.update(b'l%d:' % len(obj))
+            for item in obj:
+                self.feed(h, item)
+        elif isinstance(obj, (set, frozenset)):
+            h.update(b'S%d:' % len(obj))
+            for digest in sorted(self.digest(item) for item in obj):
+                h.update(digest)
+        elif isinstance(obj, dict):
+            h.update(b'd%d:' % len(obj))
+            for digest in sorted(self.digest(k) + self.digest(v)
+                                 for k, v in obj.items()):
+                h.update(digest)
+        elif isinstance(obj, functools.partial):
+            h.update(b'partial:')
+            self.feed(h, (obj.func, obj.args, obj.keywords))
+        elif isinstance(obj, types.CodeType):
+            h.update(obj.co_code)
+            self.feed(h, (obj.co_consts, obj.co_names))
+        elif isinstance(obj, (types.FunctionType, types.MethodType,
+                              types.BuiltinFunctionType, type)):
+            func = getattr(obj, '__func__', obj)
+            module = getattr(func, '__module__', None) or ''
+            h.update(f'{module}.{func.__qualname__};'.encode('utf-8'))
+            h.update(_source_hash(module))
+            if isinstance(func, types.FunctionType):
+                self.feed(h, (func.__code__, func.__defaults__))
+            if isinstance(obj, types.MethodType):
+                self.feed(h, obj.__self__)
+        elif callable(getattr(obj, 'fingerprint', None)):
+            h.update(f'{type(obj).__qualname__}:'.encode('utf-8'))
+            self.feed(h, obj.fingerprint())
+        else:
+            cls = type(obj)
+            h.update(f'{cls.__module__}.{cls.__qualname__};'.encode('utf-8'))
+            h.update(_source_hash(cls.__module__))
+            try:
+                state = obj.__getstate__()
+            except (AttributeError, TypeError):
+                state = getattr(obj, '__dict__', repr(obj))
+            self.feed(h, state)
+
+
+def tagger_fingerprint(tagger) -> str:
+    """
+    Fingerprint of a tagger's configuration: its class, the source of the
+    modules defining it and its labeling functions, and all of its state
+    (dictionaries, regexes, parameters). Code in other modules (e.g.,
+    helpers called by labeling functions) isn't covered; pass a new
+    `version` to `TaggingCache` after changing it.
+    """
+    return _Fingerprint().digest(tagger).hex()
+
+
+def document_fingerprint(document: Document) -> str:
+    """
+    Content hash of an untagged document: its name, props and sentences
+    (words, offsets and all other token attributes), plus any annotations
+    it was loaded with.
+    """
+    fp = _Fingerprint()
+    h = hashlib.sha1()
+    fp.feed(h, (document.name, document.props))
+    for sentence in document.sentences:
+        state = Sentence.__getstate__(sentence)
+        state.pop('document', None)
+        fp.feed(h, state)
+    if any(document.annotations[i] for i in document.annotations):
+        fp.feed(h, encode_annotations(document))
+    return h.hexdigest()
+
+###############################################################################
+#
+# Tagging Cache
+#
+###############################################################################
+
+class TaggingCache(object):
+    """
+    Persistent SQLite store of tagged document annotations, so pipeline
+    re-runs over a mostly unchanged corpus only tag what changed.
+
+    After each snapshot stage, the document's annotations (encoded with
+    `encode_annotations`) are stored under (document content hash, stage
+    name, stage fingerprint). A stage's fingerprint chains the configuration
+    fingerprints of all stages up to it, so a cached snapshot is only used
+    if neither the document nor any earlier stage changed. Tagging restores
+    the latest valid snapshot and runs the remaining stages.
+
+    Snapshots are cumulative, so by default only two are stored per
+    document: after the last stage, so unchanged re-runs skip tagging, and
+    after the last stage that writes annotation layers (e.g., concept
+    taggers), so changing attribute taggers, which only write props, only
+    reruns the attribute stages.
+
+    Each process opens its own connection, so a cache can be shared by
+    `TaggerPipelineServer` workers. Workers `close` their connection after
+    each block, so the last one to close checkpoints the write-ahead log
+    into the database file.
+    """
+    def __init__(self, fpath: str, version: str = None,
+                 timeout: float = 60.0, snapshots: List[str] = None) -> None:
+        """
+        fpath: SQLite database file (created if missing)
+        version: changing it invalidates all cached annotations
+        timeout: seconds to wait for other processes' write locks
+        snapshots: names of the (compiled) stages after which annotations
+        are stored, instead of the default described above
+        """
+        self.fpath = fpath
+        self.version = version
+        self.timeout = timeout
+        self.snapshots = snapshots
+        self.stages = []
+        self._snapshot_stages = set()
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        self._pid = None
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_conn'] = None
+        state['_pid'] = None
+        return state
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.fpath, timeout=self.timeout)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS annotations ('
+                'doc_hash TEXT, tagger TEXT, fingerprint TEXT, data BLOB, '
+                'PRIMARY KEY (doc_hash, tagger, fingerprint))'
+            )
+            self._conn.commit()
+            self._pid = os.getpid()
+        return self._conn
+
+    def bind(self, pipeline: Dict[str, object], ngrams: int = 5) -> None:
+        """Compute the chained stage fingerprints of `pipeline`"""
+        h = hashlib.sha1()
+        _Fingerprint().feed(h, (self.version, ngrams))
+        self.stages = []
+        for name, tagger in pipeline.items():
+            h.update(name.encode('utf-8'))
+            h.update(tagger_fingerprint(tagger).encode('utf-8'))
+            self.stages.append((name, h.hexdigest()))
+
+        names = list(pipeline)
+        if self.snapshots is not None:
+            self._snapshot_stages = {k for k, name in enumerate(names)
+                                     if name in self.snapshots}
+        elif names:
+            self._snapshot_stages = {len(names) - 1}
+            for k in range(len(names) - 1, -1, -1):
+                writes = getattr(pipeline[names[k]], 'writes', lambda: None)()
+                if writes is None or any(_is_layer(w) for w in writes):
+                    self._snapshot_stages.add(k)
+                    break
+
+    def lookup(self, doc_hash: str) -> Tuple[int, dict]:
+        """
+        Number of leading stages with a cached snapshot for `doc_hash` and
+        the encoded annotations after the last of them (None if 0)
+        """
+        rows = self.conn.execute(
+            'SELECT tagger, fingerprint FROM annotations WHERE doc_hash = ?',
+            (doc_hash,)
+        ).fetchall()
+        cached = set(rows)
+        k = len(self.stages)
+        while k > 0 and self.stages[k - 1] not in cached:
+            k -= 1
+        if k == 0:
+            return 0, None
+        name, fingerprint = self.stages[k - 1]
+        data, = self.conn.execute(
+            'SELECT data FROM annotations WHERE doc_hash = ? AND tagger = ? '
+            'AND fingerprint = ?', (doc_hash, name, fingerprint)
+        ).fetchone()
+        return k, pickle.loads(zlib.decompress(data))
+
+    def put(self, doc_hash: str, stage: int, document: Document) -> None:
+        name, fingerprint = self.stages[stage]
+        data = zlib.compress(pickle.dumps(encode_annotations(document),
+                                          protocol=pickle.HIGHEST_PROTOCOL))
+        self.conn.execute(
+            'INSERT OR REPLACE INTO annotations VALUES (?, ?, ?, ?)',
+            (doc_hash, name, fingerprint, data)
+        )
+
+    def tag(self, pipeline: Dict[str, object], document: Document,
+            ngrams: int = 5, run=None) -> Document:
+        """
+        Apply `pipeline` (the one passed to `bind`) to `document`, starting
+        from its latest cached snapshot. `run(name, tagger, document)`
+        applies one stage (default `tagger.tag(document, ngrams=ngrams)`).
+        """
+        doc_hash = document_fingerprint(document)
+        k, snapshot = self.lookup(doc_hash)
+        if snapshot is not None:
+            apply_annotations(document, snapshot)
+        self.hits += k
+        self.misses += len(self.stages) - k
+
+        for stage, name in enumerate(list(pipeline)[k:], k):
+            if run is None:
+                pipeline[name].tag(document, ngrams=ngrams)
+            else:
+                run(name, pipeline[name], document)
+            if stage in self._snapshot_stages:
+                self.put(doc_hash, stage, document)
+        return document
+
+    def commit(self) -> None:
+        self.conn.commit()
+
+    def close(self) -> None:
+        """Commit and close this process's connection"""
+        if self._conn is not None and self._pid == os.getpid():
+            self._conn.commit()
+            self._conn.close()
+        self._conn = None
+        self._pid = None
+
+    def clear(self) -> None:
+        """Delete all cached annotations"""
+        self.conn.execute('DELETE FROM annotations')
+        self.conn.commit()
+        self.conn.execute('VACUUM')
+
+    def __len__(self) -> int:
+        return self.conn.execute(
+            'SELECT COUNT(*) FROM annotations').fetchone()[0]
+
+    def __repr__(self) -> str:
+        return f"TaggingCache({self.fpath}, stages={len(self.stages)}, " \
+               f"hits={self.hits}, misses={self.misses})"
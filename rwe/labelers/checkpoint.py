@@ -0,0 +1,151 @@
+import os
+import json
+import pickle
+import hashlib
+from typing import Dict, Iterable, Iterator, List, Tuple
+from ..contexts import Document
+
+###############################################################################
+#
+# Block Checkpoints
+#
+###############################################################################
+
+
+def block_hash(documents: Iterable[Document]) -> str:
+    """Identity of a block of documents (sha1 of their names)"""
+    h = hashlib.sha1()
+    for doc in documents:
+        h.update(doc.name.encode('utf-8'))
+        h.update(b'\n')
+    return h.hexdigest()
+
+
+class RunCheckpoint(object):
+    """
+    Block-level checkpoints of a tagging run, stored in `run_dir`.
+
+    The output of each completed block is pickled to `blocks/<k>.pkl` (via
+    a temp file and rename, so block files are never partial) and then
+    recorded in `manifest.jsonl`. The manifest starts with a header line
+    holding the run `config`, optionally followed by the run's block sizes,
+    {"block_sizes": [...]} (see `partition`). Then comes one line per
+    completed block, {"block", "file", "docs", "hash"}, and a final
+    {"complete": true} line once the run finishes. Lines are only appended, so the manifest and
+    all blocks it lists can be read (see `results`) while the run is still
+    going.
+
+    Restarting a run with the same config and inputs skips completed
+    blocks. A different config raises a ValueError, as does a block whose
+    documents differ from the checkpointed ones (e.g., a changed
+    `block_size`). Runs that record their block sizes reuse them on
+    restart, so their blocks don't depend on e.g. the number of workers.
+    """
+    MANIFEST = 'manifest.jsonl'
+
+    def __init__(self, run_dir: str, config: Dict = None) -> None:
+        self.run_dir = run_dir
+        self.config = config
+        self.blocks = {}
+        self.block_sizes = None
+        self.complete = False
+
+        os.makedirs(os.path.join(run_dir, 'blocks'), exist_ok=True)
+        fpath = os.path.join(run_dir, RunCheckpoint.MANIFEST)
+        if os.path.exists(fpath):
+            self._read_manifest(fpath)
+        else:
+            self._append({'config': config})
+
+    def _read_manifest(self, fpath):
+        with open(fpath, 'r+') as fp:
+            text = fp.read()
+            if not text.endswith('\n'):
+                # drop the partial last line of an interrupted append
+                text = text[:text.rfind('\n') + 1]
+                fp.seek(0)
+                fp.truncate(len(text.encode('utf-8')))
+        lines = [line for line in text.split('\n') if line]
+        if not lines:
+            self._append({'config': self.config})
+            return
+        header = json.loads(lines[0])
+        if self.config is not None and \
+                json.loads(json.dumps(self.config)) != header['config']:
+            raise ValueError(f"Checkpoint {self.run_dir} was created with a "
+                             f"different config: {header['config']}")
+        self.config = header['config']
+        for line in lines[1:]:
+            entry = json.loads(line)
+            if entry.get('complete'):
+                self.complete = True
+            elif 'block_sizes' in entry:
+                self.block_sizes = entry['block_sizes']
+            elif 'block' in entry:
+                self.blocks[entry['block']] = entry
+
+    def _append(self, entry: Dict) -> None:
+        fpath = os.path.join(self.run_dir, RunCheckpoint.MANIFEST)
+        with open(fpath, 'a') as fp:
+            fp.write(json.dumps(entry) + '\n')
+            fp.flush()
+            os.fsync(fp.fileno())
+
+    def __len__(self) -> int:
+        return len(self.blocks)
+
+    def partition(self, block_sizes: List[int]) -> List[int]:
+        """
+        Number of documents in each block of the run: those recorded by an
+        earlier run, otherwise `block_sizes`, which are recorded
+        """
+        if self.block_sizes is None:
+            self._append({'block_sizes': list(block_sizes)})
+            self.block_sizes = list(block_sizes)
+        return self.block_sizes
+
+    def is_done(self, k: int, documents: List[Document]) -> bool:
+        """True if block `k`, holding `documents`, is checkpointed"""
+        if k not in self.blocks:
+            return False
+        if self.blocks[k]['hash'] != block_hash(documents):
+            raise ValueError(f"Block {k} documents differ from checkpoint "
+                             f"{self.run_dir}")
+        return True
+
+    def load(self, k: int):
+        """Output of completed block `k`"""
+        fpath = os.path.join(self.run_dir, self.blocks[k]['file'])
+        with open(fpath, 'rb') as fp:
+            return pickle.load(fp)
+
+    def save(self, k: int, documents: List[Document], result) -> None:
+        """Atomically store the output of block `k`, holding `documents`"""
+        fname = os.path.join('blocks', f'{k:08d}.pkl')
+        fpath = os.path.join(self.run_dir, fname)
+        with open(f'{fpath}.tmp', 'wb') as fp:
+            pickle.dump(result, fp, protocol=pickle.HIGHEST_PROTOCOL)
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.replace(f'{fpath}.tmp', fpath)
+
+        entry = {'block': k, 'file': fname, 'docs': len(documents),
+                 'hash': block_hash(documents)}
+        self._append(entry)
+        self.blocks[k] = entry
+
+    def finish(self) -> None:
+        """Mark the run as complete"""
+        if not self.complete:
+            self._append({'complete': True})
+            self.complete = True
+
+    def results(self) -> Iterator[Tuple[int, object]]:
+        """(block, output) of all completed blocks, in block order"""
+        for k in sorted(self.blocks):
+            yield k, self.load(k)
+
+    def __repr__(self) -> str:
+        status = 'complete' if self.complete else 'incomplete'
+        return f"RunCheckpoint({self.run_dir}, blocks={len(self.blocks)}, " \
+               f"{status})"
@@ -1,11 +1,70 @@
+import os
+import time
 import itertools
+import multiprocessing
 import numpy as np
+from collections import deque
 from scipy import sparse
 from functools import partial
 from toolz import partition_all
 from joblib import Parallel, delayed
-from typing import List, Set, Dict, Tuple, Optional, Union
+from typing import List, Set, Dict, Tuple, Optional, Union, Iterable, Callable
 from ..contexts import Document
+from .annotations import encode_annotations, apply_annotations
+from .pipeline import PipelineGraph
+from .profiling import TaggerProfiler, TaggerProfile
+from .cache import TaggingCache
+from .checkpoint import RunCheckpoint
+
+# Pipelines registered by the parent process before worker processes are
+# forked. Workers inherit this state and look pipelines up by handle, so
+# taggers (dictionaries, NegEx regexes, annotation maps) are never pickled.
+_SHARED_PIPELINES = {}
+
+
+def _init_shared(handle, pipeline):
+    _SHARED_PIPELINES[handle] = pipeline
+
+
+# per-tagger counters of the task running in this process (see `worker`)
+_TASK_STATS = {}
+
+
+def _profiled(f, *args, **kwargs):
+    """
+    Run a task, returning its result and (pid, start, end, tagger stats),
+    where tagger stats are the counters recorded by profiling workers.
+    """
+    _TASK_STATS.clear()
+    start = time.time()
+    result = f(*args, **kwargs)
+    return result, (os.getpid(), start, time.time(), dict(_TASK_STATS))
+
+
+def document_cost(document: Document) -> int:
+    """Tagging cost estimate of a document (number of tokens)"""
+    return sum(len(s.words) for s in document.sentences)
+
+
+def partition_by_cost(documents: Iterable[Document],
+                      max_cost: int,
+                      max_size: int = None):
+    """
+    Greedily pack documents, in order, into blocks of at most `max_cost`
+    tokens (and at most `max_size` documents). Documents costing more than
+    `max_cost` form their own block.
+    """
+    block, cost = [], 0
+    for doc in documents:
+        c = document_cost(doc)
+        if block and (cost + c > max_cost or
+                      (max_size and len(block) >= max_size)):
+            yield block
+            block, cost = [], 0
+        block.append(doc)
+        cost += c
+    if block:
+        yield block
 
 
 class Distributed(object):
@@ -77,34 +136,198 @@ class LabelingServer(Distributed):
 
 class TaggerPipelineServer(Distributed):
 
-    def __init__(self, num_workers=1, backend='multiprocessing'):
+    def __init__(self,
+                 num_workers=1,
+                 backend='multiprocessing',
+                 share_pipeline=True,
+                 return_deltas=True,
+                 tasks_per_worker=8,
+                 profile=False,
+                 profile_fpath=None,
+                 profile_format='json',
+                 profile_interval=None,
+                 cache: TaggingCache = None):
+        """
+        share_pipeline: workers inherit the pipeline via fork rather than
+        receiving a pickled copy with every block (requires the 'fork'
+        multiprocessing start method, otherwise pipelines are pickled)
+        return_deltas: workers return compact annotation records (see
+        `encode_annotations`) which are applied to the parent's documents,
+        instead of returning whole tagged documents
+        tasks_per_worker: with block_size='auto', split the corpus into about
+        this many blocks per worker, sized by token count
+        profile: record wall time, documents, sentences, spans read and
+        spans written for each tagger and worker (see `TaggerProfile`)
+        profile_fpath: export profiles to this file as `profile_format`
+        ('json' or 'prometheus') at the end of a run and, when streaming,
+        every `profile_interval` seconds
+        cache: `TaggingCache` (or the path of one) of annotations from
+        previous runs; documents only run the pipeline stages that changed
+        since they were cached
+        """
         super().__init__(num_workers, backend)
+        self.share_pipeline = share_pipeline
+        self.return_deltas = return_deltas
+        self.tasks_per_worker = tasks_per_worker
+        self.utilization = {}
+        self.profile = profile
+        self.profile_fpath = profile_fpath
+        self.profile_format = profile_format
+        self.profile_interval = profile_interval
+        self.tagger_profile = TaggerProfile()
+        self.cache = TaggingCache(cache) if isinstance(cache, str) else cache
+
+    @staticmethod
+    def worker(pipeline, corpus, ngrams=5, deltas=False, profile=False,
+               cache=None):
+        if cache is not None:
+            profiler = TaggerProfiler(pipeline) if profile else None
+            run = partial(profiler.tag_stage, ngrams=ngrams) \
+                if profile else None
+            for doc in corpus:
+                cache.tag(pipeline, doc, ngrams=ngrams, run=run)
+            cache.close()
+            if profile:
+                _TASK_STATS.update(profiler.stats)
+        elif profile:
+            profiler = TaggerProfiler(pipeline)
+            for doc in corpus:
+                profiler.tag(doc, ngrams=ngrams)
+            _TASK_STATS.update(profiler.stats)
+        else:
+            for i, doc in enumerate(corpus):
+                for name in pipeline:
+                    pipeline[name].tag(doc, ngrams=ngrams)
+        return [encode_annotations(doc) for doc in corpus] if deltas else corpus
+
+    @staticmethod
+    def shared_worker(handle, corpus, ngrams=5, deltas=False, profile=False,
+                      cache=None):
+        return TaggerPipelineServer.worker(_SHARED_PIPELINES[handle], corpus,
+                                           ngrams, deltas, profile, cache)
 
     @staticmethod
-    def worker(pipeline, corpus, ngrams=5):
-        for i, doc in enumerate(corpus):
-            for name in pipeline:
-                pipeline[name].tag(doc, ngrams=ngrams)
-        return corpus
+    def stream_worker(handle, corpus, ngrams=5, deltas=False, profile=False):
+        pipeline, transform, cache = _SHARED_PIPELINES[handle]
+        if transform:
+            corpus = TaggerPipelineServer.worker(pipeline, corpus, ngrams,
+                                                 profile=profile, cache=cache)
+            return [transform(doc) for doc in corpus]
+        return TaggerPipelineServer.worker(pipeline, corpus, ngrams, deltas,
+                                           profile, cache)
+
+    def _is_shareable(self):
+        return self.share_pipeline and (
+            self.num_workers == 1 or
+            multiprocessing.get_start_method() == 'fork'
+        )
 
     def apply(self,
               pipeline   : Dict[str, float],
               documents  : List[List[Document]],
-              block_size : Union[str, int] = 'auto'):
+              block_size : Union[str, int] = 'auto',
+              outputs    : Iterable[str] = None,
+              checkpoint : RunCheckpoint = None):
+        """
+        Tag lists of documents, returning the tagged documents in the same
+        nesting. If a `checkpoint` is given, the annotations of each block
+        are saved as it completes and blocks completed by an earlier run
+        over the same documents are restored instead of tagged. The block
+        sizes of the first run are recorded in the checkpoint and reused,
+        so resuming with e.g. a different `num_workers` (which changes
+        block_size='auto') finds the same blocks.
+        """
+        # validate, prune stages not needed for `outputs`, fuse span taggers
+        pipeline = PipelineGraph(pipeline).compile(outputs)
+        print(f"Pipeline: {' -> '.join(pipeline)}")
+        if self.cache is not None:
+            self.cache.bind(pipeline)
 
         items = itertools.chain.from_iterable(documents)
 
         if block_size == 'auto':
-            num_items = np.sum([len(x) for x in documents])
-            block_size = int(np.ceil(num_items / self.num_workers))
-            print(f'auto block size={block_size}')
-
-        blocks = list(partition_all(block_size, items)) if block_size else documents
+            # many small blocks of similar token counts, so idle workers
+            # pick up remaining work instead of waiting on one long block
+            num_tokens = sum(document_cost(doc) for doc in
+                             itertools.chain.from_iterable(documents))
+            max_cost = int(np.ceil(
+                num_tokens / (self.num_workers * self.tasks_per_worker)))
+            print(f'auto block cost={max_cost} tokens')
+            blocks = list(partition_by_cost(items, max(max_cost, 1)))
+        else:
+            blocks = list(partition_all(block_size, items)) if block_size else documents
+        if checkpoint is not None:
+            sizes = checkpoint.partition([len(x) for x in blocks])
+            if sizes != [len(x) for x in blocks]:
+                items = list(itertools.chain.from_iterable(documents))
+                if sum(sizes) != len(items):
+                    raise ValueError(f"Checkpoint {checkpoint.run_dir} has "
+                                     f"{sum(sizes)} documents, not "
+                                     f"{len(items)}")
+                offsets = np.cumsum([0] + sizes)
+                blocks = [items[offsets[k]:offsets[k + 1]]
+                          for k in range(len(sizes))]
         print(f"Partitioned into {len(blocks)} blocks, {np.unique([len(x) for x in blocks])} sizes")
 
-        do = delayed(partial(TaggerPipelineServer.worker, pipeline))
-        jobs = (do(batch) for batch in blocks)
-        results = list(itertools.chain.from_iterable(self.client(jobs)))
+        # dispatch the most expensive blocks first
+        costs = [sum(document_cost(doc) for doc in x) for x in blocks]
+        order = sorted(range(len(blocks)), key=lambda i: costs[i], reverse=1)
+
+        # in-process jobs tag the parent's documents directly
+        deltas = self.return_deltas and self.num_workers > 1
+
+        done = set()
+        if checkpoint is not None:
+            done = {i for i in order if checkpoint.is_done(i, blocks[i])}
+            print(f"{checkpoint}: {len(done)} of {len(blocks)} blocks done")
+        todo = [i for i in order if i not in done]
+
+        shared = self._is_shareable()
+        if shared:
+            # register before the worker pool is forked
+            handle = id(pipeline)
+            _SHARED_PIPELINES[handle] = pipeline
+            task = partial(_profiled, TaggerPipelineServer.shared_worker,
+                           handle, deltas=deltas, profile=self.profile,
+                           cache=self.cache)
+        else:
+            task = partial(_profiled, TaggerPipelineServer.worker,
+                           pipeline, deltas=deltas,
+                           profile=self.profile, cache=self.cache)
+
+        try:
+            start = time.time()
+            if checkpoint is None:
+                job_results = self.client(delayed(task)(blocks[i])
+                                          for i in todo)
+            else:
+                job_results = self._apply_checkpointed(task, blocks, todo,
+                                                       deltas, checkpoint)
+            end = time.time()
+        finally:
+            if shared:
+                del _SHARED_PIPELINES[handle]
+
+        results = [None] * len(blocks)
+        for i, (result, _) in zip(todo, job_results):
+            results[i] = result
+        for i in done:
+            results[i] = checkpoint.load(i)
+        self.tagger_profile = TaggerProfile()
+        for _, (pid, _, _, tagger_stats) in job_results:
+            self.tagger_profile.update(pid, tagger_stats)
+        self._report_utilization([stats for _, stats in job_results],
+                                 [costs[i] for i in todo], start, end)
+        self._report_profile()
+
+        tagged = []
+        for i, batch in enumerate(blocks):
+            if deltas or i in done:
+                tagged.extend(apply_annotations(doc, delta)
+                              for doc, delta in zip(batch, results[i]))
+            else:
+                tagged.extend(results[i])
+        results = tagged
 
         i = 0
         items = []
@@ -112,3 +335,199 @@ class TaggerPipelineServer(Distributed):
             items.append(results[i:i + n].copy())
             i += n
         return items
+
+    def _apply_checkpointed(self, task, blocks, todo, deltas, checkpoint):
+        """Run `task` on blocks `todo`, saving each block as it completes"""
+        job_results = []
+        pool = None
+        if self.num_workers == 1:
+            results = (task(blocks[i]) for i in todo)
+        else:
+            pool = multiprocessing.Pool(self.num_workers)
+            results = pool.imap(task, [blocks[i] for i in todo])
+        try:
+            for i, output in zip(todo, results):
+                result = output[0]
+                checkpoint.save(i, blocks[i], result if deltas else
+                                [encode_annotations(doc) for doc in result])
+                job_results.append(output)
+            checkpoint.finish()
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+        return job_results
+
+    def apply_stream(self,
+                     pipeline    : Dict[str, float],
+                     documents   : Iterable[Document],
+                     block_size  : int = 100,
+                     transform   : Callable = None,
+                     max_pending : int = None,
+                     max_tokens  : int = None,
+                     outputs     : Iterable[str] = None,
+                     checkpoint  : RunCheckpoint = None):
+        """
+        Tag an iterable of documents in blocks of `block_size`, yielding
+        tagged documents (or `transform(doc)`, e.g., extracted concept rows)
+        in input order as blocks complete. At most `max_pending` blocks are
+        in flight, so memory use does not grow with corpus size. If
+        `max_tokens` is set, blocks are also capped by token count.
+
+        Workers receive the pipeline and transform once, when the pool is
+        created (inherited via fork where available). Without a transform,
+        workers return annotation deltas that are applied to the documents
+        of each pending block.
+
+        As with `apply`, the pipeline is validated and compiled first; if
+        `outputs` (layers and props, see `Tagger.reads`) are given, stages
+        that don't contribute to them are skipped.
+
+        If a `checkpoint` is given, the output of each block (transformed
+        documents, or annotation deltas without a transform) is saved as it
+        completes. Restarting with the same arguments replays the blocks
+        completed by an earlier run instead of tagging them.
+        """
+        pipeline = PipelineGraph(pipeline).compile(outputs)
+        if self.cache is not None:
+            self.cache.bind(pipeline)
+        if checkpoint is not None:
+            print(f"{checkpoint}")
+        handle = id(pipeline)
+        shared = (pipeline, transform, self.cache)
+        max_pending = max_pending if max_pending else 2 * self.num_workers
+        if max_tokens:
+            blocks = partition_by_cost(documents, max_tokens, block_size)
+        else:
+            blocks = partition_all(block_size, documents)
+
+        self.tagger_profile = TaggerProfile()
+        stats, costs = [], []
+        last_export = time.time()
+
+        def record(block, timing):
+            nonlocal last_export
+            stats.append(timing)
+            costs.append(sum(document_cost(doc) for doc in block))
+            self.tagger_profile.update(timing[0], timing[-1])
+            if self.profile and self.profile_fpath and self.profile_interval \
+                    and time.time() - last_export > self.profile_interval:
+                self.tagger_profile.export(self.profile_fpath,
+                                           self.profile_format)
+                last_export = time.time()
+
+        def restore(k, block):
+            result = checkpoint.load(k)
+            if transform:
+                return result
+            return [apply_annotations(doc, delta)
+                    for doc, delta in zip(block, result)]
+
+        def save(k, block, result, encoded):
+            if checkpoint is not None:
+                checkpoint.save(k, block, result if transform or encoded else
+                                [encode_annotations(doc) for doc in result])
+
+        if self.num_workers == 1:
+            _init_shared(handle, shared)
+            start = time.time()
+            try:
+                for k, block in enumerate(blocks):
+                    if checkpoint is not None and checkpoint.is_done(k, block):
+                        yield from restore(k, block)
+                        continue
+                    result, timing = _profiled(
+                        TaggerPipelineServer.stream_worker, handle, block,
+                        profile=self.profile)
+                    record(block, timing)
+                    save(k, block, result, False)
+                    yield from result
+            finally:
+                del _SHARED_PIPELINES[handle]
+            if checkpoint is not None:
+                checkpoint.finish()
+            self._report_utilization(stats, costs, start, time.time())
+            self._report_profile()
+            return
+
+        pool = multiprocessing.Pool(self.num_workers,
+                                    initializer=_init_shared,
+                                    initargs=(handle, shared))
+        deltas = self.return_deltas and not transform
+
+        def collect(k, block, result):
+            if result is None:
+                return restore(k, block)
+            result, timing = result.get()
+            record(block, timing)
+            save(k, block, result, deltas)
+            if not deltas:
+                return result
+            return [apply_annotations(doc, delta)
+                    for doc, delta in zip(block, result)]
+
+        pending = deque()
+        start = time.time()
+        try:
+            for k, block in enumerate(blocks):
+                if checkpoint is not None and checkpoint.is_done(k, block):
+                    # replayed in order once earlier blocks are collected
+                    pending.append((k, block, None))
+                else:
+                    pending.append((k, block, pool.apply_async(
+                        _profiled, (TaggerPipelineServer.stream_worker,
+                                    handle, block, 5, deltas, self.profile))))
+                if len(pending) >= max_pending:
+                    yield from collect(*pending.popleft())
+            while pending:
+                yield from collect(*pending.popleft())
+            if checkpoint is not None:
+                checkpoint.finish()
+            pool.close()
+            self._report_utilization(stats, costs, start, time.time())
+            self._report_profile()
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def _report_utilization(self, stats, costs, start, end):
+        """
+        Summarize per-worker busy time given (pid, start, end, ...) task
+        timings and task token costs. Utilization is busy time over the wall time
+        of the run; tail is the time between the first worker going idle
+        and the end of the run.
+        """
+        wall = max(end - start, 1e-9)
+        workers = {}
+        for (pid, t0, t1, *_), cost in zip(stats, costs):
+            w = workers.setdefault(pid, {'tasks': 0, 'tokens': 0, 'busy': 0.0,
+                                         'last': 0.0})
+            w['tasks'] += 1
+            w['tokens'] += cost
+            w['busy'] += t1 - t0
+            w['last'] = max(w['last'], t1)
+
+        self.utilization = {}
+        for pid, w in workers.items():
+            self.utilization[pid] = {
+                'tasks': w['tasks'],
+                'tokens': w['tokens'],
+                'busy': w['busy'],
+                'utilization': w['busy'] / wall
+            }
+        if not workers:
+            return
+        util = [w['utilization'] for w in self.utilization.values()]
+        tail = end - min(w['last'] for w in workers.values())
+        print(f"Workers: {len(workers)} tasks: {len(stats)} "
+              f"wall: {wall:.2f}s tail: {tail:.2f}s utilization "
+              f"min/mean/max: {min(util):.2f}/{np.mean(util):.2f}/{max(util):.2f}")
+
+    def _report_profile(self):
+        """Print and export per-tagger profiles, if profiling is enabled"""
+        if not self.profile:
+            return
+        self.tagger_profile.report()
+        if self.profile_fpath:
+            self.tagger_profile.export(self.profile_fpath, self.profile_format)
+            print(f'Tagger profile written to {self.profile_fpath}')
@@ -0,0 +1,149 @@
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Set
+from .taggers import SpanTagger, FusedSpanTagger
+
+###############################################################################
+#
+# Tagger Pipeline Dependency Graph
+#
+###############################################################################
+
+ANY = '*'
+
+
+def _is_layer(name):
+    return not name.startswith(('props.', 'doc.'))
+
+
+class PipelineGraph(object):
+    """
+    Dependency graph of a tagger pipeline, built from the layers and props
+    each tagger `reads` and `writes`.
+
+    A stage depends on every earlier stage that writes something it reads
+    (or, for '*' reads, any layer), that writes something it also writes, or
+    that reads something it writes. Taggers that don't declare their reads
+    and writes are barriers: they depend on all earlier stages and all
+    later stages depend on them.
+    """
+    def __init__(self, pipeline: Dict[str, object]):
+        self.pipeline = pipeline
+        self.names = list(pipeline)
+        self.reads, self.writes = {}, {}
+        for name, tagger in pipeline.items():
+            reads = tagger.reads() if hasattr(tagger, 'reads') else None
+            writes = tagger.writes() if hasattr(tagger, 'writes') else None
+            self.reads[name] = None if reads is None else set(reads)
+            self.writes[name] = None if writes is None else set(writes)
+        self.deps = self._build()
+
+    def _is_barrier(self, name):
+        return self.reads[name] is None or self.writes[name] is None
+
+    def _depends(self, a, b):
+        """True if stage `a` must run after the earlier stage `b`"""
+        if self._is_barrier(a) or self._is_barrier(b):
+            return True
+        ra, wa, rb, wb = self.reads[a], self.writes[a], \
+                         self.reads[b], self.writes[b]
+        if ANY in ra and any(_is_layer(w) for w in wb):
+            return True
+        if ANY in rb and any(_is_layer(w) for w in wa):
+            return True
+        return bool(ra & wb or wa & wb or wa & rb)
+
+    def _build(self):
+        deps = {}
+        for k, name in enumerate(self.names):
+            deps[name] = {prev for prev in self.names[:k]
+                          if self._depends(name, prev)}
+        return deps
+
+    def validate(self):
+        """
+        Raise a ValueError if any stage reads a layer or prop that is only
+        written by a later stage of the pipeline.
+        """
+        for k, name in enumerate(self.names):
+            if self._is_barrier(name):
+                continue
+            earlier, later = set(), set()
+            for prev in self.names[:k]:
+                earlier |= self.writes[prev] or set()
+            for succ in self.names[k + 1:]:
+                later |= self.writes[succ] or set()
+            missing = (self.reads[name] - {ANY}) & (later - earlier)
+            if missing:
+                raise ValueError(f"Tagger '{name}' reads {sorted(missing)} "
+                                 f"before it is written by a later stage")
+        return self
+
+    def prune(self, outputs: Iterable[str]) -> Set[str]:
+        """
+        Return the stages required to produce `outputs`, i.e., stages that
+        write an output and (transitively) all stages they depend on.
+        Barriers are always kept.
+        """
+        outputs = set(outputs)
+        keep = set()
+        for name in reversed(self.names):
+            if self._is_barrier(name) or self.writes[name] & outputs or \
+                    any(self._feeds(name, succ) for succ in keep):
+                keep.add(name)
+        return keep
+
+    def _feeds(self, a, b):
+        """True if stage `a` writes something read by the later stage `b`"""
+        if self._is_barrier(a) or self._is_barrier(b):
+            return True
+        if ANY in self.reads[b] and \
+                any(_is_layer(w) for w in self.writes[a]):
+            return True
+        return bool(self.writes[a] & self.reads[b])
+
+    def schedule(self, names: Iterable[str] = None) -> List[List[str]]:
+        """
+        Topological order of `names` (default all stages), grouping span
+        taggers that can be fused into a single pass. Other stages run as
+        soon as they are ready, so span taggers form the longest runs.
+        """
+        remaining = [n for n in self.names if names is None or n in names]
+        groups = []
+        while remaining:
+            ready = [n for n in remaining
+                     if not (self.deps[n] & set(remaining))]
+            stage = next((n for n in ready if not self._is_span(n)), None)
+            if stage is not None:
+                groups.append([stage])
+                remaining.remove(stage)
+                continue
+            if groups and self._is_span(groups[-1][0]):
+                groups[-1].extend(ready)
+            else:
+                groups.append(list(ready))
+            for n in ready:
+                remaining.remove(n)
+        return groups
+
+    def _is_span(self, name):
+        # fusable only if the tagger just writes props of its target spans
+        return isinstance(self.pipeline[name], SpanTagger) \
+               and not self._is_barrier(name) \
+               and not any(_is_layer(w) for w in self.writes[name])
+
+    def compile(self, outputs: Iterable[str] = None) -> Dict[str, object]:
+        """
+        Validate the pipeline and return an equivalent pipeline with
+        unneeded stages (given `outputs`) removed and consecutive span
+        taggers fused.
+        """
+        self.validate()
+        names = self.prune(outputs) if outputs is not None else None
+        pipeline = OrderedDict()
+        for group in self.schedule(names):
+            if len(group) == 1:
+                pipeline[group[0]] = self.pipeline[group[0]]
+            else:
+                pipeline['+'.join(group)] = FusedSpanTagger(
+                    [self.pipeline[n] for n in group])
+        return pipeline
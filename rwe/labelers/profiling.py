@@ -0,0 +1,184 @@
+import os
+import json
+import time
+from typing import Dict, List
+from .taggers import FusedSpanTagger
+
+###############################################################################
+#
+# Per-Tagger Profiling
+#
+###############################################################################
+
+# per tagger counters, in this order
+FIELDS = ('seconds', 'documents', 'sentences', 'spans_in', 'spans_out')
+
+
+def count_spans(document, layers=None, props=None) -> int:
+    """
+    Number of items in annotation `layers` (default all layers). If `props`
+    is given, only count spans with at least one of these props.
+    """
+    n = 0
+    for i in document.annotations:
+        for name, items in document.annotations[i].items():
+            if layers is not None and name not in layers:
+                continue
+            for item in items:
+                if item is None:
+                    continue
+                if props is None or any(p in getattr(item, 'props', ())
+                                        for p in props):
+                    n += 1
+    return n
+
+
+def _io_layers(tagger):
+    """
+    Layers counted as a tagger's input spans and output spans (or span props
+    set on its input spans). None counts all layers.
+    """
+    reads = tagger.reads() if hasattr(tagger, 'reads') else None
+    writes = tagger.writes() if hasattr(tagger, 'writes') else None
+    if reads is not None:
+        reads = {r for r in reads if not r.startswith(('props.', 'doc.'))}
+        reads = None if '*' in reads else reads
+    if writes is None:
+        return reads, None, None
+    layers = {w for w in writes if not w.startswith(('props.', 'doc.'))}
+    props = {w[len('props.'):] for w in writes if w.startswith('props.')}
+    if layers or not props:
+        return reads, layers, None
+    return reads, reads, props
+
+
+class TaggerProfiler(object):
+    """
+    Collect per-tagger counters while tagging documents in one process.
+    For fused span taggers, each member tagger is timed and counted
+    separately.
+    """
+    def __init__(self, pipeline: Dict[str, object]):
+        self.pipeline = pipeline
+        self.stats = {}
+        self.io = {}
+        for name, tagger in pipeline.items():
+            if isinstance(tagger, FusedSpanTagger):
+                for member, t in zip(name.split('+'), tagger.taggers):
+                    self.io[member] = _io_layers(t)
+            else:
+                self.io[name] = _io_layers(tagger)
+
+    def _record(self, name, document, seconds, spans_in):
+        reads, layers, props = self.io[name]
+        counts = self.stats.setdefault(name, [0.0, 0, 0, 0, 0])
+        counts[0] += seconds
+        counts[1] += 1
+        counts[2] += len(document.sentences)
+        counts[3] += spans_in
+        counts[4] += count_spans(document, layers, props)
+
+    def tag(self, document, ngrams=5):
+        """Apply the pipeline to `document`, recording counters"""
+        for name, tagger in self.pipeline.items():
+            self.tag_stage(name, tagger, document, ngrams)
+
+    def tag_stage(self, name, tagger, document, ngrams=5):
+        """Apply one pipeline stage to `document`, recording counters"""
+        if isinstance(tagger, FusedSpanTagger):
+            members = name.split('+')
+            spans_in = [count_spans(document, self.io[m][0])
+                        for m in members]
+            elapsed = [0.0] * len(members)
+            tagger.tag(document, ngrams=ngrams, elapsed=elapsed)
+            for m, t, n in zip(members, elapsed, spans_in):
+                self._record(m, document, t, n)
+            return
+
+        spans_in = count_spans(document, self.io[name][0])
+        start = time.perf_counter()
+        tagger.tag(document, ngrams=ngrams)
+        self._record(name, document, time.perf_counter() - start,
+                     spans_in)
+
+
+class TaggerProfile(object):
+    """
+    Per-tagger counters aggregated across worker processes. Workers report
+    {tagger: [seconds, documents, sentences, spans_in, spans_out]} for each
+    task, see `TaggerProfiler`.
+    """
+    def __init__(self):
+        self.workers = {}
+
+    def update(self, pid: int, stats: Dict[str, List]):
+        worker = self.workers.setdefault(pid, {})
+        for name, counts in stats.items():
+            if name not in worker:
+                worker[name] = [0] * len(FIELDS)
+            worker[name] = [a + b for a, b in zip(worker[name], counts)]
+
+    def totals(self) -> Dict[str, Dict]:
+        """Counters summed over all workers, with throughput per second"""
+        totals = {}
+        for worker in self.workers.values():
+            for name, counts in worker.items():
+                if name not in totals:
+                    totals[name] = [0] * len(FIELDS)
+                totals[name] = [a + b for a, b in zip(totals[name], counts)]
+
+        summary = {}
+        for name, counts in totals.items():
+            row = dict(zip(FIELDS, counts))
+            row['docs_per_sec'] = counts[1] / counts[0] if counts[0] else 0.0
+            row['spans_per_sec'] = counts[3] / counts[0] if counts[0] else 0.0
+            summary[name] = row
+        return summary
+
+    def to_dict(self) -> Dict:
+        return {
+            'taggers': self.totals(),
+            'workers': {
+                str(pid): {name: dict(zip(FIELDS, counts))
+                           for name, counts in worker.items()}
+                for pid, worker in self.workers.items()
+            }
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2)
+
+    def to_prometheus(self, prefix='rwe_tagger') -> str:
+        """Prometheus text exposition format, one series per tagger/worker"""
+        lines = []
+        for field in FIELDS:
+            metric = f'{prefix}_{field}_total'
+            lines.append(f'# TYPE {metric} counter')
+            for pid, worker in self.workers.items():
+                for name, counts in worker.items():
+                    value = counts[FIELDS.index(field)]
+                    lines.append(f'{metric}{{tagger="{name}",worker="{pid}"}}'
+                                 f' {value}')
+        return '\n'.join(lines) + '\n'
+
+    def export(self, fpath: str, format: str = 'json'):
+        """Write counters to `fpath` as 'json' or 'prometheus' text"""
+        if format not in {'json', 'prometheus'}:
+            raise ValueError(f"Unknown profile format '{format}'")
+        text = self.to_json() if format == 'json' else self.to_prometheus()
+        with open(fpath + '.tmp', 'w') as fp:
+            fp.write(text)
+        os.replace(fpath + '.tmp', fpath)
+
+    def report(self):
+        """Print a per-tagger summary, most expensive first"""
+        totals = self.totals()
+        wall = sum(row['seconds'] for row in totals.values()) or 1e-9
+        print(f"{'tagger':<24} {'seconds':>9} {'%':>6} {'docs':>8} "
+              f"{'sents':>9} {'spans_in':>9} {'spans_out':>9} {'docs/s':>9}")
+        for name, row in sorted(totals.items(), key=lambda x: x[1]['seconds'],
+                                reverse=1):
+            print(f"{name:<24} {row['seconds']:>9.2f} "
+                  f"{100 * row['seconds'] / wall:>6.1f} {row['documents']:>8} "
+                  f"{row['sentences']:>9} {row['spans_in']:>9} "
+                  f"{row['spans_out']:>9} {row['docs_per_sec']:>9.1f}")
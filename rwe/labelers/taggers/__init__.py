@@ -5,7 +5,7 @@ from .doctimes import DocTimeTagger, MappedDocTimeTagger, TextFieldDocTimeTagger
 from .hypothetical import HypotheticalTagger
 from .negex import NegExTagger
 from .sections import SectionHeaderTagger, ParentSectionTagger
-from .timex import Timex3Tagger, Timex3NormalizerTagger, TimexNormalizer
+from .timex import Timex3Tagger, Timex3NormalizerTagger, TimexNormalizer, TimexCache
 from .timedeltas import TimeDeltaTagger
 from .family import FamilyTagger
 from .polarity import PolarityTagger
@@ -13,6 +13,12 @@ class DocTimeTagger(Tagger):
         self.prop = prop
         self.format = format
 
+    def reads(self):
+        return {f'doc.{self.prop}'}
+
+    def writes(self):
+        return {'doc.doctime'}
+
     def tag(self, document, **kwargs):
         if self.prop not in document.props:
             document.props['doctime'] = None
@@ -39,6 +45,12 @@ class TextFieldDocTimeTagger(Tagger):
         self.prop_name = prop_name
         self.max_ts_default = max_ts_default
 
+    def reads(self):
+        return {'TIMEX3', 'HEADER', 'props.normalized'}
+
+    def writes(self):
+        return {f'doc.{self.prop_name}'}
+
     def tag(self, document, **kwargs):
 
         max_date, sign_dates = None, []
@@ -76,6 +88,12 @@ class MappedDocTimeTagger(Tagger):
     def __init__(self, doctimes):
         self.doctimes = doctimes
 
+    def reads(self):
+        return set()
+
+    def writes(self):
+        return {'doc.doctime'}
+
     def tag(self, document, **kwargs):
         document.props['doctime'] = self.doctimes[document.name] \
             if document.name in self.doctimes else None
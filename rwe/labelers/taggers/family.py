@@ -23,6 +23,13 @@ ABSTAIN = 0
 
 rgx_relatives = re.compile(r'''\b(((grand)*(mother|father)|grand(m|p)a)([']*s)*|((parent|(daught|sist|broth)er|son|cousin)([']*s)*))\b''', re.I)
 
+# labeling function patterns, compiled once by FamilyTagger
+lf_regexes.add('family.header', r'''(family history[:]*|family hx)\b''')
+lf_regexes.add('family.social', r'''\b(friend(s)*|roomate(s)*|passenger(s)*)\b''')
+lf_regexes.add('family.history_of', r'''\bfamily (history of|hx)''')
+lf_regexes.add('family.ext_family', r'''\b(spouse|wife|husband)\b''')
+lf_regexes.add('family.donor', r'''\b(donor)\b''')
+
 
 def LF_relative(span):
     """Context includes any familial mention (e.g., mother father)"""
@@ -35,14 +42,13 @@ def LF_relative(span):
 
 def LF_header(span, negex):
     """All spans under Family History are assumed to refer to family"""
-    rgx = re.compile(r'''(family history[:]*|family hx)\b''', re.I)
+    rgx = lf_regexes['family.header']
     left = get_left_span(span, span.sentence, window=6)
     trigger = match_regex(rgx, left)
 
     if trigger:
         # check for negation ("no family history")
-        neg = match_regex(negex.rgxs['definite']['left'],
-                          get_left_span(trigger, window=2))
+        neg = negex.match(trigger, 'definite', 'left', window=2)
         return ABSTAIN if neg else OTHER
 
     if 'section' in span.props:
@@ -53,9 +59,7 @@ def LF_header(span, negex):
 
 
 def LF_social(span):
-    rgx_social = re.compile(
-        r'''\b(friend(s)*|roomate(s)*|passenger(s)*)\b''', re.I
-    )
+    rgx_social = lf_regexes['family.social']
     left = get_left_span(span, span.sentence, window=6)
     right = get_right_span(span, span.sentence, window=6)
     left_trigger = match_regex(rgx_social, left)
@@ -64,24 +68,23 @@ def LF_social(span):
 
 
 def LF_history_of(span):
-    rgx = r'''\bfamily (history of|hx)'''
+    rgx = lf_regexes['family.history_of']
     text = get_left_span(span, span.sentence, window=6).text
-    return OTHER if re.search(rgx, text.strip(), re.I) else ABSTAIN
+    return OTHER if rgx.search(text.strip()) else ABSTAIN
 
 
 def LF_ext_family(span):
-    rgx = re.compile(r'''\b(spouse|wife|husband)\b''', re.I)
+    rgx = lf_regexes['family.ext_family']
     text = get_left_span(span, span.sentence, window=6).text
     return OTHER if rgx.search(text) else ABSTAIN
 
 
 def LF_donor(span):
-    rgx = r'''\b(donor)\b'''
-    text = get_left_span(span, span.sentence, window=6).text
-    return OTHER if re.search(rgx, span.sentence.text.strip(), re.I) else ABSTAIN
+    rgx = lf_regexes['family.donor']
+    return OTHER if rgx.search(span.sentence.text.strip()) else ABSTAIN
 
 
-class FamilyTagger(Tagger):
+class FamilyTagger(SpanTagger):
     """
     Concepts are generally attached to the patient. However, there
     are cases where concepts attach to family members or donors.
@@ -100,6 +103,7 @@ class FamilyTagger(Tagger):
             LF_history_of,
             LF_donor
         ]
+        lf_regexes.compile('family.')
 
         self.class_map = {
             1: "patient",
@@ -110,26 +114,26 @@ class FamilyTagger(Tagger):
         """ Apply labeling functions. """
         return np.array([lf(span) for lf in self.lfs])
 
-    def tag(self, document, **kwargs):
-        for i in document.annotations:
-            # apply to the following concept targets
-            for layer in self.targets:
-                if layer not in document.annotations[i]:
-                    continue
-                for span in document.annotations[i][layer]:
-                    L = self._apply_lfs(span)
-                    # majority vote
-                    if L.any() and self.label_reduction == 'mv':
-                        try:
-                            y = mode(L[L.nonzero()])
-                        except:
-                            # break ties
-                            y = 2
-                        span.props[self.prop_name] = y
-
-                    # logical or
-                    elif L.any() and self.label_reduction == 'or':
-                        if 2 in L:
-                            span.props[self.prop_name] = self.class_map[2]
-                        else:
-                            span.props[self.prop_name] = self.class_map[1]
+    def reads(self):
+        return set(self.targets) | {'props.section'}
+
+    def writes(self):
+        return {'props.subject'}
+
+    def tag_span(self, span, document, i, **kwargs):
+        L = self._apply_lfs(span)
+        # majority vote
+        if L.any() and self.label_reduction == 'mv':
+            try:
+                y = mode(L[L.nonzero()])
+            except:
+                # break ties
+                y = 2
+            span.props[self.prop_name] = y
+
+        # logical or
+        elif L.any() and self.label_reduction == 'or':
+            if 2 in L:
+                span.props[self.prop_name] = self.class_map[2]
+            else:
+                span.props[self.prop_name] = self.class_map[1]
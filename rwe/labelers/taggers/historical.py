@@ -2,8 +2,6 @@ import datetime
 from rwe.helpers import *
 from rwe.labelers.taggers import *
 from functools import partial
-from scipy.stats import mode
-import numpy as np
 
 #################################################################################
 #
@@ -15,6 +13,27 @@ ABSTAIN = 0
 POSITIVE = 1
 NEGATIVE = 2
 
+# labeling function patterns, compiled once by HistoricalTagger
+lf_regexes.add('historical.year', "(19[0-9]{2}|20[01][0-9])+s*")
+lf_regexes.add('historical.month_date', r'''on ((1[12]|[1-9])[/-](3[01]|[12][0-9]|[1-9]))\b''')
+lf_regexes.add('historical.date_sep', "[/-]", flags=0)
+lf_regexes.add('historical.history_of.accept_left', [
+    r'''\b(h/o|hx|history of)\b''',
+    r'''\b(s/p|SP|status[- ]post)\b''',
+    r'''\b(recent|previous)\b''',
+    r'''\b(in the (distant )*past)\b''',
+    r'''\b([0-9]{1,2} ((day|week|month|year)[s]*) prior)\b'''
+
+])
+lf_regexes.add('historical.history_of.reject_left', [
+    r'''\b(history of present illness|chief complaint|indication)[:]*\b''',
+    r'''\b(p/w|present(ed|s) with)\b''',
+    r'''\b(new onset)\b'''
+])
+lf_regexes.add('historical.history_of_list', r'''\b(h/o|hx|history of)\b''', flags=0)
+lf_regexes.add('historical.list_sep', "[;,]", flags=0)
+
+
 def LF_underspecified_date(span):
     """
     The DATETIME markup layer only contains datetimes that are easy to
@@ -40,7 +59,7 @@ def LF_underspecified_date(span):
 
     try:
         # year
-        for match in re.finditer("(19[0-9]{2}|20[01][0-9])+s*", span.sentence.text, re.I):
+        for match in lf_regexes['historical.year'].finditer(span.sentence.text):
             year = int(match.group().strip("s"))
             if doc_ts.year > year:
                 return POSITIVE
@@ -48,12 +67,10 @@ def LF_underspecified_date(span):
         return ABSTAIN
 
     # month/date
-    m = re.search(r'''on ((1[12]|[1-9])[/-](3[01]|[12][0-9]|[1-9]))\b''',
-                  span.sentence.text,
-                  re.I)
+    m = lf_regexes['historical.month_date'].search(span.sentence.text)
     if m:
         try:
-            month, date = map(int, re.split("[/-]", m.group(1)))
+            month, date = map(int, lf_regexes['historical.date_sep'].split(m.group(1)))
             ts = datetime.datetime(doc_ts.year, month, date)
             if doc_ts > ts:
                 return POSITIVE
@@ -91,30 +108,15 @@ def LF_history_of(span, window=25):
     left = " ".join(span.sentence.words[max(0, i - window):i])
     text = f'{left} {span.text}'
 
-    accept_left_rgxs = [
-        r'''\b(h/o|hx|history of)\b''',
-        r'''\b(s/p|SP|status[- ]post)\b''',
-        r'''\b(recent|previous)\b''',
-        r'''\b(in the (distant )*past)\b''',
-        r'''\b([0-9]{1,2} ((day|week|month|year)[s]*) prior)\b'''
-
-    ]
-    reject_left_rgxs = [
-        r'''\b(history of present illness|chief complaint|indication)[:]*\b''',
-        r'''\b(p/w|present(ed|s) with)\b''',
-        r'''\b(new onset)\b'''
-    ]
-
-    accept_right_rgxs = [
-        r'''\b(in the (distant )*past)\b'''
-    ]
+    accept_left_rgxs = lf_regexes['historical.history_of.accept_left']
+    reject_left_rgxs = lf_regexes['historical.history_of.reject_left']
 
     for rgx in reject_left_rgxs:
-        if re.search(rgx, text, re.I):
+        if rgx.search(text):
             return NEGATIVE
 
     for rgx in accept_left_rgxs:
-        m = re.search(rgx, text, re.I)
+        m = rgx.search(text)
         if m:
             return POSITIVE
 
@@ -134,7 +136,7 @@ def LF_in_history_of_list(span, targets):
      - Statement: 'history of multiple myeloma and multiple prior surgeries'
      - List: 'H/O bilateral hip replacements; MRSA infection; Osteopenia ...'
     """
-    for match in re.finditer(r'''\b(h/o|hx|history of)\b''', span.sentence.text):
+    for match in lf_regexes['historical.history_of_list'].finditer(span.sentence.text):
 
         # left  = Span(0, span.char_start-1, sentence)
         # right = Span(span.char_end+1, len(sentence.text), sentence)
@@ -156,14 +158,14 @@ def LF_in_history_of_list(span, targets):
         if len(dates) > 2 or len(concepts) > 4:
             return POSITIVE
 
-        # list of multiple elements
-        if len(re.split("[;,]", right.text, re.I)) > 4:
+        # list of multiple elements (re.I was passed here as maxsplit=2)
+        if len(lf_regexes['historical.list_sep'].split(right.text, 2)) > 4:
             return POSITIVE
 
     return ABSTAIN
 
 
-class HistoricalTagger(Tagger):
+class HistoricalTagger(LabelingFunctionTagger):
     """
 
     NOTE: We currently use a more restrictive definition of historical that
@@ -178,6 +180,9 @@ class HistoricalTagger(Tagger):
 
     """
 
+    # majority votes break ties like scipy.stats.mode
+    mv_ties = 'min'
+
     def __init__(self, targets, label_reduction='or'):
         self.prop_name = 'historical'
         self.targets = targets
@@ -190,27 +195,8 @@ class HistoricalTagger(Tagger):
             LF_underspecified_date,
             partial(LF_in_history_of_list, targets=targets)
         ]
+        lf_regexes.compile('historical.')
 
-    def _apply_lfs(self, span):
-        """ Apply labeling functions. """
-        return np.array([lf(span) for lf in self.lfs])
-
-    def tag(self, document, **kwargs):
-        for i in document.annotations:
-            # apply to the following concept targets
-            for layer in self.targets:
-                if layer not in document.annotations[i]:
-                    continue
-                for span in document.annotations[i][layer]:
-                    L = self._apply_lfs(span)
-                    # majority vote
-                    if L.any() and self.label_reduction == 'mv':
-                        y, _ = mode(L[L.nonzero()])
-                        span.props[self.prop_name] = y[0]
-                    # logical or
-                    elif L.any() and self.label_reduction == 'or':
-                        if 1 in L:
-                            span.props[self.prop_name] = 1
-                    # label matrix
-                    elif L.any() and self.label_reduction == 'matrix':
-                        span.props[self.prop_name] = L
+    def reads(self):
+        return set(self.targets) | {'HEADER', 'DATETIME', 'props.tdelta',
+                                    'doc.doctime'}
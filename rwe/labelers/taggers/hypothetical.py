@@ -9,7 +9,7 @@ import numpy as np
 #
 ###############################################################################
 
-class HypotheticalTagger(Tagger):
+class HypotheticalTagger(SpanTagger):
     """
     Hypothetical future events. These are discussed in future tense as
     speculative events.
@@ -66,17 +66,17 @@ class HypotheticalTagger(Tagger):
             L.append(v)
         return np.array(L)
 
-    def tag(self, document, ngrams=10):
-        for i in document.annotations:
-            # apply to the following concept targets
-            for layer in self.targets:
-                if layer not in document.annotations[i]:
-                    continue
-                for span in document.annotations[i][layer]:
-                    L = self._apply_lfs(span, document.sentences[i], ngrams)
-                    if L.any() and self.label_reduction == 'mv':
-                        y, _ = mode(L[L.nonzero()])
-                        span.props['hypothetical'] = y[0]
-                    elif L.any() and self.label_reduction == 'or':
-                        if int(1 in L):
-                            span.props['hypothetical'] = 1
\ No newline at end of file
+    def reads(self):
+        return set(self.targets)
+
+    def writes(self):
+        return {'props.hypothetical'}
+
+    def tag_span(self, span, document, i, ngrams=10, **kwargs):
+        L = self._apply_lfs(span, document.sentences[i], ngrams)
+        if L.any() and self.label_reduction == 'mv':
+            y, _ = mode(L[L.nonzero()])
+            span.props['hypothetical'] = y[0]
+        elif L.any() and self.label_reduction == 'or':
+            if int(1 in L):
+                span.props['hypothetical'] = 1
\ No newline at end of file
@@ -7,13 +7,21 @@ from rwe.labelers.taggers import *
 #
 ###############################################################################
 
-class LateralityTagger(Tagger):
+# compiled once by LateralityTagger
+lf_regexes.add('laterality.mention', "|".join([
+    r'''\b(bilat(eral)*|r/l|b/l)\b''',
+    r'''\b((left|right)[- ]*side[d]*|\( (left|right) \)|(left|right)|\( [lr] \)|(lt|rt)[.]*|[lr])\b'''
+]))
+
+
+class LateralityTagger(SpanTagger):
     """
     Right/Left/Bilateral spatial modifier.
     """
     def __init__(self, targets):
         self.labels = {'LEFT': 1, 'RIGHT': 2, 'BILATERAL': 3}
         self.targets = targets
+        lf_regexes.compile('laterality.')
 
     def _get_normed_laterality(self, t):
         laterality_map = {
@@ -33,15 +41,11 @@ class LateralityTagger(Tagger):
         """
         Extract closest laterality mention and normalize to a canonical format
         """
-        laterality_rgx = [
-            r'''\b(bilat(eral)*|r/l|b/l)\b''',
-            r'''\b((left|right)[- ]*side[d]*|\( (left|right) \)|(left|right)|\( [lr] \)|(lt|rt)[.]*|[lr])\b'''
-        ]
-        laterality_rgx = "|".join(laterality_rgx)
+        laterality_rgx = lf_regexes['laterality.mention']
         sent = span.get_parent() if not sentence else sentence
 
         # laterality mentioned in the entity?
-        for match in re.finditer(laterality_rgx, span.text, re.I):
+        for match in laterality_rgx.finditer(span.text):
             if match:
                 start, end = match.span()
                 return Span(char_start=span.char_start + start,
@@ -54,7 +58,7 @@ class LateralityTagger(Tagger):
 
         # left window
         matches = []
-        for match in re.finditer(laterality_rgx, left.get_span(), re.I):
+        for match in laterality_rgx.finditer(left.get_span()):
             start, end = match.span()
             ts = Span(char_start=left.char_start + start,
                       char_end=left.char_start + end - 1,
@@ -68,16 +72,16 @@ class LateralityTagger(Tagger):
 
         return None
 
-    def tag(self, document, ngrams=2):
-        for i in document.annotations:
-            # apply to the following concept targets
-            for layer in self.targets:
-                if layer not in document.annotations[i]:
-                    continue
-                for span in document.annotations[i][layer]:
-                    laterality = self._get_laterality(span,
-                                                      document.sentences[i],
-                                                      window=ngrams)
-                    if laterality:
-                        span.props['laterality'] = \
-                            self._get_normed_laterality(laterality)
+    def reads(self):
+        return set(self.targets)
+
+    def writes(self):
+        return {'props.laterality'}
+
+    def tag_span(self, span, document, i, ngrams=2, **kwargs):
+        laterality = self._get_laterality(span,
+                                          document.sentences[i],
+                                          window=ngrams)
+        if laterality:
+            span.props['laterality'] = \
+                self._get_normed_laterality(laterality)
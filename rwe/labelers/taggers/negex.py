@@ -1,13 +1,75 @@
 import re
 import csv
+from bisect import bisect_left
 from collections import defaultdict
-from rwe.helpers import get_left_span, get_right_span
+from rwe.contexts import Span
+from rwe.helpers import get_left_span, get_right_span, left_window, right_window
 import numpy as np
 from rwe.helpers import *
 from rwe.labelers.taggers import *
 from scipy.stats import mode
 
 
+def _is_word(c):
+    return c.isalnum() or c == '_'
+
+
+class TriggerIndex(object):
+    """
+    Every NegEx trigger match in a sentence, by category and direction.
+    Each candidate start is stored with the lengths of the terms matching
+    there (longest first), so a context window can be tested with bisect
+    and a word-boundary check instead of running the trigger regex over
+    the window text. `search` returns the same match as `rgx.search` on
+    the window text.
+    """
+    def __init__(self, sentence, scanners, terms):
+        self.sentence = sentence
+        self.text = sentence.text
+        self.starts = {}
+        self.lengths = {}
+        for key, scanner in scanners.items():
+            starts, lengths = [], []
+            for m in scanner.finditer(self.text):
+                p = m.start()
+                starts.append(p)
+                lengths.append([n for n, rgx in terms[key]
+                                if rgx.match(self.text, p)])
+            self.starts[key] = starts
+            self.lengths[key] = lengths
+
+    def _boundary(self, end, window_end):
+        # mirrors the trailing (\b|$) of NegEx patterns on the window text
+        if end == window_end:
+            return True
+        text = self.text
+        return _is_word(text[end - 1]) != _is_word(text[end]) or \
+            (end == window_end - 1 and text[end] == '\n')
+
+    def search(self, category, direction, start, end):
+        """
+        Leftmost trigger within sentence chars [start, end)
+
+        :param category: definite|probable|pseudo
+        :param direction: left|right
+        :param start:
+        :param end:
+        :return: Span or None
+        """
+        key = (category, direction)
+        if key not in self.starts:
+            return None
+        starts = self.starts[key]
+        k = bisect_left(starts, start)
+        while k < len(starts) and starts[k] < end:
+            p = starts[k]
+            for n in self.lengths[key][k]:
+                if p + n <= end and self._boundary(p + n, end):
+                    return Span(p, p + n - 1, self.sentence)
+            k += 1
+        return None
+
+
 class NegEx(object):
     '''
     NegEx
@@ -23,6 +85,45 @@ class NegEx(object):
         self.dictionary = NegEx.load("{}/{}".format(self.data_root,
                                                     self.filename))
         self.rgxs = NegEx.build_regexs(self.dictionary)
+        self.scanners, self.terms = NegEx.build_trigger_regexs(self.dictionary)
+        self._index = None
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_index'] = None
+        return state
+
+    def triggers(self, sentence):
+        """
+        Trigger index of `sentence`. The last index is kept, so labeling
+        functions sharing this NegEx scan each sentence once.
+
+        :param sentence:
+        :return: TriggerIndex
+        """
+        index = self._index
+        if index is None or index.sentence is not sentence or \
+                index.text is not sentence.text:
+            index = self._index = TriggerIndex(sentence, self.scanners,
+                                               self.terms)
+        return index
+
+    def match(self, span, category, direction, window=None):
+        """
+        Leftmost trigger in the left/right context window of `span`, the
+        same Span as `match_regex(self.rgxs[category][direction], cxt)`
+        where `cxt` is the `get_left_span` or `get_right_span` window.
+
+        :param span:
+        :param category:
+        :param direction:
+        :param window:
+        :return: Span or None
+        """
+        start, end = left_window(span, window=window) if direction == 'left' \
+            else right_window(span, window=window)
+        return self.triggers(span.sentence).search(category, direction,
+                                                   start, end)
 
     def negation(self, span, category, direction, window=3):
         """
@@ -99,6 +200,37 @@ class NegEx(object):
 
         return rgxs
 
+    @staticmethod
+    def build_trigger_regexs(dictionary):
+        """
+        Lookahead scanners that find every trigger start (including
+        overlapping ones) and per-length term patterns used to measure
+        each match. Terms are literal phrases, so a match is as long as
+        its term.
+
+        :param dictionary:
+        :return:
+        """
+        scanners, terms = {}, {}
+        for category in dictionary:
+            for direction, keep in [('left', ['forward', 'bidirectional']),
+                                    ('right', ['backward', 'bidirectional'])]:
+                words = [t["term"] for t in dictionary[category]
+                         if t['direction'] in keep]
+                if not words:
+                    continue
+                key = (category, direction)
+                scanners[key] = re.compile(
+                    r"(?=(?:{}))".format("|".join(words)), flags=re.I)
+                by_len = defaultdict(list)
+                for w in words:
+                    by_len[len(w)].append(w)
+                terms[key] = [
+                    (n, re.compile("|".join(by_len[n]), flags=re.I))
+                    for n in sorted(by_len, reverse=True)
+                ]
+        return scanners, terms
+
     @staticmethod
     def load(filename):
         '''
@@ -107,7 +239,7 @@ class NegEx(object):
         :return:
         '''
         negex = defaultdict(list)
-        with open(filename, 'rU') as of:
+        with open(filename, 'r') as of:
             reader = csv.reader(of, delimiter=',')
             for row in reader:
                 term = row[0]
@@ -130,7 +262,7 @@ class NegEx(object):
 #
 ###############################################################################
 
-class NegExTagger(Tagger):
+class NegExTagger(SpanTagger):
 
     def __init__(self, targets, data_root, label_reduction='or'):
         """
@@ -158,29 +290,29 @@ class NegExTagger(Tagger):
         Apply NegEx labeling functions.
         TODO: Window size is fixed here, choices of 5-8 perform well
         """
-        left = get_left_span(span, sentence, window=ngrams)
-        right = get_right_span(span, sentence, window=ngrams)
+        index = self.negex.triggers(sentence)
+        windows = {'left': left_window(span, sentence, window=ngrams),
+                   'right': right_window(span, sentence, window=ngrams)}
 
         L = []
         for name in sorted(self.negex.rgxs):
             for cxt in sorted(self.negex.rgxs[name]):
                 v = 0
-                text = left.text if cxt == 'left' else right.text
-                if self.negex.rgxs[name][cxt].search(text):
+                if index.search(name, cxt, *windows[cxt]):
                     v = self.class_map[name]
                 L.append(v)
         return np.array(L)
 
-    def tag(self, document, ngrams=6):
-        for i in document.annotations:
-            # apply to the following concept targets
-            for layer in self.targets:
-                if layer not in document.annotations[i]:
-                    continue
-                for span in document.annotations[i][layer]:
-                    L = self._apply_lfs(span, document.sentences[i], ngrams)
-                    if L.any() and self.label_reduction == 'mv':
-                        y, _ = mode(L[L.nonzero()])
-                        span.props['negated'] = y[0]
-                    elif L.any() and self.label_reduction == 'or':
-                        span.props['negated'] = int(1 in L)
\ No newline at end of file
+    def reads(self):
+        return set(self.targets)
+
+    def writes(self):
+        return {'props.negated'}
+
+    def tag_span(self, span, document, i, ngrams=6, **kwargs):
+        L = self._apply_lfs(span, document.sentences[i], ngrams)
+        if L.any() and self.label_reduction == 'mv':
+            y, _ = mode(L[L.nonzero()])
+            span.props['negated'] = y[0]
+        elif L.any() and self.label_reduction == 'or':
+            span.props['negated'] = int(1 in L)
\ No newline at end of file
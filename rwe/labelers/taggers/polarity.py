@@ -1,12 +1,9 @@
 import re
-import numpy as np
-#from scipy.stats import mode
-from statistics import mode
 
 from rwe.contexts import Span
 from functools import partial
 from rwe.helpers import get_left_span, get_right_span, get_between_span, token_distance, match_regex
-from rwe.labelers.taggers import Tagger
+from rwe.labelers.taggers import LabelingFunctionTagger, lf_regexes
 from rwe.labelers.taggers.negex import NegEx
 
 ABSTAIN = 0
@@ -17,6 +14,57 @@ NON_NEGATED = 2
 pseudo_negation_rgx = re.compile(r'''(limited to|rule out)''', re.I)
 #pseudo_negation_left = re.compile(r'''(not associated with|no improvement in)''', re.I)
 
+# labeling function patterns, compiled once by PolarityTagger
+negation_terms = r'''(no|not|never|cannot|negative for|negative|neg|absent|ruled out|without|absence of|den(y|ied|ies))'''
+
+lf_regexes.add('polarity.reject_sections', [r'''past medical history'''])
+lf_regexes.add('polarity.plus_minus', r'''^[-=]([A-Z]+|[A-Za-z][/])\b''', flags=0)
+lf_regexes.add('polarity.left_context.neg', [
+    r'''\b(no|did not have|neg(ative)* for) (mild|slight|minimal|severe|moderate|extensive|marked|extreme|significant|progressive)\b''',
+    r'''\b(no|did not have|neg(ative)* for) (known|evidence of|evidence)\b'''
+])
+lf_regexes.add('polarity.left_context.pos', [
+    r'''(cannot exclude|does not become|may not|possible|evaluate for|suggests)''',  # hedged
+    r'''(mild|minimal|severe|moderate|extensive|coarse|marked|extreme|significant|trivial|progressive|slight)(ly)*''',
+    # severity
+    r'''(diagnosed with|known to have|known|non-specific|presented|secondary to|treated for|acute onset|improving|improved|improvement|involvement|resolved|consistent with|showed|presumed|suspicious for|check for|revealed|new onset|were noted|found to be|demonstrate(d)*)''',
+    # present now
+    r'''\b((in|de)creas(e|ed|ing)|up|down)\b''',  # LF_change_words_left
+    r'''(s/p|status[- ]post)''',
+])
+lf_regexes.add('polarity.right_context', [
+    r'''((?<!no )(mild|minimal|severe|moderate|extensive|coarse|marked|extreme|significant|trivial|progressive|slight)(ly)*)''',
+    # LF_severity_right
+    r'''(was (found to have|impaired|relieved|stable)|is present|withdrawal|of the)'''  # LF_present_now_right
+])
+lf_regexes.add('polarity.temporal_left', r'(no|(does|has) not|not had|without|denies) (history of|prior|chronic|residual|occasional|restarted|post-surgical changes|again noted|immediate(ly)*|remained on)')
+lf_regexes.add('polarity.temporal_left.neg', r'''(no|(does|has) not|not had|without|denies)\b''')
+lf_regexes.add('polarity.short_sentence', negation_terms)
+lf_regexes.add('polarity.no_negation_terms', r'''\b(no|w[/]o|[(][-][)]|not|non|none|free|never|cannot|negative for|negative|neg|absent|ruled out|without|absence of|den(y|ied|ies))\b''')
+lf_regexes.add('polarity.header', r'^(admitting diagnosis|chief complaint|discharge diagnosis|past medical history|history of present illness|indication)[:]*')
+lf_regexes.add('polarity.head_word', r'''^''' + negation_terms + r'''\b''')
+lf_regexes.add('polarity.terminator_word.trigger', negation_terms + r'''\b''')
+lf_regexes.add('polarity.terminator_word', r'''\b(but|after|post|prior|before|during|rather than)\b|\n|[:;]''')
+lf_regexes.add('polarity.pseudo_left_exp', r'''\b(exclude|improvement of|performed|be quantified|not limited to|be adequately assessed|do not indicate|significant change)\b''')
+lf_regexes.add('polarity.pseudo_left_expanded', [
+    r'''\b((significant )*(change[s]* in|improvement))\b''',
+    r'''\b((in|de)creas(e|ed|ing)|up|down)\b'''
+])
+lf_regexes.add('polarity.denies', r'''\b(den(ying|y|ies|ied))\b''')
+lf_regexes.add('polarity.list_sep', r'''[,;/]''', flags=0)
+lf_regexes.add('polarity.verb_left', r'''((no|not|(den(y|ies|ied|ying))) )*(\w+ ){1,}(is a|is|will be|are)$''')
+lf_regexes.add('polarity.verb_left.neg', r'''\b(no|not|den(y|ies|ied|ying))\b''')
+lf_regexes.add('polarity.positive_left', r'''\b(positive for|suggestive of|due to|shows)\b''')
+lf_regexes.add('polarity.no_not', r'''\b(no|not)\b''')
+lf_regexes.add('polarity.list_sep_2', r'''[,;]''', flags=0)
+lf_regexes.add('polarity.definite_right', r'''\b(not present|no evidence|is (absent|not seen)|ruled out|were negative)\b''')
+lf_regexes.add('polarity.header_break', r'''\s{2,}((?:(?:[A-Z][A-Za-z]+\s){1,4}(?:[A-Za-z]+))[:])''', flags=0)
+lf_regexes.add('polarity.exclusion.left', r'''(inadequate\s+to|does\s+not|cannot|can't)\s+exclude''')
+lf_regexes.add('polarity.exclusion.right', r'''(cannot\s+be|not\s+be|doesn't|not|to)\s+exclude[d]*''')
+lf_regexes.add('polarity.rule_out', r'''(cannot|does not|doesn't) rule[s]* out''')
+lf_regexes.add('polarity.rule_out.neg', r'''(cannot|does not|doesn't)''')
+lf_regexes.add('polarity.none', r'''\bnone\b''')
+
 
 def get_containing_span(span):
     # add end padding to make computing span simpler
@@ -46,16 +94,13 @@ def LF_plus_minus_prefix(span):
     if len(span.text) == 0:
         return ABSTAIN
 
-    reject_sections = [
-        re.compile(r'''past medical history''', re.I)
-    ]
-    for rgx in reject_sections:
+    for rgx in lf_regexes['polarity.reject_sections']:
         if rgx.search(span.sentence.text):
             return ABSTAIN
 
     cspan = get_containing_span(span)
     modifier = cspan.text[0]
-    if re.search(r'''^[-=]([A-Z]+|[A-Za-z][/])\b''', cspan.text):
+    if lf_regexes['polarity.plus_minus'].search(cspan.text):
         return NEGATED
 
     elif modifier in ['+']:
@@ -64,8 +109,7 @@ def LF_plus_minus_prefix(span):
 
 
 def LF_definite_left_0(span, negex):
-    left = get_left_span(span, span.sentence, window=6)
-    trigger = match_regex(negex.rgxs['definite']['left'], left)
+    trigger = negex.match(span, 'definite', 'left', window=6)
     if not trigger:
         return ABSTAIN
     dist = token_distance(trigger, span)
@@ -73,8 +117,7 @@ def LF_definite_left_0(span, negex):
 
 
 def LF_definite_left_1_3(span, negex):
-    left = get_left_span(span, span.sentence, window=6)
-    trigger = match_regex(negex.rgxs['definite']['left'], left)
+    trigger = negex.match(span, 'definite', 'left', window=6)
     if not trigger:
         return ABSTAIN
     dist = token_distance(trigger, span)
@@ -87,8 +130,7 @@ def LF_definite_left_1_3(span, negex):
 
 
 def LF_definite_left_4_6(span, negex):
-    left = get_left_span(span, span.sentence, window=6)
-    trigger = match_regex(negex.rgxs['definite']['left'], left)
+    trigger = negex.match(span, 'definite', 'left', window=6)
     if not trigger:
         return ABSTAIN
     dist = token_distance(trigger, span)
@@ -101,8 +143,7 @@ def LF_definite_left_4_6(span, negex):
 
 
 def LF_definite_left_7_10(span, negex):
-    left = get_left_span(span, span.sentence)
-    trigger = match_regex(negex.rgxs['definite']['left'], left)
+    trigger = negex.match(span, 'definite', 'left')
     if not trigger:
         return ABSTAIN
     dist = token_distance(trigger, span)
@@ -115,8 +156,7 @@ def LF_definite_left_7_10(span, negex):
 
 
 def LF_probable_left_0(span, negex):
-    left = get_left_span(span, span.sentence, window=6)
-    trigger = match_regex(negex.rgxs['probable']['left'], left)
+    trigger = negex.match(span, 'probable', 'left', window=6)
     if not trigger:
         return ABSTAIN
     dist = token_distance(trigger, span)
@@ -124,8 +164,7 @@ def LF_probable_left_0(span, negex):
 
 
 def LF_probable_left_1_3(span, negex):
-    left = get_left_span(span, span.sentence, window=6)
-    trigger = match_regex(negex.rgxs['probable']['left'], left)
+    trigger = negex.match(span, 'probable', 'left', window=6)
     if not trigger:
         return ABSTAIN
     dist = token_distance(trigger, span)
@@ -136,8 +175,7 @@ def LF_probable_left_1_3(span, negex):
 
 
 def LF_probable_left_4_6(span, negex):
-    left = get_left_span(span, span.sentence, window=6)
-    trigger = match_regex(negex.rgxs['probable']['left'], left)
+    trigger = negex.match(span, 'probable', 'left', window=6)
     if not trigger:
         return ABSTAIN
     dist = token_distance(trigger, span)
@@ -148,71 +186,45 @@ def LF_probable_left_4_6(span, negex):
 
 
 def LF_definite_left(span, negex):
-    text = get_left_span(span, span.sentence, window=6).text
-    rgx = negex.rgxs['definite']['left']
     if pseudo_negation(span):
         return ABSTAIN
-    return NEGATED if rgx.search(text) else ABSTAIN
+    return NEGATED if negex.match(span, 'definite', 'left', window=6) else ABSTAIN
 
 
 def LF_definite_right(span, negex):
-    text = get_right_span(span, span.sentence, window=6).text
-    rgx = negex.rgxs['definite']['right']
     if pseudo_negation(span):
         return ABSTAIN
-    return NEGATED if rgx.search(text) else ABSTAIN
+    return NEGATED if negex.match(span, 'definite', 'right', window=6) else ABSTAIN
 
 
 def LF_probable_left(span, negex):
-    text = get_left_span(span, span.sentence, window=6).text
-    rgx = negex.rgxs['probable']['left']
     if pseudo_negation(span):
         return ABSTAIN
-    return NEGATED if rgx.search(text) else ABSTAIN
+    return NEGATED if negex.match(span, 'probable', 'left', window=6) else ABSTAIN
 
 
 def LF_probable_right(span, negex):
-    text = get_right_span(span, span.sentence, window=6).text
-    rgx = negex.rgxs['probable']['right']
     if pseudo_negation(span):
         return ABSTAIN
-    return NEGATED if rgx.search(text) else ABSTAIN
+    return NEGATED if negex.match(span, 'probable', 'right', window=6) else ABSTAIN
 
 
 def LF_pseudo_left(span, negex):
-    text = get_left_span(span, span.sentence, window=6).text
-    rgx = negex.rgxs['pseudo']['left']
-    return NON_NEGATED if rgx.search(text) else ABSTAIN
+    return NON_NEGATED if negex.match(span, 'pseudo', 'left', window=6) else ABSTAIN
 
 
 def LF_left_context(span):
     left = get_left_span(span, span.sentence, window=6)
 
     # negated mentions
-    neg_rgxes = [
-        r'''\b(no|did not have|neg(ative)* for) (mild|slight|minimal|severe|moderate|extensive|marked|extreme|significant|progressive)\b''',
-        r'''\b(no|did not have|neg(ative)* for) (known|evidence of|evidence)\b'''
-    ]
-    neg_rgxes = [re.compile(rgx, re.I) for rgx in neg_rgxes]
-
+    neg_rgxes = lf_regexes['polarity.left_context.neg']
     for rgx in neg_rgxes:
         trigger = match_regex(rgx, left)
         if trigger and token_distance(trigger, span) <= 2:
             return NEGATED
 
     # positive mentions
-    pos_regxes = [
-        r'''(cannot exclude|does not become|may not|possible|evaluate for|suggests)''',  # hedged
-        r'''(mild|minimal|severe|moderate|extensive|coarse|marked|extreme|significant|trivial|progressive|slight)(ly)*''',
-        # severity
-        r'''(diagnosed with|known to have|known|non-specific|presented|secondary to|treated for|acute onset|improving|improved|improvement|involvement|resolved|consistent with|showed|presumed|suspicious for|check for|revealed|new onset|were noted|found to be|demonstrate(d)*)''',
-        # present now
-        r'''\b((in|de)creas(e|ed|ing)|up|down)\b''',  # LF_change_words_left
-        r'''(s/p|status[- ]post)''',
-
-    ]
-    pos_regxes = [re.compile(rgx, re.I) for rgx in pos_regxes]
-
+    pos_regxes = lf_regexes['polarity.left_context.pos']
     for rgx in pos_regxes:
         if rgx.search(span.text):
             return NON_NEGATED
@@ -221,12 +233,7 @@ def LF_left_context(span):
 
 def LF_right_context(span):
     text = get_right_span(span, span.sentence, window=6).text
-    regxes = [
-        r'''((?<!no )(mild|minimal|severe|moderate|extensive|coarse|marked|extreme|significant|trivial|progressive|slight)(ly)*)''',
-        # LF_severity_right
-        r'''(was (found to have|impaired|relieved|stable)|is present|withdrawal|of the)'''  # LF_present_now_right
-    ]
-    regxes = [re.compile(rgx, re.I) for rgx in regxes]
+    regxes = lf_regexes['polarity.right_context']
     for rgx in regxes:
         if rgx.search(text):
             return NON_NEGATED
@@ -235,13 +242,11 @@ def LF_right_context(span):
 
 def LF_temporal_left(span):
     left = get_left_span(span, window=100)
-    rgx = re.compile(
-        r'(no|(does|has) not|not had|without|denies) (history of|prior|chronic|residual|occasional|restarted|post-surgical changes|again noted|immediate(ly)*|remained on)',
-        re.I)
+    rgx = lf_regexes['polarity.temporal_left']
     match = rgx.search(left.text)
     if not match:
         return ABSTAIN
-    if re.search(r'''(no|(does|has) not|not had|without|denies)\b''', match.group(), re.I):
+    if lf_regexes['polarity.temporal_left.neg'].search(match.group()):
         return NEGATED
     else:
         return NON_NEGATED
@@ -249,8 +254,7 @@ def LF_temporal_left(span):
 
 def LF_short_sentence(span):
     """A sentence mostly consisting of the target span and no negation words."""
-    rgx = re.compile(
-        r'(no|not|never|cannot|negative for|negative|neg|absent|ruled out|without|absence of|den(y|ied|ies))', re.I)
+    rgx = lf_regexes['polarity.short_sentence']
     v = len(span.sentence.words) < 5
     v &= not rgx.search(span.sentence.text)
     return NON_NEGATED if v else ABSTAIN
@@ -258,18 +262,14 @@ def LF_short_sentence(span):
 
 def LF_no_negation_terms(span):
     """No negation words or punctuation are found anywhere in the sentence."""
-    rgx = re.compile(
-        r'''\b(no|w[/]o|[(][-][)]|not|non|none|free|never|cannot|negative for|negative|neg|absent|ruled out|without|absence of|den(y|ied|ies))\b''',
-        re.I)
+    rgx = lf_regexes['polarity.no_negation_terms']
     v = not rgx.search(span.sentence.text)
-    v &= not re.search(r'''[-]''', span.sentence.text)
+    v &= '-' not in span.sentence.text
     return NON_NEGATED if v else ABSTAIN
 
 
 def LF_header(span):
-    rgx = re.compile(
-        r'^(admitting diagnosis|chief complaint|discharge diagnosis|past medical history|history of present illness|indication)[:]*',
-        re.I)
+    rgx = lf_regexes['polarity.header']
     v = rgx.search(span.sentence.text.strip()) is not None
     right = get_right_span(span, window=1).text
     v |= right == ':'
@@ -277,19 +277,15 @@ def LF_header(span):
 
 
 def LF_head_word(span):
-    rgx = re.compile(
-        r'''^(no|not|never|cannot|negative for|negative|neg|absent|ruled out|without|absence of|den(y|ied|ies))\b''',
-        re.I)
+    rgx = lf_regexes['polarity.head_word']
     left = get_left_span(span, span.sentence)
     n = len(left.get_attrib_span('words'))
     return NEGATED if rgx.search(left.text.strip()) else ABSTAIN
 
 
 def LF_terminator_word_left(span):
-    trigger_rgx = re.compile(
-        r'''(no|not|never|cannot|negative for|negative|neg|absent|ruled out|without|absence of|den(y|ied|ies))\b''',
-        re.I)
-    rgx = re.compile(r'''\b(but|after|post|prior|before|during|rather than)\b|\n|[:;]''', re.I)
+    trigger_rgx = lf_regexes['polarity.terminator_word.trigger']
+    rgx = lf_regexes['polarity.terminator_word']
     # find closest trigger word
     text = get_left_span(span, span.sentence, window=6).text
     matches = [m for m in trigger_rgx.finditer(span.sentence.text) if m.span()[-1] < span.char_start]
@@ -311,21 +307,16 @@ def LF_terminator_word_left(span):
 
 
 def LF_pseudo_left_exp(span, negex):
-    pseudo_rgx = re.compile(
-        r'''\b(exclude|improvement of|performed|be quantified|not limited to|be adequately assessed|do not indicate|significant change)\b''',
-        re.I)
-    rgx = negex.rgxs['definite']['left']
+    pseudo_rgx = lf_regexes['polarity.pseudo_left_exp']
+    if not negex.match(span, 'definite', 'left', window=6):
+        return ABSTAIN
     text = get_left_span(span, span.sentence, window=6).text
-    return NON_NEGATED if rgx.search(text) and pseudo_rgx.search(text) else ABSTAIN
+    return NON_NEGATED if pseudo_rgx.search(text) else ABSTAIN
 
 
 def LF_pseudo_left_expanded(span, negex):
-    pseudo_rgxs = [
-        r'''\b((significant )*(change[s]* in|improvement))\b''',
-        r'''\b((in|de)creas(e|ed|ing)|up|down)\b'''
-    ]
-    left = get_left_span(span)
-    trigger = match_regex(negex.rgxs['definite']['left'], left)
+    pseudo_rgxs = lf_regexes['polarity.pseudo_left_expanded']
+    trigger = negex.match(span, 'definite', 'left')
     if not trigger or token_distance(trigger, span) > 20:
         return ABSTAIN
 
@@ -334,7 +325,7 @@ def LF_pseudo_left_expanded(span, negex):
         return ABSTAIN
 
     for rgx in pseudo_rgxs:
-        if re.search(rgx, btw.text, re.I):
+        if rgx.search(btw.text):
             return NON_NEGATED
 
     return ABSTAIN
@@ -342,7 +333,7 @@ def LF_pseudo_left_expanded(span, negex):
 
 def LF_denies_list(span):
     """ Patient denies X,Y,Z. """
-    rgx = re.compile(r'''\b(den(ying|y|ies|ied))\b''', re.I)
+    rgx = lf_regexes['polarity.denies']
     left = get_left_span(span, window=100)
     trigger = match_regex(rgx, left)
     if not trigger:
@@ -352,31 +343,27 @@ def LF_denies_list(span):
     if not btw:
         return ABSTAIN
 
-    n = len(re.findall(r'''[,;/]''', btw.text))
+    n = len(lf_regexes['polarity.list_sep'].findall(btw.text))
     return NEGATED if n >= 1 else ABSTAIN
 
 
 def LF_verb_left(span):
     left = get_left_span(span, span.sentence, window=50).text
-    rgx = r'''((no|not|(den(y|ies|ied|ying))) )*(\w+ ){1,}(is a|is|will be|are)$'''
-    m = re.search(rgx, left, re.I)
-    return NON_NEGATED if m and not re.search(r'''\b(no|not|den(y|ies|ied|ying))\b''', m.group(), re.I) else ABSTAIN
+    m = lf_regexes['polarity.verb_left'].search(left)
+    return NON_NEGATED if m and not lf_regexes['polarity.verb_left.neg'].search(m.group()) else ABSTAIN
 
 
 def LF_positive_left(span):
     left = get_left_span(span, window=10)
-    rgx = r'''\b(positive for|suggestive of|due to|shows)\b'''
-    trigger = match_regex(rgx, left)
+    trigger = match_regex(lf_regexes['polarity.positive_left'], left)
     if not trigger:
         return ABSTAIN
     left = get_left_span(trigger, window=50)
-    m = re.search(r'''\b(no|not)\b''', left.text, re.I)
-    return NON_NEGATED if not re.search(r'''\b(no|not)\b''', left.text, re.I) else ABSTAIN
+    return NON_NEGATED if not lf_regexes['polarity.no_not'].search(left.text) else ABSTAIN
 
 
 def LF_definite_left_list(span, negex):
-    left = get_left_span(span, span.sentence, window=100)
-    trigger = match_regex(negex.rgxs['definite']['left'], left)
+    trigger = negex.match(span, 'definite', 'left', window=100)
     if not trigger:
         return ABSTAIN
     dist = token_distance(trigger, span)
@@ -386,7 +373,7 @@ def LF_definite_left_list(span, negex):
     if pseudo_negation_rgx.search(right.text):
         return ABSTAIN
 
-    return NEGATED if dist <= 10 and btw and len(re.findall(r'''[,;]''', btw.text)) > 1 else ABSTAIN
+    return NEGATED if dist <= 10 and btw and len(lf_regexes['polarity.list_sep_2'].findall(btw.text)) > 1 else ABSTAIN
 
 
 def LF_left_punct(span):
@@ -399,28 +386,26 @@ def LF_left_punct(span):
 
 def LF_definite_right_expanded(span):
     right = get_right_span(span, span.sentence, window=6)
-    rgx = r'''\b(not present|no evidence|is (absent|not seen)|ruled out|were negative)\b'''
-    trigger = match_regex(rgx, right)
+    trigger = match_regex(lf_regexes['polarity.definite_right'], right)
     if trigger and token_distance(trigger, span) <= 1:
         return NEGATED
     return ABSTAIN
 
 
 def LF_header_break_negation(span, negex):
-    left = get_left_span(span)
-    trigger = match_regex(negex.rgxs['definite']['left'], left)
+    trigger = negex.match(span, 'definite', 'left')
     if not trigger:
         return ABSTAIN
     btw = get_between_span(trigger, span)
     if not btw:
         return ABSTAIN
-    rgx = r'''\s{2,}((?:(?:[A-Z][A-Za-z]+\s){1,4}(?:[A-Za-z]+))[:])'''
-    return NON_NEGATED if re.search(rgx, btw.text) else ABSTAIN
+    rgx = lf_regexes['polarity.header_break']
+    return NON_NEGATED if rgx.search(btw.text) else ABSTAIN
 
 
 def LF_pseudo_negation_exclusion(span):
-    left_rgx = r'''(inadequate\s+to|does\s+not|cannot|can't)\s+exclude'''
-    right_rgx = r'''(cannot\s+be|not\s+be|doesn't|not|to)\s+exclude[d]*'''
+    left_rgx = lf_regexes['polarity.exclusion.left']
+    right_rgx = lf_regexes['polarity.exclusion.right']
 
     left = get_left_span(span)
     trigger = match_regex(left_rgx, left)
@@ -436,16 +421,16 @@ def LF_pseudo_negation_exclusion(span):
 
 
 def LF_pseudo_negation_rule_out(span):
-    left_rgx = r'''(cannot|does not|doesn't) rule[s]* out'''
+    left_rgx = lf_regexes['polarity.rule_out']
     left = get_left_span(span)
     trigger = match_regex(left_rgx, left)
     if not trigger or token_distance(trigger, span) > 5:
         return ABSTAIN
-    return NON_NEGATED if re.search(r'''(cannot|does not|doesn't)''',
-                                    trigger.text, re.I) else NEGATED
+    return NON_NEGATED if lf_regexes['polarity.rule_out.neg'].search(
+        trigger.text) else NEGATED
 
 def LF_none(span):
-    right_rgx = r'''\bnone\b'''
+    right_rgx = lf_regexes['polarity.none']
     right = get_right_span(span)
     trigger = match_regex(right_rgx, right)
     return NEGATED if trigger and token_distance(trigger, span) <= 2 else ABSTAIN
@@ -462,11 +447,11 @@ def pseudo_negation(span):
     return False
 
 
-class PolarityTagger(Tagger):
+class PolarityTagger(LabelingFunctionTagger):
 
     def __init__(self, targets, data_root, label_reduction='mv'):
         """
-        label_reduction:  or|mv
+        label_reduction:  or|mv|matrix
         """
         self.prop_name = 'polarity'
         self.targets = targets
@@ -505,32 +490,7 @@ class PolarityTagger(Tagger):
             LF_pseudo_negation_rule_out,
             LF_none
         ]
+        lf_regexes.compile('polarity.')
 
-    def _apply_lfs(self, span):
-        """ Apply labeling functions. """
-        return np.array([lf(span) for lf in self.lfs])
-
-    def tag(self, document, **kwargs):
-        for i in document.annotations:
-            # apply to the following concept targets
-            for layer in self.targets:
-                if layer not in document.annotations[i]:
-                    continue
-                for span in document.annotations[i][layer]:
-                    L = self._apply_lfs(span)
-                    # majority vote
-                    if L.any() and self.label_reduction == 'mv':
-                        try:
-                            y = mode(L[L.nonzero()])
-                        except:
-                            y = 2 # break ties
-                        span.props[self.prop_name] = self.class_map[y]
-
-                    # logical or
-                    elif L.any() and self.label_reduction == 'or':
-                        if 1 in L:
-                            span.props[self.prop_name] = 1
-
-                    # label matrix
-                    elif L.any() and self.label_reduction == 'matrix':
-                        span.props[self.prop_name] = L
\ No newline at end of file
+    def reads(self):
+        return set(self.targets)
@@ -69,6 +69,12 @@ class SectionHeaderTagger(Tagger):
                     continue
                 yield (i, span)
 
+    def reads(self):
+        return set()
+
+    def writes(self):
+        return {'HEADER'}
+
     def tag(self, document, ngrams=6, stopwords=[]):
         """ """
         candgen = Ngrams(n_max=ngrams)
@@ -101,29 +107,30 @@ class SectionHeaderTagger(Tagger):
             document.annotations[sidx].update({'HEADER': header_index[sidx]})
 
 
-class ParentSectionTagger(Tagger):
+class ParentSectionTagger(SpanTagger):
 
     def __init__(self, targets, major_headers=None):
         self.prop_name = 'section'
         self.targets = targets
         self.major_headers = {} if not major_headers else major_headers
 
-    def tag(self, document, **kwargs):
-        for i in document.annotations:
-            for layer in self.targets:
-                if layer not in document.annotations[i]:
-                    continue
-                # assign all spans to a parent
-                for span in document.annotations[i][layer]:
-                    # walk up each sentence to find the major section header
-                    for j in range(i, -1, -1):
-                        # TODO - check all headers found in a sentence
-                        h = document.annotations[j]['HEADER'][0]
-                        # just assign the closest header tag
-                        if not self.major_headers:
-                            break
-                        elif h and self.major_headers:
-                            if h.text in self.major_headers and \
-                                    span.abs_char_start > h.abs_char_end:
-                                break
-                    span.props[self.prop_name] = h
+    def reads(self):
+        return set(self.targets) | {'HEADER'}
+
+    def writes(self):
+        return {'props.section'}
+
+    def tag_span(self, span, document, i, **kwargs):
+        # assign span to a parent, walking up each sentence to find the
+        # major section header
+        for j in range(i, -1, -1):
+            # TODO - check all headers found in a sentence
+            h = document.annotations[j]['HEADER'][0]
+            # just assign the closest header tag
+            if not self.major_headers:
+                break
+            elif h and self.major_headers:
+                if h.text in self.major_headers and \
+                        span.abs_char_start > h.abs_char_end:
+                    break
+        span.props[self.prop_name] = h
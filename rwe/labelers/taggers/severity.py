@@ -21,14 +21,11 @@
 # intense
 
 import re
-import numpy as np
-#from scipy.stats import mode
-from statistics import mode
 
 from rwe.contexts import Span
 from functools import partial
 from rwe.helpers import get_left_span, get_right_span, get_between_span, token_distance, match_regex
-from rwe.labelers.taggers import Tagger
+from rwe.labelers.taggers import LabelingFunctionTagger, lf_regexes
 
 ABSTAIN  = 0
 SLIGHT   = 1
@@ -36,29 +33,31 @@ MODERATE = 2
 SEVERE   = 3
 UNMARKED = 4
 
+# labeling function patterns, compiled once by SeverityTagger
+lf_regexes.add('severity.slight', r'''\b((slight|minimal)(ly)*|trace|minor|trivial|little|partial|min)\b''')
+lf_regexes.add('severity.moderate', r'''((moderate|mild)(ly)*|large)''')
+lf_regexes.add('severity.severe', r'''(sharp|knife-like|significant|extensive|extreme|(marked|severe)(ly)*|severity)''')
+
 def LF_slight(span):
-    rgx = r'''\b((slight|minimal)(ly)*|trace|minor|trivial|little|partial|min)\b'''
     text = get_left_span(span, span.sentence, window=6).text
-    return SLIGHT if re.search(rgx, text, re.I) else ABSTAIN
+    return SLIGHT if lf_regexes['severity.slight'].search(text) else ABSTAIN
 
 
 def LF_moderate(span):
-    rgx = r'''((moderate|mild)(ly)*|large)'''
     text = get_left_span(span, span.sentence, window=6).text
-    return MODERATE if re.search(rgx, text, re.I) else ABSTAIN
+    return MODERATE if lf_regexes['severity.moderate'].search(text) else ABSTAIN
 
 
 def LF_severe(span):
-    rgx = r'''(sharp|knife-like|significant|extensive|extreme|(marked|severe)(ly)*|severity)'''
     text = get_left_span(span, span.sentence, window=6).text
-    return SEVERE if re.search(rgx, text, re.I) else ABSTAIN
+    return SEVERE if lf_regexes['severity.severe'].search(text) else ABSTAIN
 
 
-class SeverityTagger(Tagger):
+class SeverityTagger(LabelingFunctionTagger):
 
     def __init__(self, targets, data_root, label_reduction='mv'):
         """
-        label_reduction:  or|mv
+        label_reduction:  or|mv|matrix
         """
         self.prop_name = 'severity'
         self.targets = targets
@@ -76,27 +75,7 @@ class SeverityTagger(Tagger):
             LF_moderate,
             LF_severe
         ]
+        lf_regexes.compile('severity.')
 
-    def _apply_lfs(self, span):
-        """ Apply labeling functions. """
-        return np.array([lf(span) for lf in self.lfs])
-
-    def tag(self, document, **kwargs):
-        for i in document.annotations:
-            # apply to the following concept targets
-            for layer in self.targets:
-                if layer not in document.annotations[i]:
-                    continue
-                for span in document.annotations[i][layer]:
-                    L = self._apply_lfs(span)
-                    # majority vote
-                    if L.any() and self.label_reduction == 'mv':
-                        try:
-                            y = mode(L[L.nonzero()])
-                        except:
-                            y = 4 # break ties
-                        span.props[self.prop_name] = self.class_map[y]
-
-                    # label matrix
-                    elif L.any() and self.label_reduction == 'matrix':
-                        span.props[self.prop_name] = L
\ No newline at end of file
+    def reads(self):
+        return set(self.targets)
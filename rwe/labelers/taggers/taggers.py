@@ -1,10 +1,22 @@
 import re
+import os
+import json
+import time
+import mmap
+import hashlib
+import numpy as np
 import pandas as pd
+from scipy import sparse
+from array import array
+from bisect import bisect_left, bisect_right
 from itertools import product
 from rwe.contexts import Span, Relation
 from collections import defaultdict, namedtuple
 
 
+rgx_whitespace = re.compile(r'''\s{2,}|\n{1,}''')
+
+
 def get_text(words, offsets):
     s = ''
     for i, term in zip(offsets, words):
@@ -44,29 +56,29 @@ class Ngrams(object):
         self.max_ngrams = n_max
         self.split_on = split_on
 
-    def apply(self, s):
-        # covert to source char offsets
-        text = get_text(s.words, s.char_offsets)
-
+    def offsets(self, s):
+        """Yield (char_start, char_end) of all n-grams, char_end exclusive"""
         # apply alternate tokenization
         if self.split_on:
             words, char_offsets = retokenize(s, self.split_on)
         else:
             words, char_offsets = s.words, s.char_offsets
 
-        matches = []
-        for i in range(0, len(words)):
-            match = None
+        n = len(words)
+        for i in range(0, n):
             start = char_offsets[i]
             # ignore leading whitespace
             if not words[i].strip():
                 continue
-            for j in range(i + 1, min(i + self.max_ngrams + 1, len(words) + 1)):
+            for j in range(i + 1, min(i + self.max_ngrams + 1, n + 1)):
                 # ignore trailing whitespace
                 if not words[j - 1].strip():
                     continue
-                end = char_offsets[j - 1] + len(words[j - 1])
-                yield Span(start, end - 1, s)
+                yield start, char_offsets[j - 1] + len(words[j - 1])
+
+    def apply(self, s):
+        for start, end in self.offsets(s):
+            yield Span(start, end - 1, s)
 
 
 def longest_matches(matches):
@@ -108,17 +120,21 @@ def dict_matcher(sentence,
                  ignore_whitespace=True):
 
     matches = defaultdict(list)
-    for span in ngrams.apply(sentence):
+    sent_text = sentence.text
+    for start, end in ngrams.offsets(sentence):
         # ignore whitespace when matching dictionary terms
-        text = span.text
+        text = sent_text[start:end]
         if ignore_whitespace:
-            text = re.sub(r'''\s{2,}|\n{1,}''', ' ', span.text).strip()
+            text = rgx_whitespace.sub(' ', text).strip()
+        if len(text) < min_length or text.lower() in stopwords:
+            continue
 
-        # search for matches in all dictionaries
+        # search for matches in all dictionaries, sharing one Span
+        span, key = None, text.lower()
         for name in dictionaries:
-            if len(text) < min_length or text.lower() in stopwords:
-                continue
-            if text.lower() in dictionaries[name] or text in dictionaries[name]:
+            if key in dictionaries[name] or text in dictionaries[name]:
+                if span is None:
+                    span = Span(start, end - 1, sentence)
                 matches[name].append(span)
 
     if longest_match_only:
@@ -129,6 +145,435 @@ def dict_matcher(sentence,
     return matches
 
 
+###############################################################################
+#
+# Dictionary Index
+#
+###############################################################################
+
+
+class StringTable(object):
+    """
+    Read-only sequence of sorted strings stored as UTF-8 bytes in a buffer
+    (typically a memory map) with a parallel array of start offsets.
+    """
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return str(self.blob[self.offsets[i]:self.offsets[i + 1]], 'utf-8')
+
+
+class TermIndex(object):
+    """
+    Sorted string table over the lowercased terms of one or more dictionaries.
+
+    Each key stores a bitmask of the dictionaries that contain it. Terms that
+    are not already lowercase only match exactly, so they are kept in a
+    second table of case-sensitive variants. This mirrors the `dict_matcher`
+    test `text.lower() in d or text in d`.
+
+    Keys that share a prefix are contiguous, so candidate n-grams can be
+    grown token by token while narrowing a [lo, hi) range of keys with
+    binary search, stopping as soon as no dictionary term has that prefix.
+
+    Indexes can be compiled to a binary file with `save` and opened with
+    `load`, which memory maps the file instead of rebuilding the tables.
+    `sources` (saved in the file header) records what an index was compiled
+    from, see `compile_dict_index`.
+    Pickled copies of a loaded index only store the file path, so worker
+    processes share the same physical pages.
+    """
+    # sentinel used to find the end of a prefix range
+    MAX_CHAR = '\U0010ffff'
+    MAGIC = b'RWEIDX01'
+
+    def __init__(self, dictionaries):
+        self.names = list(dictionaries)
+        self.fpath = None
+        self.sources = None
+        masks = defaultdict(int)
+        variants = defaultdict(int)
+        for bit, name in enumerate(self.names):
+            for term in dictionaries[name]:
+                key = term.lower()
+                if key == term:
+                    masks[key] |= 1 << bit
+                else:
+                    masks[key] |= 0
+                    variants[term] |= 1 << bit
+
+        self.keys = sorted(masks)
+        self.masks = [masks[key] for key in self.keys]
+        self.variant_keys = sorted(variants)
+        self.variant_masks = [variants[term] for term in self.variant_keys]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __getstate__(self):
+        if self.fpath:
+            return {'fpath': self.fpath}
+        return self.__dict__
+
+    def __setstate__(self, state):
+        if list(state) == ['fpath']:
+            state = TermIndex.load(state['fpath']).__dict__
+        self.__dict__.update(state)
+
+    def fingerprint(self):
+        """Content hash of the index (of the file for loaded indexes)"""
+        h = hashlib.sha1()
+        if self.fpath:
+            with open(self.fpath, 'rb') as fp:
+                for chunk in iter(lambda: fp.read(1 << 20), b''):
+                    h.update(chunk)
+            return h.hexdigest()
+        h.update(json.dumps([self.names, self.keys, self.masks,
+                             self.variant_keys,
+                             self.variant_masks]).encode('utf-8'))
+        return h.hexdigest()
+
+    def prefix_range(self, prefix, lo=0, hi=None):
+        """Narrow [lo, hi) to the keys starting with `prefix`"""
+        hi = len(self.keys) if hi is None else hi
+        lo = bisect_left(self.keys, prefix, lo, hi)
+        hi = bisect_left(self.keys, prefix + TermIndex.MAX_CHAR, lo, hi)
+        return lo, hi
+
+    def lookup(self, key, text, lo=0):
+        """
+        Bitmask of all dictionaries matching `text`, where `key` is
+        `text.lower()` and `lo` is the start of the prefix range of `key`.
+        """
+        if lo >= len(self.keys) or self.keys[lo] != key:
+            return 0
+        mask = self.masks[lo]
+        if text != key:
+            i = bisect_left(self.variant_keys, text)
+            if i < len(self.variant_keys) and self.variant_keys[i] == text:
+                mask |= self.variant_masks[i]
+        return mask
+
+    def get_names(self, mask):
+        return [name for bit, name in enumerate(self.names) if mask >> bit & 1]
+
+    def save(self, fpath):
+        """
+        Write index to a binary file. Layout is an 8-byte magic string, the
+        length of a JSON header, the header, and then 8-byte aligned sections
+        (uint64 arrays and UTF-8 string blobs) located by header offsets.
+        """
+        if len(self.names) > 64:
+            raise ValueError(f"Index supports at most 64 dictionaries, "
+                             f"found {len(self.names)}")
+
+        sections = {}
+        for name, strings in [('keys', self.keys),
+                              ('variant_keys', self.variant_keys)]:
+            blob = [t.encode('utf-8') for t in strings]
+            offsets = array('Q', [0])
+            for t in blob:
+                offsets.append(offsets[-1] + len(t))
+            sections[f'{name}.offsets'] = offsets.tobytes()
+            sections[f'{name}.blob'] = b''.join(blob)
+        sections['masks'] = array('Q', self.masks).tobytes()
+        sections['variant_masks'] = array('Q', self.variant_masks).tobytes()
+
+        header = {'names': self.names, 'sources': self.sources,
+                  'sections': {}}
+        pos = 0
+        for name, data in sections.items():
+            header['sections'][name] = [pos, len(data)]
+            pos += len(data) + (-len(data) % 8)
+        header = json.dumps(header).encode('utf-8')
+        header += b' ' * (-len(header) % 8)
+
+        tmp_fpath = f'{fpath}.tmp'
+        with open(tmp_fpath, 'wb') as fp:
+            fp.write(TermIndex.MAGIC)
+            fp.write(array('Q', [len(header)]).tobytes())
+            fp.write(header)
+            for data in sections.values():
+                fp.write(data)
+                fp.write(b'\0' * (-len(data) % 8))
+        os.replace(tmp_fpath, fpath)
+
+    @classmethod
+    def load(cls, fpath):
+        """Memory map a compiled index file"""
+        with open(fpath, 'rb') as fp:
+            mm = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        if mm[:8] != TermIndex.MAGIC:
+            raise ValueError(f"{fpath} is not a compiled dictionary index")
+
+        buf = memoryview(mm)
+        size = buf[8:16].cast('Q')[0]
+        header = json.loads(str(buf[16:16 + size], 'utf-8'))
+        base = 16 + size
+
+        sections = {}
+        for name, (pos, length) in header['sections'].items():
+            sections[name] = buf[base + pos:base + pos + length]
+        for name in sections:
+            if not name.endswith('.blob'):
+                sections[name] = sections[name].cast('Q')
+
+        index = cls.__new__(cls)
+        index.names = header['names']
+        index.sources = header.get('sources')
+        index.fpath = os.path.abspath(fpath)
+        index.keys = StringTable(sections['keys.offsets'],
+                                 sections['keys.blob'])
+        index.masks = sections['masks']
+        index.variant_keys = StringTable(sections['variant_keys.offsets'],
+                                         sections['variant_keys.blob'])
+        index.variant_masks = sections['variant_masks']
+        return index
+
+
+def _exact_index_candidates(sentence, ngrams, index):
+    """Probe the index with every n-gram (identical to `dict_matcher`)"""
+    sent_text = sentence.text
+    for start, end in ngrams.offsets(sentence):
+        text = rgx_whitespace.sub(' ', sent_text[start:end]).strip()
+        key = text.lower()
+        lo, _ = index.prefix_range(key)
+        mask = index.lookup(key, text, lo)
+        if mask:
+            yield start, end, text, mask
+
+
+def _index_candidates(sentence, ngrams, index):
+    """
+    Scan a sentence once, growing n-grams from each start token only while
+    some dictionary term shares their (whitespace normalized) prefix.
+    Sentences where normalizing the full text is not equivalent to
+    normalizing each n-gram fall back to exact per n-gram lookup.
+    """
+    if ngrams.split_on:
+        words, char_offsets = retokenize(sentence, ngrams.split_on)
+    else:
+        words, char_offsets = sentence.words, sentence.char_offsets
+    text = sentence.text
+
+    # n-gram boundaries must be non-whitespace chars
+    starts = char_offsets
+    ends = [i + len(w) for i, w in zip(char_offsets, words)]
+    for i, w in enumerate(words):
+        if not w.strip():
+            continue
+        if ends[i] <= starts[i] or ends[i] > len(text) or \
+                text[starts[i]].isspace() or text[ends[i] - 1].isspace():
+            yield from _exact_index_candidates(sentence, ngrams, index)
+            return
+
+    # normalize whitespace once, keeping a map from source offsets
+    parts, breaks, shifts = [], [0], [0]
+    prev, removed = 0, 0
+    for m in rgx_whitespace.finditer(text):
+        parts.extend([text[prev:m.start()], ' '])
+        removed += m.end() - m.start() - 1
+        breaks.append(m.end())
+        shifts.append(removed)
+        prev = m.end()
+    parts.append(text[prev:])
+    norm = ''.join(parts)
+    lowered = norm.lower()
+
+    # lowercasing must be a char-by-char mapping
+    if len(lowered) != len(norm) or '\u03a3' in norm:
+        yield from _exact_index_candidates(sentence, ngrams, index)
+        return
+
+    def to_norm(offset):
+        return offset - shifts[bisect_right(breaks, offset) - 1]
+
+    n = len(words)
+    for i in range(n):
+        # ignore leading whitespace
+        if not words[i].strip():
+            continue
+        a = to_norm(starts[i])
+        lo, hi = 0, len(index)
+        for j in range(i + 1, min(i + ngrams.max_ngrams + 1, n + 1)):
+            # ignore trailing whitespace
+            if not words[j - 1].strip():
+                continue
+            b = to_norm(ends[j - 1])
+            key = lowered[a:b]
+            lo, hi = index.prefix_range(key, lo, hi)
+            if lo == hi:
+                break
+            mask = index.lookup(key, norm[a:b], lo)
+            if mask:
+                yield starts[i], ends[j - 1], norm[a:b], mask
+
+
+def index_matcher(sentence,
+                  ngrams,
+                  index,
+                  min_length=2,
+                  stopwords={},
+                  longest_match_only=True):
+    """
+    Same matches as `dict_matcher`, but all dictionaries are searched
+    together using a `TermIndex` so cost scales with sentence length rather
+    than n-grams x dictionaries.
+    """
+    matches = defaultdict(list)
+    for start, end, text, mask in _index_candidates(sentence, ngrams, index):
+        if len(text) < min_length or text.lower() in stopwords:
+            continue
+        # one Span shared by all matching dictionaries, as in `dict_matcher`
+        span = Span(start, end - 1, sentence)
+        for name in index.get_names(mask):
+            matches[name].append(span)
+
+    if longest_match_only:
+        for name in matches:
+            if matches[name]:
+                matches[name] = longest_matches(matches[name])
+
+    return matches
+
+
+###############################################################################
+#
+# Labeling Function Regexes
+#
+###############################################################################
+
+class RegexRegistry(object):
+    """
+    Named labeling function patterns. Modules `add` their patterns at import
+    and taggers `compile` them once when built, so labeling functions only
+    look up compiled patterns. A name may map to a list of patterns.
+    """
+    def __init__(self):
+        self.patterns = {}
+        self.compiled = {}
+
+    def add(self, name, pattern, flags=re.I):
+        if name in self.patterns and self.patterns[name] != (pattern, flags):
+            raise ValueError(f"Regex '{name}' is already registered")
+        self.patterns[name] = (pattern, flags)
+        return name
+
+    def _compile(self, name):
+        pattern, flags = self.patterns[name]
+        if isinstance(pattern, (list, tuple)):
+            return [re.compile(p, flags) for p in pattern]
+        return re.compile(pattern, flags)
+
+    def compile(self, prefix=''):
+        """Compile all patterns whose name starts with `prefix`"""
+        for name in self.patterns:
+            if name.startswith(prefix) and name not in self.compiled:
+                self.compiled[name] = self._compile(name)
+        return self
+
+    def __getitem__(self, name):
+        if name not in self.compiled:
+            self.compiled[name] = self._compile(name)
+        return self.compiled[name]
+
+
+lf_regexes = RegexRegistry()
+
+# module level `re` functions that compile (or look up) a pattern per call
+_RE_FUNCTIONS = ('compile', 'search', 'match', 'fullmatch', 'finditer',
+                 'findall', 'sub', 'subn', 'split')
+
+
+def check_lf_regexes(lfs, spans):
+    """
+    Apply each labeling function to `spans` and raise a ValueError naming
+    all LFs that pass pattern strings to the `re` module instead of using
+    precompiled patterns.
+
+    The check temporarily replaces functions of the global `re` module, so
+    it must never run while other threads are tagging (it is meant for
+    tests, see `tests/test_taggers.py`).
+    """
+    calls = {}
+    saved = {name: getattr(re, name) for name in _RE_FUNCTIONS}
+
+    def counted(name):
+        def f(*args, **kwargs):
+            calls[current] = calls.get(current, 0) + 1
+            return saved[name](*args, **kwargs)
+        return f
+
+    try:
+        for name in _RE_FUNCTIONS:
+            setattr(re, name, counted(name))
+        for lf in lfs:
+            current = getattr(lf, '__name__', None) or \
+                      getattr(lf, 'func', lf).__name__
+            for span in spans:
+                lf(span)
+    finally:
+        for name, f in saved.items():
+            setattr(re, name, f)
+
+    if calls:
+        raise ValueError("Labeling functions build regexes per call: " +
+                         ", ".join(f"{name} ({n})" for name, n in calls.items()))
+
+
+###############################################################################
+#
+# Label Matrix Reductions
+#
+###############################################################################
+
+def mv_reduce(L, ties='first'):
+    """
+    Majority vote over the non-zero labels of each row of a label matrix.
+
+    :param L: n x m label matrix (scipy.sparse or array)
+    :param ties: 'first' picks the tied label given by the leftmost LF (as
+        `statistics.mode`), 'min' the smallest tied label (as
+        `scipy.stats.mode`)
+    :return: array of n labels, 0 for rows without labels
+    """
+    L = sparse.csr_matrix(L)
+    n, m = L.shape
+    y = np.zeros(n, dtype=int)
+    rows = np.repeat(np.arange(n), np.diff(L.indptr))
+    keep = L.data != 0
+    if not keep.any():
+        return y
+    rows, cols = rows[keep], L.indices[keep]
+    classes, labels = np.unique(L.data[keep], return_inverse=True)
+
+    counts = np.zeros((n, len(classes)), dtype=int)
+    np.add.at(counts, (rows, labels), 1)
+    if ties == 'first':
+        first = np.full((n, len(classes)), m)
+        np.minimum.at(first, (rows, labels), cols)
+        score = counts * (m + 1) - first
+    else:
+        score = counts * len(classes) - np.arange(len(classes))
+
+    labeled = counts.any(axis=1)
+    y[labeled] = classes[score[labeled].argmax(axis=1)]
+    return y
+
+
+def or_reduce(L, label=1):
+    """
+    Logical or of each row of a label matrix, i.e., rows where any LF
+    gives `label`.
+    """
+    L = sparse.csr_matrix(L)
+    return np.asarray((L == label).sum(axis=1)).ravel() > 0
+
 ###############################################################################
 #
 # Taggers
@@ -153,6 +598,186 @@ class Tagger(object):
     def tag(self, documents, ngrams=10, stopwords=[]):
         raise NotImplementedError()
 
+    def reads(self):
+        """
+        Annotation layers (e.g., 'HEADER'), span props ('props.<name>') and
+        document props ('doc.<name>') read by `tag`. '*' reads all layers
+        written by earlier pipeline stages. None if undeclared, in which
+        case the tagger is scheduled as a barrier.
+        """
+        return None
+
+    def writes(self):
+        """
+        Annotation layers and props written by `tag` (see `reads`)
+        """
+        return None
+
+
+class SpanTagger(Tagger):
+    """
+    Tagger that labels each span of its `targets` layers independently,
+    so several span taggers can be fused into a single pass over the spans
+    (see `FusedSpanTagger`). `tag_span` may read any annotation layer but
+    should only read and write props of the span it is given.
+    """
+    targets = []
+
+    def tag_span(self, span, document, i, **kwargs):
+        raise NotImplementedError()
+
+    def tag(self, document, **kwargs):
+        for i in document.annotations:
+            for layer in self.targets:
+                if layer not in document.annotations[i]:
+                    continue
+                for span in document.annotations[i][layer]:
+                    self.tag_span(span, document, i, **kwargs)
+
+
+class LabelingFunctionTagger(SpanTagger):
+    """
+    Span tagger that labels spans with a list of labeling functions `lfs`
+    and reduces the labels of each span into `props[prop_name]`.
+
+    `tag` applies all LFs to the target spans of a document at once,
+    building a sparse int8 label matrix in the layout `LabelingServer`
+    uses (one row per span, one column per LF) and reducing it with
+    vectorized `mv_reduce`/`or_reduce`. With label_reduction='matrix', the
+    matrix is stored in `document.props['label_matrix.<prop_name>']`, its
+    rows following `target_spans(document)`.
+    """
+    lfs = []
+    prop_name = None
+    class_map = None
+    label_reduction = 'mv'
+    # tie breaking of majority votes, see `mv_reduce`
+    mv_ties = 'first'
+
+    def _apply_lfs(self, span):
+        """ Apply labeling functions. """
+        return np.array([lf(span) for lf in self.lfs])
+
+    def target_spans(self, document):
+        """Spans labeled by `tag`, in label matrix row order"""
+        return [span for i in document.annotations
+                for layer in self.targets if layer in document.annotations[i]
+                for span in document.annotations[i][layer]]
+
+    def label_matrix(self, spans):
+        """
+        Apply all LFs to `spans`
+
+        :param spans:
+        :return: len(spans) x len(lfs) scipy.sparse int8 CSR matrix
+        """
+        rows, cols, data = [], [], []
+        for k, span in enumerate(spans):
+            for j, lf in enumerate(self.lfs):
+                y = lf(span)
+                if y:
+                    rows.append(k)
+                    cols.append(j)
+                    data.append(y)
+        return sparse.csr_matrix(
+            (np.array(data, dtype=np.int8), (rows, cols)),
+            shape=(len(spans), len(self.lfs)), dtype=np.int8
+        )
+
+    def label_spans(self, spans, L):
+        """Reduce label matrix `L` and set the props of its row `spans`"""
+        if self.label_reduction == 'mv':
+            y = mv_reduce(L, ties=self.mv_ties)
+            for k in np.flatnonzero(y):
+                span = spans[k]
+                span.props[self.prop_name] = self.class_map[y[k]] \
+                    if self.class_map else int(y[k])
+
+        elif self.label_reduction == 'or':
+            for k in np.flatnonzero(or_reduce(L, 1)):
+                spans[k].props[self.prop_name] = 1
+
+    def writes(self):
+        if self.label_reduction == 'matrix':
+            return {f'props.{self.prop_name}',
+                    f'doc.label_matrix.{self.prop_name}'}
+        return {f'props.{self.prop_name}'}
+
+    def tag_span(self, span, document, i, **kwargs):
+        L = self._apply_lfs(span)
+        if L.any() and self.label_reduction == 'matrix':
+            span.props[self.prop_name] = L
+        elif L.any():
+            self.label_spans([span], L.reshape(1, -1))
+
+    def tag(self, document, **kwargs):
+        spans = self.target_spans(document)
+        L = self.label_matrix(spans)
+        if self.label_reduction == 'matrix':
+            document.props[f'label_matrix.{self.prop_name}'] = L
+        else:
+            self.label_spans(spans, L)
+
+
+class FusedSpanTagger(Tagger):
+    """
+    Apply a sequence of span taggers in as few passes over the document
+    spans as possible. Consecutive span taggers share one pass, where every
+    tagger sees the same spans, in the same per-span order, as when applied
+    one after the other. A `LabelingFunctionTagger` labels all spans in one
+    batch, so it runs on its own at its position in the sequence, between
+    the passes of the taggers before and after it. Taggers grouped after it
+    may read what it writes (see `PipelineGraph.schedule`).
+    """
+    def __init__(self, taggers):
+        self.taggers = taggers
+        # list of batched taggers and {layer: taggers} single passes
+        self.passes = []
+        for tagger in taggers:
+            if isinstance(tagger, LabelingFunctionTagger):
+                self.passes.append(tagger)
+                continue
+            if not self.passes or not isinstance(self.passes[-1], dict):
+                self.passes.append({})
+            for layer in tagger.targets:
+                self.passes[-1].setdefault(layer, []).append(tagger)
+
+    def _tag_spans(self, document, layers, elapsed, timers, **kwargs):
+        for i in document.annotations:
+            for layer, taggers in layers.items():
+                if layer not in document.annotations[i]:
+                    continue
+                for span in document.annotations[i][layer]:
+                    for tagger in taggers:
+                        if elapsed is None:
+                            tagger.tag_span(span, document, i, **kwargs)
+                            continue
+                        start = time.perf_counter()
+                        tagger.tag_span(span, document, i, **kwargs)
+                        elapsed[timers[id(tagger)]] += \
+                            time.perf_counter() - start
+
+    def tag(self, document, elapsed=None, **kwargs):
+        """
+        If `elapsed` is a list, the time spent in each tagger is added to
+        the corresponding entry.
+        """
+        timers = {id(t): k for k, t in enumerate(self.taggers)}
+        for step in self.passes:
+            if isinstance(step, dict):
+                self._tag_spans(document, step, elapsed, timers, **kwargs)
+                continue
+            start = time.perf_counter()
+            step.tag(document, **kwargs)
+            if elapsed is not None:
+                elapsed[timers[id(step)]] += time.perf_counter() - start
+
+    def reads(self):
+        return set().union(*[t.reads() for t in self.taggers])
+
+    def writes(self):
+        return set().union(*[t.writes() for t in self.taggers])
+
 ###############################################################################
 #
 # Reset All Annotations
@@ -173,7 +798,10 @@ class ResetTags(Tagger):
 ###############################################################################
 
 class DictionaryTagger(Tagger):
-
+    """
+    Tag all n-grams found in one or more dictionaries. `dictionaries` is a
+    dict of term sets, a `TermIndex`, or the path of a compiled index.
+    """
     def __init__(self,
                  dictionaries,
                  min_length=2,
@@ -181,21 +809,31 @@ class DictionaryTagger(Tagger):
                  stopwords={},
                  split_on=None):
 
-        self.dictionaries = dictionaries
+        if isinstance(dictionaries, str):
+            dictionaries = TermIndex.load(dictionaries)
+        if not isinstance(dictionaries, TermIndex):
+            dictionaries = TermIndex(dictionaries)
+        self.index = dictionaries
         self.longest_match_only = longest_match_only
         self.min_length = min_length
         self.stopwords = stopwords
         self.split_on = split_on
 
+    def reads(self):
+        return set()
+
+    def writes(self):
+        return set(self.index.names)
+
     def tag(self, document, ngrams=5):
 
         candgen = Ngrams(n_max=ngrams, split_on=self.split_on)
         for sent in document.sentences:
-            m = dict_matcher(sent,
-                             candgen,
-                             self.dictionaries,
-                             min_length=self.min_length,
-                             stopwords=self.stopwords)
+            m = index_matcher(sent,
+                              candgen,
+                              self.index,
+                              min_length=self.min_length,
+                              stopwords=self.stopwords)
 
             if m:
                 if sent.position not in document.annotations:
@@ -241,16 +879,11 @@ class PrecomputedEntityTagger(Tagger):
                 return sent
         return None
 
-    def _is_overlapping(self, a, b):
-        if a.abs_char_start >= b.abs_char_start and a.abs_char_start <= b.abs_char_end:
-            return True
-        if a.abs_char_end >= b.abs_char_start and a.abs_char_end <= b.abs_char_end:
-            return True
-        if b.abs_char_start >= a.abs_char_start and b.abs_char_start <= a.abs_char_end:
-            return True
-        if b.abs_char_end >= a.abs_char_start and b.abs_char_end <= a.abs_char_end:
-            return True
-        return False
+    def reads(self):
+        return {'HEADER'}
+
+    def writes(self):
+        return {self.type_name}
 
     def tag(self, document, ngrams=None):
         """
@@ -260,6 +893,7 @@ class PrecomputedEntityTagger(Tagger):
             return
 
         n_errs = 0
+        headers = document.span_index(['HEADER'])
         entities = {sent.i: {} for sent in document.sentences}
         for anno in self.annotations[document.name]:
             # get parent sentence for this span
@@ -276,14 +910,7 @@ class PrecomputedEntityTagger(Tagger):
 
             # HACK -- exclude all entities that are overlapping/nested
             # within header spans (TODO move to seprate pipeline module)
-            ignore_span = False
-            if 'HEADER' in document.annotations[sent.i]:
-                for h in document.annotations[sent.i]['HEADER']:
-                    if h is not None and self._is_overlapping(h, span):
-                        ignore_span = True
-                        break
-
-            if ignore_span:
+            if headers.overlapping(span.abs_char_start, span.abs_char_end):
                 continue
 
             if self.type_name not in entities[sent.i]:
@@ -308,6 +935,12 @@ class RelationTagger(object):
         self.type_name = type_name
         self.arg_types = arg_types
 
+    def reads(self):
+        return set(self.arg_types)
+
+    def writes(self):
+        return {self.type_name}
+
     def tag(self, document, **kwargs):
         for i in document.annotations:
             # skip sentence when all argument types are not present
@@ -52,6 +52,13 @@ class TimeDeltaTagger(Tagger):
         # TODO: Implement labeling functions for this task.
         pass
 
+    def reads(self):
+        return set(self.targets) | {'TIMEX3', 'HEADER', 'props.normalized',
+                                    'doc.doctime'}
+
+    def writes(self):
+        return {'props.tdelta', 'props.timex', 'props.timex_span'}
+
     def tag(self, document, **kwargs):
         """
 
@@ -3,7 +3,7 @@ import datetime
 from datetime import timedelta
 from rwe.contexts import Span
 from .taggers import Tagger, longest_matches
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 
 ###############################################################################
 #
@@ -98,6 +98,46 @@ regexes = [
     rgx_operative
 ]
 
+# Case-insensitive literals that every match of a pattern must contain. A
+# sentence is only scanned with the patterns whose triggers all occur in it.
+triggers = {
+    'digit':    re.compile(r'''[0-9]'''),
+    'month':    re.compile(r'''jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec''', re.I),
+    'day':      re.compile(r'''mon|tue|wed|thu|fri|sat|sun''', re.I),
+    'ago':      re.compile(r'''ago''', re.I),
+    'day_part': re.compile(r'''morning|afternoon|evening|yesterday|today|tomorrow|tonight|tonite''', re.I),
+    'relative': re.compile(r'''next|last|this''', re.I),
+    'now':      re.compile(r'''current|recent|this|now''', re.I),
+    'op':       re.compile(r'''op''', re.I)
+}
+
+regex_triggers = [
+    ('digit',),
+    ('month',),
+    ('day',),
+
+    ('digit',),
+    ('digit',),
+    ('digit',),
+    ('digit',),
+    ('digit',),
+    ('digit',),
+
+    ('digit', 'month'),
+    ('digit', 'month'),
+    ('digit', 'month'),
+    ('digit', 'month'),
+    ('digit', 'month'),
+    ('digit', 'month'),
+
+    ('ago',),
+    ('day_part',),
+    ('relative',),
+
+    ('now',),
+    ('op',)
+]
+
 ###############################################################################
 #
 #  TIMEX3 Tagger
@@ -139,10 +179,18 @@ class Timex3Tagger(Tagger):
 
         """
         matches = {}
+        index = doc.span_index()
         for i, sent in enumerate(doc.sentences):
             matches[i] = {}
-            for j,rgx in enumerate(matchers):
-                for match in re.finditer(rgx, sent.text, re.I):
+            found = {}
+            for j, (rgx, required) in enumerate(matchers):
+                # skip patterns that can't match this sentence
+                for name in required:
+                    if name not in found:
+                        found[name] = triggers[name].search(sent.text)
+                if not all(found[name] for name in required):
+                    continue
+                for match in rgx.finditer(sent.text):
                     span = match.span(group)
                     start, end = span
                     
@@ -163,28 +211,20 @@ class Timex3Tagger(Tagger):
                         is_longest = False
                 tspan = matches[i][key]
                 if is_longest:
-                    ignore_span = False
                     # HACK make certain this doesn't conflict with other
                     # entity spans
-                    for entity_name in doc.annotations[sent.i]:
-                        for span in doc.annotations[sent.i][entity_name]:
-                            if span and self._is_overlapping(span, tspan):
-                                ignore_span = True
-                                break
-                    if not ignore_span:
+                    if not index.overlapping(tspan.abs_char_start,
+                                             tspan.abs_char_end):
                         yield (i, tspan)
 
-    def _is_overlapping(self, a, b):
-        # HACK
-        if a.abs_char_start >= b.abs_char_start and a.abs_char_start <= b.abs_char_end:
-            return True
-        if a.abs_char_end >= b.abs_char_start and a.abs_char_end <= b.abs_char_end:
-            return True
-        if b.abs_char_start >= a.abs_char_start and b.abs_char_start <= a.abs_char_end:
-            return True
-        if b.abs_char_end >= a.abs_char_start and b.abs_char_end <= a.abs_char_end:
-            return True
-        return False
+    def reads(self):
+        # matches overlapping any existing entity span are dropped
+        return {'*'}
+
+    def writes(self):
+        if self.normalizer:
+            return {self.tag_name, 'props.normalized'}
+        return {self.tag_name}
 
     def tag(self, document, ngrams=6):
         """ """
@@ -205,7 +245,10 @@ class Timex3Tagger(Tagger):
 
     def _init(self):
         """Common datetime regular expressions."""
-        self.matchers = {self.tag_name: regexes}
+        self.matchers = {
+            self.tag_name: [(re.compile(rgx, re.I), required)
+                            for rgx, required in zip(regexes, regex_triggers)]
+        }
 
 
 ###############################################################################
@@ -215,6 +258,55 @@ class Timex3Tagger(Tagger):
 ###############################################################################
 
 
+class TimexCache(object):
+    """
+    Bounded LRU cache of TIMEX3 string normalizations, keyed on
+    (string, min_year, max_year). Only doctime independent normalizations
+    belong here; cached datetimes are shared between spans.
+    """
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key, default=None):
+        if key in self._items:
+            self.hits += 1
+            self._items.move_to_end(key)
+            return self._items[key]
+        self.misses += 1
+        return default
+
+    def put(self, key, value):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        if len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def clear(self):
+        self.hits, self.misses = 0, 0
+        self._items.clear()
+
+    def __getstate__(self):
+        # copies start empty
+        return {'maxsize': self.maxsize}
+
+    def __setstate__(self, state):
+        self.__init__(state['maxsize'])
+
+    def __repr__(self):
+        return f"TimexCache(size={len(self)}, maxsize={self.maxsize}, " \
+               f"hits={self.hits}, misses={self.misses})"
+
+
+# shared by all normalizers in a process
+timex_cache = TimexCache()
+
+
 class TimexNormalizer(object):
     """
     TODO: Refactor!!! This class is a messy hack.
@@ -240,10 +332,11 @@ class TimexNormalizer(object):
     MONTHS = ""
     DATES = ""
 
-    def __init__(self, min_year=1900, max_year=2025):
+    def __init__(self, min_year=1900, max_year=2025, cache=timex_cache):
 
         self.min_year = min_year
         self.max_year = max_year
+        self.cache = cache
 
         self.norm_map = {}
 
@@ -273,6 +366,8 @@ class TimexNormalizer(object):
             (year_month_date, self.date_norm_6)  # 2010-11-12
         ]
         self.norm_map = dict(norm_mapping)
+        self.norm_rgxs = [(re.compile(rgx, re.I), f)
+                          for rgx, f in self.norm_map.items()]
 
     def date_norm_8(self, m):
 
@@ -418,11 +513,12 @@ class TimexNormalizer(object):
         year = int(year)
         return datetime.datetime(year, month, day)
 
+    # Filter out times, e.g., 12:30 PM
+    time_rgx = re.compile(r'''^[0-2][0-9][:]([0-5][0-9])(\s*([ap]m|[apAP][.]*[mM][.]*))*$''', re.I)
+
     def _filter(self, span):
-        # Filter out times, e.g., 12:30 PM
-        time_rgx = r'''^[0-2][0-9][:]([0-5][0-9])(\s*([ap]m|[apAP][.]*[mM][.]*))*$'''
         t = span.get_span().lower().strip()
-        return True if re.search(time_rgx, t, re.I) else False
+        return True if TimexNormalizer.time_rgx.search(t) else False
 
     def normalize(self, markup):
         # Normalize unambiguous dates
@@ -440,13 +536,22 @@ class TimexNormalizer(object):
         return normed
 
     def _normalize_timex_str(self, seq):
+        if self.cache is None:
+            return self._normalize(seq)
+        key = (seq, self.min_year, self.max_year)
+        ts = self.cache.get(key, key)
+        if ts is key:
+            ts = self._normalize(seq)
+            self.cache.put(key, ts)
+        return ts
+
+    def _normalize(self, seq):
         # use pattern that matches the longest string
         matches = []
-        for rgx in self.norm_map:
-            m = re.search(rgx, seq, re.I)
+        for rgx, f in self.norm_rgxs:
+            m = rgx.search(seq)
             if m:
-                matches.append((m, self.norm_map[rgx]))
-                #return self.norm_map[rgx](m)
+                matches.append((m, f))
 
         matches = sorted(matches, key=lambda x:len(x[0].group()), reverse=1)
         if matches:
@@ -470,9 +575,10 @@ class Timex3NormalizerTagger(Tagger):
         self.normalizer = TimexNormalizer()
 
         rgx_today = r'''(today)'''
+        # doctime relative, so these are never cached
         self.regexes = [
-            (rgx_month_d, self.norm_month_d),
-            (rgx_today, self.norm_today),
+            (re.compile(rgx_month_d, re.I), self.norm_month_d),
+            (re.compile(rgx_today, re.I), self.norm_today),
             # (rgx_timex_ago, self.norm_x_ago)
             # (rgx_day_parts, self.norm_recent),
             # (rgx_recent_now, self.norm_recent),
@@ -580,6 +686,12 @@ class Timex3NormalizerTagger(Tagger):
             print("norm_month_d::date normalization error", e, span)
         return None
 
+    def reads(self):
+        return {'TIMEX3', 'doc.doctime'}
+
+    def writes(self):
+        return {'props.normalized'}
+
     def tag(self, document, **kwargs):
 
         entities = {i: document.annotations[i]['TIMEX3'] for i in
@@ -594,7 +706,7 @@ class Timex3NormalizerTagger(Tagger):
             unf = [span for span in entities[i] if span.normalized is None]
             for span in unf:
                 for rgx, normf in self.regexes:
-                    if re.search(rgx, span.text, re.I):
+                    if rgx.search(span.text):
                         span.normalized = normf(span)
                         break
 
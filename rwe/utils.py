@@ -1,14 +1,15 @@
 import re
 import bz2
 import os
+import hashlib
 import glob
 import random
 import itertools
-import numpy as np
 import pandas as pd
 from rwe.contexts import Document, Span, Relation
 from typing import List, Set, Dict, Tuple, Optional, Union, Iterable
-from .dataloaders import dataloader
+from .dataloaders import dataloader, sample_documents, DocumentIndex
+from .labelers.taggers.taggers import TermIndex
 
 ###############################################################################
 #
@@ -45,6 +46,98 @@ def load_dict(fpath: str,
         d.add(t)
     return d
 
+def dict_sources(dictionaries: Dict[str, Union[str, List[str]]],
+                 stopwords: Set[str] = None,
+                 ignore_case: bool = False) -> Dict:
+    """Dictionary names, the sha1 of their files and the load options, as
+    stored in the header of a compiled index
+
+    Parameters
+    ----------
+    dictionaries
+        map of dictionary name to one or more dictionary file paths
+    stopwords
+    ignore_case
+
+    Returns
+    -------
+
+    """
+    files = {}
+    for name, fpaths in dictionaries.items():
+        fpaths = [fpaths] if type(fpaths) is str else fpaths
+        files[name] = []
+        for fpath in fpaths:
+            h = hashlib.sha1()
+            with open(fpath, 'rb') as fp:
+                for chunk in iter(lambda: fp.read(1 << 20), b''):
+                    h.update(chunk)
+            files[name].append(h.hexdigest())
+    stopwords = '\n'.join(sorted(stopwords)) if stopwords else ''
+    return {'files': files, 'ignore_case': ignore_case,
+            'stopwords': hashlib.sha1(stopwords.encode('utf-8')).hexdigest()}
+
+def load_dict_index(dictionaries: Dict[str, Union[str, List[str]]],
+                    fpath: str,
+                    stopwords: Set[str] = None,
+                    ignore_case: bool = False,
+                    recompile: bool = True) -> TermIndex:
+    """Open the compiled index `fpath` of `dictionaries`. The index is
+    (re)compiled if it is missing or was compiled from other dictionary
+    names, files or options (ValueError instead if `recompile` is False).
+
+    Parameters
+    ----------
+    dictionaries
+        map of dictionary name to one or more dictionary file paths
+    fpath
+    stopwords
+    ignore_case
+    recompile
+
+    Returns
+    -------
+
+    """
+    if os.path.exists(fpath):
+        index = TermIndex.load(fpath)
+        sources = dict_sources(dictionaries, stopwords, ignore_case)
+        if index.sources == sources and index.names == list(dictionaries):
+            return index
+        if not recompile:
+            raise ValueError(f"Dictionary index {fpath} was compiled from "
+                             f"other dictionaries: {index.names}")
+    return compile_dict_index(dictionaries, fpath, stopwords, ignore_case)
+
+def compile_dict_index(dictionaries: Dict[str, Union[str, List[str]]],
+                       outfpath: str,
+                       stopwords: Set[str] = None,
+                       ignore_case: bool = False) -> TermIndex:
+    """Compile dictionary files into a binary, memory-mapped term index
+
+    Parameters
+    ----------
+    dictionaries
+        map of dictionary name to one or more dictionary file paths
+    outfpath
+    stopwords
+    ignore_case
+
+    Returns
+    -------
+
+    """
+    terms = {}
+    for name, fpaths in dictionaries.items():
+        fpaths = [fpaths] if type(fpaths) is str else fpaths
+        terms[name] = set()
+        for fpath in fpaths:
+            terms[name].update(load_dict(fpath, stopwords, ignore_case))
+    index = TermIndex(terms)
+    index.sources = dict_sources(dictionaries, stopwords, ignore_case)
+    index.save(outfpath)
+    return TermIndex.load(outfpath)
+
 def build_candidate_set(documents: List[Document],
                         target: str) -> List[Union[Span, Relation]]:
     """
@@ -86,12 +179,18 @@ def get_parent_sentence(doc, char_start, char_end):
 
 
 def load_gold(fpath, documents, type_def):
-    """ Load Snorkel v0.7 gold label set"""
-    doc_idx = {doc.name: doc for doc in documents}
+    """
+    Load Snorkel v0.7 gold label set. `documents` is a list of documents or
+    a `DocumentIndex`, in which case only the labeled documents are loaded.
+    """
     type_name, arg_names = type_def
+    df = pd.read_csv(fpath, sep="\t")
+    if isinstance(documents, DocumentIndex):
+        names = {parse_stable_label(s)[0] for s in df['context_stable_ids']}
+        documents = documents.load_documents(sorted(names))
+    doc_idx = {doc.name: doc for doc in documents}
 
     candidates = {}
-    df = pd.read_csv(fpath, sep="\t")
     for i, row in df.iterrows():
         cand = parse_stable_label(row['context_stable_ids'])
         label = int(row['label'])
@@ -121,17 +220,15 @@ def reservoir_sampling(iterable: Iterable,
                        n: int,
                        seed: int = 1234):
     """
-    Standard reservoir sampling of a Python iterable.
+    Standard reservoir sampling (Algorithm R) of a Python iterable.
     """
-    np.random.seed(seed)
-    i = 0
+    rng = random.Random(seed)
     pool = []
-    for item in iterable:
+    for i, item in enumerate(iterable):
         if len(pool) < n:
             pool.append(item)
         else:
-            i += 1
-            k = random.randint(0, i)
+            k = rng.randint(0, i)
             if k < n:
                 pool[k] = item
     return pool
@@ -140,7 +237,8 @@ def reservoir_sampling(iterable: Iterable,
 def load_unlabeled_sample(fpath: str,
                           num_samples: int ,
                           seed: int = 1234,
-                          max_docs: int = 100000):
+                          max_docs: int = 100000,
+                          num_workers: int = 1):
     """
     Reservoir sample JSON documents. If `seed` and `max_docs` are fixed,
     then this returns a deterministic subsample of the docs at `fpath`.
@@ -148,8 +246,10 @@ def load_unlabeled_sample(fpath: str,
     filelist = glob.glob(f"{fpath}/*") if os.path.isdir(fpath) else [fpath]
     assert len(filelist) > 0
 
-    sample = reservoir_sampling(dataloader(filelist), max_docs, seed)
-    return sample[0:num_samples]
+    # samples are prefixes of larger samples with the same seed, so this is
+    # the first `num_samples` of a `max_docs` sample
+    return sample_documents(filelist, min(num_samples, max_docs), seed,
+                            num_workers=num_workers)
 
 
 ###############################################################################
@@ -0,0 +1,242 @@
+import os
+import gzip
+from collections import defaultdict
+from .dataloaders import _name_hash
+from typing import Dict, List, Iterable, Sequence
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+###############################################################################
+#
+# Row Writers
+#
+###############################################################################
+
+FORMATS = ('tsv', 'tsv.gz', 'parquet')
+
+
+def infer_format(fpath: str) -> str:
+    """Output format implied by a file extension (default TSV)"""
+    if fpath.endswith('.parquet'):
+        return 'parquet'
+    if fpath.endswith('.gz'):
+        return 'tsv.gz'
+    return 'tsv'
+
+
+class TSVFile(object):
+    """TSV file written one block at a time, gzip compressed if a
+    `compresslevel` is given"""
+    def __init__(self, fpath: str, header: List[str],
+                 compresslevel: int = None) -> None:
+        if compresslevel is not None:
+            self.fp = gzip.open(fpath, 'wt', compresslevel=compresslevel,
+                                encoding='utf-8')
+        else:
+            self.fp = open(fpath, 'w')
+        self.fp.write('\t'.join(header) + '\n')
+
+    def write(self, rows: List[Sequence]) -> None:
+        self.fp.write(''.join('\t'.join(map(str, row)) + '\n'
+                              for row in rows))
+
+    def close(self) -> None:
+        self.fp.close()
+
+
+class ParquetFile(object):
+    """
+    Parquet file, written in row groups of `row_group_size` rows. Columns
+    are strings unless `dtypes` maps them to int or float; values in
+    `null_values` are stored as nulls.
+    """
+    def __init__(self, fpath: str, header: List[str], dtypes: Dict = None,
+                 null_values: Iterable = (None,),
+                 row_group_size: int = 65536) -> None:
+        if pyarrow is None:
+            raise ImportError("Parquet output requires pyarrow")
+        dtypes = dtypes or {}
+        types = {int: pyarrow.int64(), float: pyarrow.float64()}
+        self.schema = pyarrow.schema([
+            (name, types.get(dtypes.get(name), pyarrow.string()))
+            for name in header
+        ])
+        self.casts = [dtypes.get(name, str) for name in header]
+        self.null_values = set(null_values)
+        self.row_group_size = row_group_size
+        self.buffer = []
+        self.writer = pyarrow.parquet.ParquetWriter(fpath, self.schema)
+
+    def write(self, rows: List[Sequence]) -> None:
+        self.buffer.extend(rows)
+        if len(self.buffer) >= self.row_group_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.buffer:
+            return
+        columns = []
+        for k, cast in enumerate(self.casts):
+            columns.append([None if row[k] in self.null_values else cast(row[k])
+                            for row in self.buffer])
+        table = pyarrow.Table.from_arrays(
+            [pyarrow.array(col, type=self.schema.field(k).type)
+             for k, col in enumerate(columns)],
+            schema=self.schema
+        )
+        self.writer.write_table(table)
+        self.buffer = []
+
+    def close(self) -> None:
+        self.flush()
+        self.writer.close()
+
+
+class PartitionedWriter(object):
+    """
+    Streams rows to TSV, gzip compressed TSV or Parquet files as they are
+    generated, so output never has to fit in memory.
+
+    With `partition_by=None` all rows go to the file `outpath`. Otherwise
+    `outpath` is a directory of Hive-style partitions, e.g.,
+    `TYPE=disorder/part-00000.parquet`, and rows are routed by the value of
+    the `partition_by` column, or for `partition_by='shard'` by a hash of
+    the `shard_by` column (default the first) into `num_shards` shards.
+    As in Hive, a `partition_by` column is only stored in the directory
+    names, not in the files, so a partitioned directory can be read as one
+    dataset (e.g., `pyarrow.parquet.read_table(outpath)`).
+    Partitions are closed and a new part started every `rows_per_file` rows,
+    so completed parts can be read while a run is still going (Parquet
+    files are only readable once closed). Unpartitioned output is a single
+    file, so `rows_per_file` requires a `partition_by`.
+    """
+    def __init__(self,
+                 outpath: str,
+                 header: List[str],
+                 format: str = None,
+                 partition_by: str = None,
+                 shard_by: str = None,
+                 num_shards: int = 16,
+                 rows_per_file: int = None,
+                 dtypes: Dict = None,
+                 null_values: Iterable = (None,),
+                 row_group_size: int = 65536,
+                 compresslevel: int = 6) -> None:
+        """
+        format: one of FORMATS (default inferred from `outpath`)
+        partition_by: None, a column name or 'shard'
+        dtypes: column name -> int/float, for Parquet columns
+        null_values: values stored as nulls in Parquet columns
+        """
+        self.outpath = outpath
+        self.header = list(header)
+        self.format = format or infer_format(outpath)
+        if self.format not in FORMATS:
+            raise ValueError(f"Unknown format {self.format}, "
+                             f"expected one of {FORMATS}")
+        if self.format == 'parquet' and pyarrow is None:
+            raise ImportError("Parquet output requires pyarrow")
+        if rows_per_file and partition_by is None:
+            raise ValueError("rows_per_file requires partitioned output, "
+                             "set partition_by")
+        self.partition_by = partition_by
+        self.num_shards = num_shards
+        self.rows_per_file = rows_per_file
+        self.dtypes = dtypes
+        self.null_values = null_values
+        self.row_group_size = row_group_size
+        self.compresslevel = compresslevel
+
+        # columns stored in files
+        self.file_header = self.header
+        if partition_by == 'shard':
+            self._key = self.header.index(shard_by or self.header[0])
+        elif partition_by is not None:
+            self._key = self.header.index(partition_by)
+            self.file_header = [name for name in self.header
+                                if name != partition_by]
+        self.files = []
+        self.n_rows = 0
+        self._open = {}
+        self._parts = defaultdict(int)
+        self._counts = defaultdict(int)
+
+    def __enter__(self) -> 'PartitionedWriter':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def partition(self, row: Sequence) -> str:
+        """Partition directory of `row` (None if unpartitioned)"""
+        if self.partition_by is None:
+            return None
+        value = row[self._key]
+        if self.partition_by == 'shard':
+            return f'shard={_name_hash(str(value)) % self.num_shards:05d}'
+        value = str(value).replace(os.sep, '_')
+        return f'{self.partition_by}={value}'
+
+    def _new_file(self, key: str):
+        if key is None:
+            fpath = self.outpath
+        else:
+            dirname = os.path.join(self.outpath, key)
+            os.makedirs(dirname, exist_ok=True)
+            fpath = os.path.join(dirname,
+                                 f'part-{self._parts[key]:05d}.{self.format}')
+        self._parts[key] += 1
+        self.files.append(fpath)
+        if self.format == 'parquet':
+            return ParquetFile(fpath, self.file_header, self.dtypes,
+                               self.null_values, self.row_group_size)
+        return TSVFile(fpath, self.file_header, self.compresslevel
+                       if self.format == 'tsv.gz' else None)
+
+    def _write(self, key: str, rows: List[Sequence]) -> None:
+        rotate = self.rows_per_file
+        while rows:
+            if key not in self._open:
+                self._open[key] = self._new_file(key)
+            n = len(rows)
+            if rotate:
+                n = min(n, self.rows_per_file - self._counts[key])
+            self._open[key].write(rows[:n])
+            self._counts[key] += n
+            rows = rows[n:]
+            if rotate and self._counts[key] >= self.rows_per_file:
+                self._open.pop(key).close()
+                self._counts[key] = 0
+
+    def write(self, rows: Iterable[Sequence]) -> None:
+        """Append rows, e.g., those of one document"""
+        rows = list(rows)
+        self.n_rows += len(rows)
+        if self.partition_by is None:
+            self._write(None, rows)
+            return
+        groups = defaultdict(list)
+        drop = self.partition_by != 'shard'
+        k = self._key
+        for row in rows:
+            groups[self.partition(row)].append(
+                tuple(row[:k]) + tuple(row[k + 1:]) if drop else row)
+        for key, group in groups.items():
+            self._write(key, group)
+
+    def close(self) -> None:
+        for f in self._open.values():
+            f.close()
+        self._open = {}
+        if self.partition_by is None and not self.files:
+            # header only
+            self._new_file(None).close()
+
+    def __repr__(self) -> str:
+        return f"PartitionedWriter({self.outpath}, format={self.format}, " \
+               f"partition_by={self.partition_by}, files={len(self.files)}, " \
+               f"rows={self.n_rows})"
@@ -0,0 +1,32 @@
+import pytest
+from rwe.dataloaders import parse_doc
+
+
+def doc_json(name, sentences, metadata=None):
+    """JSON document (as written by `preprocessing/parse.py`) from
+    sentence strings, tokenized on single spaces"""
+    sents, offset = [], 0
+    for i, text in enumerate(sentences):
+        words, offsets = [], []
+        for word in text.split(' '):
+            words.append(word)
+            offsets.append(offset)
+            offset += len(word) + 1
+        sents.append({'i': i, 'words': words, 'abs_char_offsets': offsets})
+    d = {'name': name, 'sentences': sents}
+    if metadata:
+        d['metadata'] = metadata
+    return d
+
+
+def make_document(name, sentences, metadata=None):
+    return parse_doc(doc_json(name, sentences, metadata))
+
+
+@pytest.fixture
+def document():
+    return make_document('doc1', [
+        'Patient denies fever and chills .',
+        'History of diabetes mellitus , no chest pain .',
+        'Mother had breast cancer .'
+    ], metadata={'CREATED_AT': '2020-03-01 10:00:00'})
@@ -0,0 +1,95 @@
+import copy
+import pickle
+import pytest
+from rwe.contexts import Span, Relation
+from rwe.labelers.annotations import encode_annotations, apply_annotations
+from .conftest import make_document
+
+
+def word_span(sentence, word_start, word_end):
+    """Span covering words [word_start, word_end] of `sentence`"""
+    offsets = sentence.char_offsets
+    end = offsets[word_end] + len(sentence.words[word_end]) - 1
+    return Span(offsets[word_start], end, sentence)
+
+
+def tag(document):
+    s0, s1, s2 = document.sentences
+    fever = word_span(s0, 2, 2)
+    chills = word_span(s0, 4, 4)
+    diabetes = word_span(s1, 2, 3)
+    header = word_span(s1, 0, 0)
+    cancer = word_span(s2, 2, 3)
+    mother = word_span(s2, 0, 0)
+
+    fever.props['polarity'] = -1
+    fever.props['section'] = header
+    diabetes.normalized = 'C0011849'
+    diabetes.props.update({'historical': 1, 'section': header})
+    cancer.props['subject'] = 'family'
+
+    document.annotations[0]['disorder'] = [fever, chills]
+    document.annotations[0]['symptom'] = [fever]
+    document.annotations[0]['TIMEX3'] = []
+    document.annotations[1]['disorder'] = [diabetes, None]
+    document.annotations[2]['disorder'] = [cancer]
+    document.annotations[2]['family'] = [
+        Relation('family', {'subject': mother, 'disorder': cancer})
+    ]
+    document.props['doctime'] = '2020-03-01'
+    return document
+
+
+def summary(document):
+    """Comparable view of all annotations and props"""
+    def span(s):
+        props = {k: span(v) if isinstance(v, Span) else v
+                 for k, v in s.props.items()}
+        return (s.sentence.i, s.char_start, s.char_end, s.text,
+                s.normalized, sorted(props.items()))
+
+    layers = {}
+    for i in document.annotations:
+        for name, items in document.annotations[i].items():
+            layers[(i, name)] = [
+                None if x is None else
+                (x.type_name, sorted((k, span(v)) for k, v in x.args.items()))
+                if isinstance(x, Relation) else span(x)
+                for x in items
+            ]
+    return layers, document.props
+
+
+def test_round_trip(document):
+    untagged = copy.deepcopy(document)
+    tag(document)
+    delta = pickle.loads(pickle.dumps(encode_annotations(document)))
+    apply_annotations(untagged, delta)
+    assert summary(untagged) == summary(document)
+
+
+def test_shared_spans(document):
+    untagged = copy.deepcopy(document)
+    tag(document)
+    apply_annotations(untagged, encode_annotations(document))
+
+    anno = untagged.annotations
+    fever = anno[0]['disorder'][0]
+    assert anno[0]['symptom'][0] is fever
+    assert anno[1]['disorder'][0].props['section'] is fever.props['section']
+    family, = anno[2]['family']
+    assert family.disorder is anno[2]['disorder'][0]
+    assert all(s.sentence is untagged.sentences[s.sentence.i]
+               for s in [fever, family.subject])
+
+
+def test_untagged(document):
+    untagged = copy.deepcopy(document)
+    apply_annotations(untagged, encode_annotations(document))
+    assert summary(untagged) == summary(document)
+
+
+def test_wrong_document(document):
+    other = make_document('doc2', ['Fever .'])
+    with pytest.raises(ValueError):
+        apply_annotations(other, encode_annotations(document))
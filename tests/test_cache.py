@@ -0,0 +1,75 @@
+import os
+import copy
+import pytest
+from rwe.labelers import TaggingCache, TaggerPipelineServer
+from rwe.labelers.pipeline import PipelineGraph
+from rwe.labelers.taggers import DictionaryTagger
+from rwe.labelers.annotations import encode_annotations
+from .conftest import make_document
+from .test_pipeline import PropTagger, CopyTagger
+
+
+def pipeline(reduction='or'):
+    lf = PropTagger()
+    lf.label_reduction = reduction
+    return PipelineGraph({
+        'concepts': DictionaryTagger({'disorder': {'fever', 'diabetes'}}),
+        'lf': lf,
+        'copy': CopyTagger('p', 'q'),
+    }).compile()
+
+
+@pytest.fixture
+def documents():
+    return [make_document(f'doc{k}', ['History of diabetes since 2009 .',
+                                      f'Fever today x{k} .'])
+            for k in range(3)]
+
+
+def tag(cache, stages, documents):
+    cache.bind(stages)
+    for doc in documents:
+        cache.tag(stages, doc)
+    cache.close()
+    return documents
+
+
+def test_cache(tmp_path, documents):
+    fpath = str(tmp_path / 'cache.db')
+    expected = copy.deepcopy(documents)
+    for doc in expected:
+        for tagger in pipeline().values():
+            tagger.tag(doc, ngrams=5)
+
+    cache = TaggingCache(fpath)
+    tag(cache, pipeline(), copy.deepcopy(documents))
+    assert (cache.hits, cache.misses) == (0, 6)
+    assert not os.path.exists(fpath + '-wal')
+    # snapshots after the last stage writing layers and after the last stage
+    assert len(cache) == 6
+    cache.close()
+
+    cache = TaggingCache(fpath)
+    tagged = tag(cache, pipeline(), copy.deepcopy(documents))
+    assert (cache.hits, cache.misses) == (6, 0)
+    assert [encode_annotations(d)['span_props'] for d in tagged] == \
+        [encode_annotations(d)['span_props'] for d in expected]
+
+    # a changed attribute stage resumes from the concepts snapshot
+    cache = TaggingCache(fpath)
+    tag(cache, pipeline('mv'), copy.deepcopy(documents))
+    assert (cache.hits, cache.misses) == (3, 3)
+
+    # a new version invalidates everything
+    cache = TaggingCache(fpath, version='2')
+    tag(cache, pipeline(), copy.deepcopy(documents))
+    assert (cache.hits, cache.misses) == (0, 6)
+
+
+def test_server(tmp_path, documents):
+    fpath = str(tmp_path / 'cache.db')
+    stages = {'concepts': DictionaryTagger({'disorder': {'fever'}})}
+    server = TaggerPipelineServer(num_workers=2, cache=fpath)
+    server.apply(stages, [copy.deepcopy(documents)], block_size=1)
+    assert not os.path.exists(fpath + '-wal')
+    assert len(TaggingCache(fpath)) == len(documents)
@@ -0,0 +1,133 @@
+import os
+import json
+import multiprocessing
+import pytest
+from rwe.labelers import TaggerPipelineServer
+from rwe.labelers.checkpoint import RunCheckpoint
+from rwe.labelers.taggers import DictionaryTagger
+from .conftest import make_document
+
+CONFIG = {'dictionaries': ['disorder'], 'block_size': 2}
+
+
+class KillTagger(DictionaryTagger):
+    """Dictionary tagger that kills its process at document `kill`"""
+    def __init__(self, kill=None):
+        super().__init__({'disorder': {'fever', 'cough'}})
+        self.kill = kill
+        self.tagged = []
+
+    def tag(self, document, **kwargs):
+        if document.name == self.kill:
+            os._exit(1)
+        self.tagged.append(document.name)
+        super().tag(document, **kwargs)
+
+
+def corpus():
+    return [make_document(f'doc{k}', [f'Patient has fever x{k} .',
+                                      'No cough .'])
+            for k in range(7)]
+
+
+def annotations(documents):
+    return [[(i, layer, span.char_start, span.char_end)
+             for i in doc.annotations for layer in doc.annotations[i]
+             for span in doc.annotations[i][layer]] for doc in documents]
+
+
+def run(run_dir, kill=None, stream=False, num_workers=1, block_size=2):
+    tagger = KillTagger(kill)
+    server = TaggerPipelineServer(num_workers=num_workers, tasks_per_worker=1)
+    checkpoint = RunCheckpoint(run_dir, config=CONFIG)
+    if stream:
+        tagged = list(server.apply_stream({'concepts': tagger}, corpus(),
+                                          block_size=2,
+                                          checkpoint=checkpoint))
+    else:
+        tagged, = server.apply({'concepts': tagger}, [corpus()],
+                               block_size=block_size, checkpoint=checkpoint)
+    return tagged, tagger.tagged
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != 'fork',
+                    reason='requires fork')
+@pytest.mark.parametrize('stream', [False, True])
+def test_kill_resume(tmp_path, stream):
+    expected, _ = run(str(tmp_path / 'expected'), stream=stream)
+    assert all(annotations(expected))
+    run_dir = str(tmp_path / 'run')
+
+    # kill the run while it tags doc4, i.e., the 3rd block
+    proc = multiprocessing.Process(target=run, args=(run_dir, 'doc4', stream))
+    proc.start()
+    proc.join()
+    assert proc.exitcode == 1
+    checkpoint = RunCheckpoint(run_dir, config=CONFIG)
+    assert not checkpoint.complete
+    done = {k for k in checkpoint.blocks}
+    # apply dispatches the largest blocks first
+    assert done and 2 not in done
+
+    tagged, retagged = run(run_dir, stream=stream)
+    assert annotations(tagged) == annotations(expected)
+    assert [doc.name for doc in tagged] == [doc.name for doc in expected]
+    assert not {int(name[3:]) // 2 for name in retagged} & done
+    assert RunCheckpoint(run_dir, config=CONFIG).complete
+
+
+def test_truncated_manifest(tmp_path):
+    run_dir = str(tmp_path)
+    expected, _ = run(run_dir)
+    fpath = os.path.join(run_dir, RunCheckpoint.MANIFEST)
+    with open(fpath) as fp:
+        lines = fp.read().split('\n')
+    # drop "complete" and the last block, leaving half its manifest line
+    with open(fpath, 'w') as fp:
+        fp.write('\n'.join(lines[:-3]) + '\n' + lines[-3][:10])
+
+    checkpoint = RunCheckpoint(run_dir, config=CONFIG)
+    assert len(checkpoint) == 3 and not checkpoint.complete
+    tagged, retagged = run(run_dir)
+    assert retagged == ['doc6']
+    assert annotations(tagged) == annotations(expected)
+    with open(fpath) as fp:
+        for line in fp:
+            json.loads(line)
+
+
+def test_resume_num_workers(tmp_path):
+    """Resuming with fewer workers reuses the recorded 'auto' blocks"""
+    expected, _ = run(str(tmp_path / 'expected'))
+    run_dir = str(tmp_path / 'run')
+    run(run_dir, num_workers=2, block_size='auto')
+    checkpoint = RunCheckpoint(run_dir, config=CONFIG)
+    assert checkpoint.block_sizes == [3, 3, 1]
+
+    # forget the last 2 completed blocks
+    fpath = os.path.join(run_dir, RunCheckpoint.MANIFEST)
+    with open(fpath) as fp:
+        lines = fp.read().split('\n')
+    with open(fpath, 'w') as fp:
+        fp.write('\n'.join(lines[:-4]) + '\n')
+    checkpoint = RunCheckpoint(run_dir, config=CONFIG)
+    assert len(checkpoint) == 1
+
+    # with 1 worker, 'auto' alone would make a single block
+    tagged, retagged = run(run_dir, num_workers=1, block_size='auto')
+    assert len(retagged) == 4
+    assert annotations(tagged) == annotations(expected)
+    assert RunCheckpoint(run_dir, config=CONFIG).block_sizes == [3, 3, 1]
+
+
+def test_config_mismatch(tmp_path):
+    run(str(tmp_path))
+    with pytest.raises(ValueError, match='different config'):
+        RunCheckpoint(str(tmp_path), config=dict(CONFIG, block_size=3))
+
+
+def test_block_mismatch(tmp_path):
+    run(str(tmp_path))
+    checkpoint = RunCheckpoint(str(tmp_path), config=CONFIG)
+    with pytest.raises(ValueError, match='Block 0'):
+        checkpoint.is_done(0, corpus()[1:3])
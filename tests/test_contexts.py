@@ -0,0 +1,82 @@
+import random
+import pytest
+from rwe.contexts import Span, SpanIndex
+from .conftest import make_document
+
+
+def random_spans(document, n, rng):
+    spans = []
+    for _ in range(n):
+        sent = rng.choice(document.sentences)
+        length = len(sent.text)
+        start = rng.randrange(length)
+        # mostly short spans, with a few covering (almost) the sentence
+        end = length - 1 if rng.random() < 0.1 else \
+            min(length - 1, start + rng.randrange(8))
+        spans.append(Span(start, end, sent))
+    return spans
+
+
+def brute_nearest(spans, start, end):
+    def dist(s):
+        if s.abs_char_end >= start and s.abs_char_start <= end:
+            return 0
+        return max(s.abs_char_start - end, start - s.abs_char_end)
+    order = sorted(spans, key=lambda s: (s.abs_char_start, s.abs_char_end))
+    return min(order, key=dist, default=None)
+
+
+def offsets(spans):
+    return [(s.abs_char_start, s.abs_char_end) for s in spans]
+
+
+@pytest.fixture
+def document():
+    return make_document('doc1', [
+        ' '.join(f'w{i}' for i in range(k, k + 30)) for k in range(0, 90, 30)
+    ])
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_queries(document, seed):
+    rng = random.Random(seed)
+    spans = random_spans(document, 60, rng)
+    index = SpanIndex(spans[:40])
+    for span in spans[40:]:
+        index.add(span)
+    assert len(index) == len(spans)
+    ordered = sorted(spans, key=lambda s: (s.abs_char_start, s.abs_char_end))
+    assert offsets(index) == offsets(ordered)
+
+    text_len = len(document.text)
+    for _ in range(200):
+        start = rng.randrange(-5, text_len + 5)
+        end = start + rng.randrange(10)
+        assert offsets(index.overlapping(start, end)) == offsets(
+            [s for s in ordered
+             if s.abs_char_end >= start and s.abs_char_start <= end])
+        assert offsets(index.contained_in(start, end)) == offsets(
+            [s for s in ordered
+             if s.abs_char_start >= start and s.abs_char_end <= end])
+        assert offsets(index.containing(start, end)) == offsets(
+            [s for s in ordered
+             if s.abs_char_start <= start and s.abs_char_end >= end])
+        assert offsets([index.nearest(start, end)]) == \
+            offsets([brute_nearest(spans, start, end)])
+
+
+def test_empty(document):
+    index = SpanIndex()
+    assert index.overlapping(0, 10) == []
+    assert index.nearest(0, 10) is None
+    span = Span(0, 1, document.sentences[0])
+    index.add(span)
+    assert index.nearest(50, 60) is span
+
+
+def test_document_index(document):
+    s0, s1, _ = document.sentences
+    document.annotations[0]['A'] = [Span(0, 1, s0)]
+    document.annotations[1]['B'] = [Span(3, 5, s1), None]
+    assert len(document.span_index()) == 2
+    assert len(document.span_index(['B'])) == 1
@@ -0,0 +1,45 @@
+import gzip
+import json
+import pytest
+import numpy as np
+from rwe.dataloaders import stream_documents, mmap_npz
+from .conftest import doc_json
+
+
+@pytest.fixture
+def filelist(tmp_path):
+    fpaths = []
+    for k, sizes in enumerate([[3, 1, 2], [1] * 7, [2]]):
+        lines = [json.dumps(doc_json(f'doc{k}_{i}', ['word'] * n)) + '\n'
+                 for i, n in enumerate(sizes)]
+        fpath = tmp_path / (f'shard{k}.json' + ('.gz' if k == 1 else ''))
+        fopen = gzip.open if k == 1 else open
+        with fopen(fpath, 'wt') as fp:
+            fp.writelines(lines)
+        fpaths.append(str(fpath))
+    return fpaths
+
+
+def test_order(filelist):
+    names = [f'doc{k}_{i}' for k, n in enumerate([3, 7, 1]) for i in range(n)]
+    for num_workers, batch_size in [(1, 1000), (1, 2), (3, 2), (2, 1000)]:
+        docs = list(stream_documents(filelist, num_workers=num_workers,
+                                     batch_size=batch_size))
+        assert [doc.name for doc in docs] == names
+        assert all(s.document is doc for doc in docs for s in doc.sentences)
+
+
+@pytest.mark.parametrize('savez', [np.savez, np.savez_compressed])
+def test_mmap_npz(tmp_path, savez):
+    arrays = {'a': np.arange(7, dtype=np.int32),
+              'b': np.array(['x', 'yz'], dtype=str),
+              'c': np.arange(6, dtype=np.int64).reshape(2, 3),
+              'd': np.zeros(0, dtype=np.int32)}
+    savez(tmp_path / 'shard.npz', **arrays)
+    loaded = mmap_npz(str(tmp_path / 'shard.npz'))
+    assert sorted(loaded) == sorted(arrays)
+    for key, values in arrays.items():
+        assert loaded[key].dtype == values.dtype
+        assert np.array_equal(loaded[key], values)
+        # stored members are views of the file, not copies
+        assert loaded[key].flags.writeable == (savez is np.savez_compressed)
@@ -0,0 +1,78 @@
+import os
+import random
+import pytest
+from rwe.contexts import Span
+from rwe.helpers import (get_left_span, get_right_span, left_window,
+                         right_window, match_regex)
+from rwe.labelers.taggers.negex import NegEx
+from .conftest import make_document
+
+NEGEX_ROOT = os.path.join(os.path.dirname(__file__), '..', 'data',
+                          'supervision', 'dicts', 'negex')
+
+FILLER = ['patient', 'fever', 'pain', 'and', 'the', ',', '.', 'with',
+          'cough', 'x', '2']
+
+
+@pytest.fixture(scope='module')
+def negex():
+    return NegEx(data_root=NEGEX_ROOT)
+
+
+def random_sentence(negex, rng):
+    terms = [t['term'] for category in negex.dictionary
+             for t in negex.dictionary[category]]
+    words = []
+    for _ in range(rng.randrange(3, 25)):
+        words.extend(rng.choice(terms).split() if rng.random() < 0.4
+                     else [rng.choice(FILLER)])
+    return ' '.join(words)
+
+
+def word_spans(sentence, rng, n):
+    words = sentence.words
+    for _ in range(n):
+        i = rng.randrange(len(words))
+        j = min(len(words) - 1, i + rng.randrange(3))
+        end = sentence.char_offsets[j] + len(words[j]) - 1
+        yield Span(sentence.char_offsets[i], end, sentence)
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_match(negex, seed):
+    rng = random.Random(seed)
+    doc = make_document('doc', [random_sentence(negex, rng)
+                                for _ in range(25)])
+    n = 0
+    for sentence in doc.sentences:
+        for span in word_spans(sentence, rng, 8):
+            for window in [None, 3, rng.randrange(1, 8)]:
+                left = get_left_span(span, window=window)
+                right = get_right_span(span, window=window)
+                for bounds, cxt in [(left_window(span, window=window), left),
+                                    (right_window(span, window=window),
+                                     right)]:
+                    start, end = bounds
+                    assert sentence.text[start:end] == cxt.text
+                    assert start == cxt.char_start or start == end
+                for category in negex.rgxs:
+                    for direction, rgx in negex.rgxs[category].items():
+                        cxt = left if direction == 'left' else right
+                        expected = match_regex(rgx, cxt) \
+                            if rgx.pattern else None
+                        found = negex.match(span, category, direction,
+                                            window=window)
+                        assert (found is None) == (expected is None)
+                        if found is not None:
+                            n += 1
+                            assert (found.char_start, found.char_end) == \
+                                (expected.char_start, expected.char_end)
+    assert n > 0
+
+
+def test_index_per_sentence(negex):
+    doc = make_document('doc', ['no fever', 'denies pain'])
+    s0, s1 = doc.sentences
+    index = negex.triggers(s0)
+    assert negex.triggers(s0) is index
+    assert negex.triggers(s1) is not index
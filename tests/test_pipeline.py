@@ -0,0 +1,74 @@
+import copy
+import pytest
+from rwe.labelers.pipeline import PipelineGraph
+from rwe.labelers.taggers import (
+    SpanTagger, LabelingFunctionTagger, DictionaryTagger, FusedSpanTagger
+)
+from .conftest import make_document
+
+
+def LF_fever(span):
+    return 1 if 'fever' in span.text else 0
+
+
+class PropTagger(LabelingFunctionTagger):
+    """LF tagger writing props.p"""
+    def __init__(self, reads=()):
+        self.targets = ['disorder']
+        self.prop_name = 'p'
+        self.lfs = [LF_fever]
+        self._reads = set(reads)
+
+    def reads(self):
+        return set(self.targets) | self._reads
+
+
+class CopyTagger(SpanTagger):
+    """Span tagger copying span prop `src` to `dst`"""
+    def __init__(self, src, dst):
+        self.targets = ['disorder']
+        self.src, self.dst = src, dst
+
+    def tag_span(self, span, document, i, **kwargs):
+        span.props[self.dst] = span.props.get(self.src)
+
+    def reads(self):
+        return set(self.targets) | {f'props.{self.src}'}
+
+    def writes(self):
+        return {f'props.{self.dst}'}
+
+
+@pytest.fixture
+def document():
+    doc = make_document('doc1', ['Patient has fever and cough .',
+                                 'No fever today .'])
+    DictionaryTagger({'disorder': {'fever', 'cough'}}).tag(doc)
+    return doc
+
+
+def props(document):
+    return [dict(span.props) for i in document.annotations
+            for span in document.annotations[i].get('disorder', [])]
+
+
+@pytest.mark.parametrize('stages', [
+    # an LF tagger and a span tagger reading its output
+    lambda: {'lf': PropTagger(), 'reader': CopyTagger('p', 'q')},
+    # a span tagger and an LF tagger reading its output
+    lambda: {'writer': CopyTagger('x', 'p0'),
+             'lf': PropTagger(reads={'props.p0'}),
+             'reader': CopyTagger('p', 'q')},
+])
+def test_fused_order(document, stages):
+    expected = copy.deepcopy(document)
+    for tagger in stages().values():
+        tagger.tag(expected)
+
+    pipeline = PipelineGraph(stages()).compile()
+    assert len(pipeline) == 1
+    fused, = pipeline.values()
+    assert isinstance(fused, FusedSpanTagger)
+    fused.tag(document)
+    assert props(document) == props(expected)
+    assert any(p.get('q') == 1 for p in props(document))
@@ -0,0 +1,173 @@
+import os
+import re
+import random
+import statistics
+import pytest
+import numpy as np
+from scipy import sparse, stats
+from rwe.labelers.taggers import (
+    DictionaryTagger, SectionHeaderTagger, ParentSectionTagger, Timex3Tagger,
+    Timex3NormalizerTagger, DocTimeTagger, TimeDeltaTagger, PolarityTagger,
+    HistoricalTagger, FamilyTagger, check_lf_regexes, mv_reduce, or_reduce
+)
+from rwe.labelers import TaggerPipelineServer
+from rwe.labelers.taggers.severity import SeverityTagger
+from rwe.utils import build_candidate_set
+from .conftest import make_document
+
+NEGEX_ROOT = os.path.join(os.path.dirname(__file__), '..', 'data',
+                          'supervision', 'dicts', 'negex', '')
+
+TARGETS = ['disorder']
+
+
+@pytest.fixture(scope='module')
+def spans():
+    return build_candidate_set([tagged_document()], 'disorder')
+
+
+def tagged_document():
+    doc = make_document('doc1', [
+        'Past Medical History : diabetes since 2009 , no hypertension .',
+        'Patient denies severe chest pain or slight fever on 3/12 .',
+        'Family History : mother had breast cancer , donor with hepatitis .',
+        'If fever returns please call . Recommend evaluation for left '
+        'knee pain .',
+        'Mild rash was noted on 03/01/2020 , possibly from cellulitis .'
+    ], metadata={'CREATED_AT': '2020-03-10 10:00:00'})
+    pipeline = [
+        SectionHeaderTagger(header_dict=['Past Medical History',
+                                         'Family History'],
+                            stop_headers={}),
+        DictionaryTagger({'disorder': {
+            'diabetes', 'hypertension', 'chest pain', 'fever', 'cancer',
+            'breast cancer', 'hepatitis', 'knee pain', 'rash', 'cellulitis'
+        }}),
+        Timex3Tagger(),
+        DocTimeTagger(prop='CREATED_AT', format='%Y-%m-%d %H:%M:%S'),
+        Timex3NormalizerTagger(),
+        ParentSectionTagger(targets=TARGETS + ['TIMEX3'],
+                            major_headers=['Past Medical History',
+                                           'Family History']),
+        TimeDeltaTagger(targets=TARGETS),
+    ]
+    for tagger in pipeline:
+        tagger.tag(doc)
+    assert len(build_candidate_set([doc], 'disorder')) >= 8
+    return doc
+
+
+def test_shared_spans():
+    """Terms in several dictionaries are one Span in all their layers, so
+    attributes of target layers also apply to the others"""
+    pipeline = {
+        'concepts': DictionaryTagger({'disorder': {'fever', 'rash'},
+                                      'GPE': {'fever', 'france'}}),
+        'polarity': PolarityTagger(TARGETS, data_root=NEGEX_ROOT),
+    }
+
+    def documents():
+        return [make_document(f'doc{k}', ['No fever or rash after France '
+                                          'trip .']) for k in range(2)]
+
+    doc = documents()[0]
+    for tagger in pipeline.values():
+        tagger.tag(doc)
+    # workers' annotation deltas keep spans shared too
+    tagged, = TaggerPipelineServer(num_workers=2).apply(
+        pipeline, [documents()], block_size=1)
+
+    for doc in [doc] + tagged:
+        spans = {layer: {span.text: span for span in doc.annotations[0][layer]}
+                 for layer in ['disorder', 'GPE']}
+        fever = spans['disorder']['fever']
+        assert spans['GPE']['fever'] is fever
+        assert spans['GPE']['fever'].props['polarity'] is not None
+        assert fever.props['polarity'] == spans['disorder']['rash'].props[
+            'polarity']
+        assert 'polarity' not in spans['GPE']['France'].props
+
+
+LF_TAGGERS = {
+    'polarity': lambda: PolarityTagger(TARGETS, data_root=NEGEX_ROOT),
+    'historical': lambda: HistoricalTagger(TARGETS),
+    'severity': lambda: SeverityTagger(TARGETS, data_root=NEGEX_ROOT),
+    'family': lambda: FamilyTagger(TARGETS, data_root=NEGEX_ROOT),
+}
+
+
+@pytest.mark.parametrize('tagger', LF_TAGGERS.values(), ids=list(LF_TAGGERS))
+def test_lf_regexes_compiled(tagger, spans):
+    check_lf_regexes(tagger().lfs, spans)
+
+
+def test_check_lf_regexes(spans):
+    def LF_per_call(span):
+        return 1 if re.search(r'\bfever\b', span.text) else 0
+
+    with pytest.raises(ValueError, match='LF_per_call'):
+        check_lf_regexes([LF_per_call], spans)
+    # the `re` module is restored
+    assert re.search.__module__ == 're'
+
+
+###############################################################################
+# Label matrices
+###############################################################################
+
+def random_label_matrix(rng, n=300, m=7, classes=(1, 2, 3)):
+    L = np.zeros((n, m), dtype=np.int8)
+    for k in range(n):
+        for j in range(m):
+            if rng.random() < 0.4:
+                L[k, j] = rng.choice(classes)
+    return L
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_mv_reduce(seed):
+    L = random_label_matrix(random.Random(seed))
+    first = mv_reduce(sparse.csr_matrix(L), ties='first')
+    smallest = mv_reduce(L, ties='min')
+    for k, row in enumerate(L):
+        votes = [int(y) for y in row if y]
+        if not votes:
+            assert first[k] == smallest[k] == 0
+            continue
+        assert first[k] == statistics.mode(votes)
+        assert smallest[k] == stats.mode(votes).mode
+
+
+def test_or_reduce():
+    L = random_label_matrix(random.Random(0))
+    assert (or_reduce(L, 2) == (L == 2).any(axis=1)).all()
+    assert not or_reduce(np.zeros((3, 2)), 1).any()
+
+
+BATCHED = ['polarity', 'historical', 'severity']
+
+
+@pytest.mark.parametrize('reduction', ['mv', 'or', 'matrix'])
+@pytest.mark.parametrize('tagger', [LF_TAGGERS[k] for k in BATCHED],
+                         ids=BATCHED)
+def test_batch_labels(tagger, reduction):
+    """`tag` labels spans as tagging them one at a time does"""
+    tagger = tagger()
+    tagger.label_reduction = reduction
+    batch, single = tagged_document(), tagged_document()
+    tagger.tag(batch)
+    for i in single.annotations:
+        for span in single.annotations[i].get('disorder', []):
+            tagger.tag_span(span, single, i)
+
+    spans = tagger.target_spans(batch)
+    expected = tagger.target_spans(single)
+    if reduction == 'matrix':
+        L = batch.props[f'label_matrix.{tagger.prop_name}'].toarray()
+        for row, span in zip(L, expected):
+            labels = span.props.get(tagger.prop_name)
+            assert list(row) == (list(labels) if labels is not None
+                                 else [0] * len(tagger.lfs))
+    else:
+        assert [s.props.get(tagger.prop_name) for s in spans] == \
+            [s.props.get(tagger.prop_name) for s in expected]
@@ -0,0 +1,122 @@
+import os
+import gzip
+import glob
+import pytest
+from rwe.writers import PartitionedWriter, pyarrow
+
+HEADER = ['DOC_ID', 'TYPE', 'START', 'SCORE']
+ROWS = [(f'doc{k // 3}', ['disorder', 'drug'][k % 2], k, 'NULL' if k % 5
+         else k / 10) for k in range(20)]
+
+requires_pyarrow = pytest.mark.skipif(pyarrow is None,
+                                      reason='requires pyarrow')
+
+
+def read_tsv(fpath, header=HEADER):
+    opener = gzip.open if fpath.endswith('.gz') else open
+    with opener(fpath, 'rt') as fp:
+        lines = fp.read().splitlines()
+    assert lines[0].split('\t') == header
+    return [tuple(line.split('\t')) for line in lines[1:]]
+
+
+def as_strings(rows):
+    return [tuple(map(str, row)) for row in rows]
+
+
+def write(outpath, rows=ROWS, **kwargs):
+    with PartitionedWriter(outpath, HEADER, dtypes={'START': int,
+                                                    'SCORE': float},
+                           null_values=('NULL',), **kwargs) as writer:
+        for k in range(0, len(rows), 3):
+            writer.write(rows[k:k + 3])
+    return writer
+
+
+@pytest.mark.parametrize('ext', ['tsv', 'tsv.gz'])
+def test_tsv(tmp_path, ext):
+    fpath = str(tmp_path / f'concepts.{ext}')
+    writer = write(fpath)
+    assert writer.format == ext and writer.n_rows == len(ROWS)
+    assert read_tsv(fpath) == as_strings(ROWS)
+
+
+def test_empty(tmp_path):
+    fpath = str(tmp_path / 'concepts.tsv')
+    write(fpath, rows=[])
+    assert read_tsv(fpath) == []
+
+
+@requires_pyarrow
+def test_parquet(tmp_path):
+    fpath = str(tmp_path / 'concepts.parquet')
+    write(fpath, row_group_size=4)
+    table = pyarrow.parquet.read_table(fpath)
+    assert table.schema.names == HEADER
+    assert table.schema.field('START').type == pyarrow.int64()
+    assert table.column('START').to_pylist() == [row[2] for row in ROWS]
+    assert table.column('SCORE').to_pylist() == \
+        [None if row[3] == 'NULL' else row[3] for row in ROWS]
+    assert pyarrow.parquet.ParquetFile(fpath).num_row_groups > 1
+
+
+@pytest.mark.parametrize('format', [
+    'tsv', pytest.param('parquet', marks=requires_pyarrow)
+])
+def test_partitions(tmp_path, format):
+    outpath = str(tmp_path / 'concepts')
+    writer = write(outpath, format=format, partition_by='TYPE',
+                   rows_per_file=4)
+    for type_name in ['disorder', 'drug']:
+        fpaths = sorted(glob.glob(f'{outpath}/TYPE={type_name}/part-*'))
+        # 10 rows in parts of 4
+        assert len(fpaths) == 3
+        # the TYPE column is only stored in the directory names
+        if format == 'tsv':
+            rows = [row for fpath in fpaths for row in
+                    read_tsv(fpath, ['DOC_ID', 'START', 'SCORE'])]
+        else:
+            rows = [tuple('NULL' if v is None else str(v)
+                          for v in row.values())
+                    for fpath in fpaths for row in
+                    pyarrow.parquet.read_table(fpath).to_pylist()]
+        assert rows == as_strings([(row[0],) + row[2:] for row in ROWS
+                                   if row[1] == type_name])
+    assert len(writer.files) == 6
+
+
+@requires_pyarrow
+def test_parquet_dataset(tmp_path):
+    """Partitioned Parquet output reads back as one dataset"""
+    pd = pytest.importorskip('pandas')
+    outpath = str(tmp_path / 'concepts')
+    write(outpath, format='parquet', partition_by='TYPE', rows_per_file=4)
+    table = pyarrow.parquet.read_table(outpath)
+    assert sorted(table.schema.names) == sorted(HEADER)
+    rows = sorted((row['DOC_ID'], str(row['TYPE']), row['START'],
+                   'NULL' if row['SCORE'] is None else row['SCORE'])
+                  for row in table.to_pylist())
+    assert rows == sorted(ROWS)
+    df = pd.read_parquet(outpath)
+    assert len(df) == len(ROWS)
+    assert sorted(df['TYPE'].astype(str)) == sorted(row[1] for row in ROWS)
+
+
+def test_shards(tmp_path):
+    outpath = str(tmp_path / 'concepts')
+    write(outpath, partition_by='shard', num_shards=3)
+    docs = {}
+    for fpath in glob.glob(f'{outpath}/shard=*/part-00000.tsv'):
+        for row in read_tsv(fpath):
+            docs.setdefault(row[0], set()).add(os.path.dirname(fpath))
+    # all rows of a document go to the same shard
+    assert len(docs) == 7 and all(len(d) == 1 for d in docs.values())
+
+
+def test_invalid(tmp_path):
+    with pytest.raises(ValueError, match='rows_per_file'):
+        PartitionedWriter(str(tmp_path / 'concepts.tsv'), HEADER,
+                          rows_per_file=10)
+    with pytest.raises(ValueError, match='Unknown format'):
+        PartitionedWriter(str(tmp_path / 'concepts'), HEADER, format='csv')
+    assert not os.listdir(tmp_path)